@@ -23,9 +23,11 @@ First version: September 2018.
 """
 import os
 import datetime
+import hashlib
 import logging
 import importlib
 import csv
+import shutil
 import tempfile
 import iris
 from esmvaltool.diag_scripts.shared import run_diagnostic
@@ -163,33 +165,74 @@ def _get_filelists(cfg):
     return metrics_dict, obs_list
 
 
-def _process_obs(cfg, obs_list, obs_loc):
+def _get_store_path(filelist, store_dir):
+    """Get path of the concatenated cubes of filelist in the store.
+
+    The file name is a hash of the paths, sizes and modification times of
+    all input files, i.e. it changes whenever the input data changes.
+    """
+    file_hash = hashlib.sha256()
+    for filename in sorted(filelist):
+        stat = os.stat(filename)
+        file_id = '{}:{}:{}\n'.format(
+            os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+        file_hash.update(file_id.encode())
+    return os.path.join(store_dir, file_hash.hexdigest() + '.nc')
+
+
+def _save_to_store(filelist, store_dir):
+    """Load, concatenate and save cubes once and return path in store."""
+    store_path = _get_store_path(filelist, store_dir)
+    if os.path.exists(store_path):
+        logger.info("Using concatenated cubes %s", store_path)
+        return store_path
+    cubelist = iris.load(filelist)
+    cubelist = _fix_cube(cubelist)
+    # save to temporary file first to never leave incomplete files in store
+    tmp_path = store_path + '.{}.tmp'.format(os.getpid())
+    iris.save(cubelist, tmp_path, saver='nc')
+    os.replace(tmp_path, store_path)
+    logger.info("Saved concatenated cubes %s", store_path)
+    return store_path
+
+
+def _link_to_store(store_path, path):
+    """Make file available at path without copying it (if possible)."""
+    if os.path.lexists(path):
+        os.remove(path)
+    try:
+        os.link(store_path, path)
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(store_path), path)
+        except OSError:
+            shutil.copyfile(store_path, path)
+
+
+def _process_obs(cfg, obs_list, obs_loc, store_dir):
     """Gather obs files and save them applying specific cases."""
     group_files = [[
         ofile for ofile in obs_list
         if os.path.basename(ofile).split('_')[1] == obs
     ] for obs in cfg['obs_models']]
     for obs_file_group, obs_name in zip(group_files, cfg['obs_models']):
-        cubes_list_obs = iris.load(obs_file_group)
-        cubes_list_obs = _fix_cube(cubes_list_obs)
+        store_path = _save_to_store(obs_file_group, store_dir)
         obs_file_name = obs_name + '_cubeList.nc'
-        iris.save(cubes_list_obs, os.path.join(obs_loc, obs_file_name))
+        _link_to_store(store_path, os.path.join(obs_loc, obs_file_name))
 
 
-def _process_metrics_data(all_files, suites, smeans):
+def _process_metrics_data(all_files, suites, smeans, store_dir):
     """Create and save concatenated cubes for ctrl and exp."""
     cubes_lists_paths = []
     for key in all_files.keys():
         filelist = all_files[key]
         if filelist:
-            cubelist = iris.load(filelist)
-
-            # save to congragated files; save twice for supermeans as well
+            # save concatenated cubes once; link for suites and supermeans
+            store_path = _save_to_store(filelist, store_dir)
             cubes_list_path = os.path.join(suites[key], 'cubeList.nc')
             cubes_list_smean_path = os.path.join(smeans[key], 'cubeList.nc')
-            cubelist = _fix_cube(cubelist)
-            iris.save(cubelist, cubes_list_path)
-            iris.save(cubelist, cubes_list_smean_path)
+            _link_to_store(store_path, cubes_list_path)
+            _link_to_store(store_path, cubes_list_smean_path)
             cubes_lists_paths.append(cubes_list_path)
 
     return cubes_lists_paths
@@ -274,6 +317,12 @@ def _setup_input(cfg):
     # create the ancil and tp dirs
     tmp_dir, ancil_dir = _make_tmp_dir(cfg)
 
+    # store for concatenated cubes (may be shared between runs)
+    store_dir = cfg.get('cubelist_store',
+                        os.path.join(cfg['work_dir'], 'cubelist_store'))
+    if not os.path.exists(store_dir):
+        os.makedirs(store_dir)
+
     # get files lists
     metrics_dict, obs_list = _get_filelists(cfg)
 
@@ -286,7 +335,8 @@ def _setup_input(cfg):
     logger.info("Files for obs model NOT for metrics: %s", obs_list)
 
     # load and save control and exp cubelists
-    all_cubelists = _process_metrics_data(metrics_dict, suites, smeans)
+    all_cubelists = _process_metrics_data(metrics_dict, suites, smeans,
+                                          store_dir)
 
     # print the paths
     logger.info("Saved control data cubes: %s", str(all_cubelists))
@@ -294,7 +344,7 @@ def _setup_input(cfg):
     # separately process the obs's that dont need metrics
     if 'obs_models' in cfg:
         if cfg['obs_models']:
-            _process_obs(cfg, obs_list, obs_loc)
+            _process_obs(cfg, obs_list, obs_loc, store_dir)
 
     return tmp_dir, obs_loc, ancil_dir
 
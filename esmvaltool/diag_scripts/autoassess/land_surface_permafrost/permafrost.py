@@ -12,6 +12,7 @@ import iris.quickplot as qplt
 import iris.util as ut
 
 from esmvaltool.diag_scripts.autoassess.loaddata import load_run_ss
+from esmvaltool.diag_scripts.shared.iris_helpers import load_cubelist
 # from esmvaltool.diag_scripts.shared._supermeans import get_supermean
 from . import permafrost_koven_sites
 
@@ -209,7 +210,7 @@ def get_landfr_mask(run):
     # replaced momentarily with:
     name_constraint = iris.Constraint(name='land_area_fraction')
     cubes_path = os.path.join(supermean_data_dir, 'cubeList.nc')
-    cubes = iris.load(cubes_path)
+    cubes = load_cubelist(cubes_path)
     cube = cubes.extract_strict(name_constraint)
 
     return cube
@@ -234,7 +235,7 @@ def get_nonice_mask(run):
     name_constraint = iris.Constraint(
         name='soil_moisture_content_at_field_capacity')
     cubes_path = os.path.join(supermean_data_dir, 'cubeList.nc')
-    cubes = iris.load(cubes_path)
+    cubes = load_cubelist(cubes_path)
     cube = cubes.extract_strict(name_constraint)
 
     # TODO: mrsofc does not have depth
@@ -8,6 +8,7 @@ import iris
 
 from esmvalcore.preprocessor._regrid import regrid
 from esmvaltool.diag_scripts.shared._supermeans import get_supermean
+from esmvaltool.diag_scripts.shared.iris_helpers import load_cubelist
 
 
 def land_surf_rad(run):
@@ -31,7 +32,7 @@ def land_surf_rad(run):
     # Fraction of Land m01s03i395
     # replaced with a constant sftlf mask; original was
     # lnd = get_supermean('land_area_fraction', 'ann', supermean_data_dir)
-    cubes = iris.load(os.path.join(supermean_data_dir, 'cubeList.nc'))
+    cubes = load_cubelist(os.path.join(supermean_data_dir, 'cubeList.nc'))
     lnd = cubes.extract_strict(iris.Constraint(name='land_area_fraction'))
 
     metrics = dict()
@@ -21,6 +21,8 @@ import cf_units
 import iris
 import iris.coord_categorisation as coord_cat
 
+from esmvaltool.diag_scripts.shared.iris_helpers import load_cubelist
+
 
 def is_daily(cube):
     """Test whether the time coordinate contains only daily bound periods."""
@@ -418,7 +420,7 @@ def load_run_ss(run_object,
     cubelist_path = os.path.join(run_object['data_root'], run_object['runid'],
                                  run_object['_area'], cubelist_file)
 
-    cubes = iris.load(cubelist_path)
+    cubes = load_cubelist(cubelist_path)
     cubes.sort(key=lambda c: c.standard_name)
 
     return _load_run_ss(
@@ -14,7 +14,9 @@ Cloud Regime Error Metrics (CREM).
     none
 
   Optional diag_script_info attributes (diagnostic specific)
-    none
+    chunk_size: number of time steps read and processed at once (default:
+                100)
+    n_jobs: number of datasets processed in parallel (default: 1)
 
   Required variable_info attributes (variable specific)
     none
@@ -43,6 +45,7 @@ Cloud Regime Error Metrics (CREM).
     20150903-lauer_axel: ESMValTool implementation.
     20150521-williams_keith: CREM routines written.
 """
+import contextlib
 import logging
 import os
 import sys
@@ -50,6 +53,7 @@ from pprint import pformat
 
 import matplotlib.pyplot as plt
 import numpy as np
+from joblib import Parallel, delayed
 from netCDF4 import Dataset
 
 from esmvaltool.diag_scripts.shared import (
@@ -109,8 +113,8 @@ def main(cfg):
     # create list of dataset names (plot labels)
     models = []
 
-    i = 0
     missing_vars = []
+    all_pointers = []
 
     for dataset in grouped_input_data:
         models.append(dataset)
@@ -172,10 +176,15 @@ def main(cfg):
                          "available: %s", printlist)
             raise Exception('Variables missing (see log file for details).')
 
-        # calculate CREM
+        all_pointers.append(pointers)
+
+    # calculate CREM (time chunk by time chunk, datasets in parallel)
 
-        (crem_pd, r_crem_pd) = crem_calc(pointers)
+    results = Parallel(n_jobs=cfg.get('n_jobs', 1))(
+        delayed(crem_calc)(pointers, cfg.get('chunk_size', 100))
+        for pointers in all_pointers)
 
+    for (i, (crem_pd, r_crem_pd)) in enumerate(results):
         crems[i] = crem_pd
 
         # sort results into output array
@@ -190,8 +199,6 @@ def main(cfg):
                 k = k + 1
             j = j + 1
 
-        i = i + 1
-
     logger.info("==================================")
     logger.info("*** Cloud Regime Error Metrics ***")
     logger.info("==================================")
@@ -284,16 +291,14 @@ def main(cfg):
         provenance_logger.log(oname, provenance_record)
 
 
-def read_and_check(srcfilename, varname, lons2, lats2, time2):
+def check_input(srcfilename, lons2, lats2, time2):
     """
-    Function for reading and checking for correct regridding of input data.
+    Function for checking for correct regridding of input data.
 
     Parameters
     ----------
     srcfilename : str
         filename containing input data
-    varname : str
-        variable name in netcdf
     lons2 : float
         longitudes of target grid (ISCCP)
     lats2 : float
@@ -304,9 +309,10 @@ def read_and_check(srcfilename, varname, lons2, lats2, time2):
     nlon = len(lons2)
     nlat = len(lats2)
 
-    src_dataset = Dataset(srcfilename, 'r')
-
-    n_time = len(src_dataset.variables['time'][:])
+    with Dataset(srcfilename, 'r') as src_dataset:
+        n_time = len(src_dataset.variables['time'])
+        lons = src_dataset.variables['lon'][:]
+        lats = src_dataset.variables['lat'][:]
     logger.debug('Number of data times in file %s is %i', srcfilename, n_time)
 
     # check number of time steps is matching
@@ -322,7 +328,6 @@ def read_and_check(srcfilename, varname, lons2, lats2, time2):
 
     # check longitudes
 
-    lons = src_dataset.variables['lon'][:]
     if nlon != len(lons):
         grid_mismatch = True
     if np.amax(np.absolute(lons - lons2)) > 1.0e-3:
@@ -330,7 +335,6 @@ def read_and_check(srcfilename, varname, lons2, lats2, time2):
 
     # check latitudes
 
-    lats = src_dataset.variables['lat'][:]
     if nlat != len(lats):
         grid_mismatch = True
     if np.amax(np.absolute(lats - lats2)) > 1.0e-3:
@@ -350,21 +354,115 @@ def read_and_check(srcfilename, varname, lons2, lats2, time2):
         raise Exception('Input variables are not on 2.5x2.5 deg ISCCP grid '
                         '(see log file for details).')
 
-    # read data
+
+def read_chunk(src_dataset, varname, time_slice):
+    """
+    Function for reading a time chunk of input data.
+
+    Parameters
+    ----------
+    src_dataset : netCDF4.Dataset
+        open dataset containing input data
+    varname : str
+        variable name in netcdf
+    time_slice : slice
+        time steps to read
+
+    Returns
+    -------
+    numpy.ndarray
+        input data with missing values set to 0.
+    """
     src_data = src_dataset.variables[varname]
+    chunk = src_data[time_slice]
 
     # create mask (missing values)
     try:
-        data = np.ma.masked_equal(src_data, getattr(src_data, "_FillValue"))
+        data = np.ma.masked_equal(chunk, getattr(src_data, "_FillValue"))
         rgmasked = np.ma.masked_invalid(data)
     except AttributeError:
-        rgmasked = np.ma.masked_invalid(src_data)
+        rgmasked = np.ma.masked_invalid(chunk)
     np.ma.set_fill_value(rgmasked, 0.0)
 
     return np.ma.filled(rgmasked)
 
 
-def crem_calc(pointers):
+def accumulate_regimes(chunk, lats2, nregimes, centroids):
+    """
+    Assign data points of one time chunk to the observed cloud regimes.
+
+    Parameters
+    ----------
+    chunk : dict
+        input data of the time chunk (keys: albisccp, pctisccp, cltisccp,
+        rsut, rsutcs, rlut, rlutcs, sic, snow).
+    lats2 : float
+        latitudes of target grid (ISCCP)
+    nregimes : dict
+        number of regimes in each region.
+    centroids : numpy.ndarray
+        observed regime centroids (albedo, cloud top pressure, cloud cover)
+        of shape (region, regime, 3).
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        number of valid data points in each region, and number of data
+        points, sum of shortwave cloud forcing and sum of longwave cloud
+        forcing of each regime (shape (region, regime)).
+    """
+    numreg = centroids.shape[0]
+    numrgm = centroids.shape[1]
+    npoints = np.zeros(numreg)
+    counts = np.zeros((numreg, numrgm))
+    sum_swcf = np.zeros((numreg, numrgm))
+    sum_lwcf = np.zeros((numreg, numrgm))
+
+    # Normalize data used for assignment to regimes to be in the range 0-1
+    albisccp_data = chunk['albisccp']
+    pctisccp_data = chunk['pctisccp'] / 100000.0
+    cltisccp_data = chunk['cltisccp'] / 100.0
+
+    # Calculate cloud forcing
+    swcf_data = chunk['rsutcs'] - chunk['rsut']
+    lwcf_data = chunk['rlutcs'] - chunk['rlut']
+
+    # Validity masks for regions
+    # (0 = tropics, 1 = ice-free extra-tropics, 2 = snow/ice covered)
+    tropics = ((lats2 >= -20) & (lats2 <= 20))[np.newaxis, :, np.newaxis]
+    valid = np.isfinite(pctisccp_data) & (cltisccp_data != 0.0)
+    masks = {
+        'tropics': tropics,
+        'extra-tropics': ~tropics & ~((chunk['snow'] >= 0.1) |
+                                      (chunk['sic'] >= 0.1)),
+        'snow-ice': ~tropics & ~((chunk['snow'] < 0.1) &
+                                 (chunk['sic'] < 0.1)),
+    }
+
+    for idx_region, (region, regime) in enumerate(nregimes.items()):
+        points = valid & masks[region]
+        npoints[idx_region] = np.count_nonzero(points)
+
+        # Assign model data to observed regimes
+        e_d = (
+            (albisccp_data[points][:, np.newaxis] -
+             centroids[idx_region, np.newaxis, :regime, 0])**2 +
+            (pctisccp_data[points][:, np.newaxis] -
+             centroids[idx_region, np.newaxis, :regime, 1])**2 +
+            (cltisccp_data[points][:, np.newaxis] -
+             centroids[idx_region, np.newaxis, :regime, 2])**2)
+        group = np.argmin(e_d, axis=1)
+
+        counts[idx_region, :regime] = np.bincount(group, minlength=regime)
+        sum_swcf[idx_region, :regime] = np.bincount(
+            group, weights=swcf_data[points], minlength=regime)
+        sum_lwcf[idx_region, :regime] = np.bincount(
+            group, weights=lwcf_data[points], minlength=regime)
+
+    return (npoints, counts, sum_swcf, sum_lwcf)
+
+
+def crem_calc(pointers, chunk_size=100):
     """
     Main program for calculating Cloud Regime Error Metric.
 
@@ -375,6 +473,10 @@ def crem_calc(pointers):
     pointers : dict
         Keys in dictionary are: albisccp_nc, pctisccp_nc, cltisccp_nc,
         rsut_nc, rsutcs_nc, rlut_nc, rlutcs_nc, snc_nc, sic_nc
+    chunk_size : int
+        number of time steps read and processed at once. Counts and cloud
+        forcing sums of each regime are accumulated over all chunks, so that
+        memory usage is bounded by a single chunk.
 
     For CMIP5, snc is in the CMIP5 table 'day'. All other variables
     are in the CMIP5 table 'cfday'. A minimum of 2 years, and ideally 5
@@ -447,44 +549,22 @@ def crem_calc(pointers):
     lons2 = np.array([z_x + d_x * (i + 1.0) for i in range(npts)])
     lats2 = np.array([z_y + d_y * (j + 1.0) for j in range(nrows)])
 
-    # Read input data
-    # ---------------
+    # Check input data
+    # ----------------
     # pointers['xxx_nc'] = file name of input file
     # pointers['xxx'] = actual variable name in input file
 
-    logger.debug('Reading albisccp')
-    ntime2 = len(Dataset(pointers['albisccp_nc'], 'r').variables['time'][:])
-    albisccp_data = read_and_check(pointers['albisccp_nc'],
-                                   pointers['albisccp'], lons2, lats2, ntime2)
-    logger.debug('Reading pctisccp')
-    pctisccp_data = read_and_check(pointers['pctisccp_nc'],
-                                   pointers['pctisccp'], lons2, lats2, ntime2)
-    logger.debug('Reading cltisccp')
-    cltisccp_data = read_and_check(pointers['cltisccp_nc'],
-                                   pointers['cltisccp'], lons2, lats2, ntime2)
-    logger.debug('Reading rsut')
-    rsut_data = read_and_check(pointers['rsut_nc'],
-                               pointers['rsut'], lons2, lats2, ntime2)
-    logger.debug('Reading rsutcs')
-    rsutcs_data = read_and_check(pointers['rsutcs_nc'],
-                                 pointers['rsutcs'], lons2, lats2, ntime2)
-    logger.debug('Reading rlut')
-    rlut_data = read_and_check(pointers['rlut_nc'],
-                               pointers['rlut'], lons2, lats2, ntime2)
-    logger.debug('Reading rlutcs')
-    rlutcs_data = read_and_check(pointers['rlutcs_nc'],
-                                 pointers['rlutcs'], lons2, lats2, ntime2)
-    logger.debug('Reading sic')
-    sic_data = read_and_check(pointers['sic_nc'],
-                              pointers['sic'], lons2, lats2, ntime2)
-    if not pointers['snc_nc']:
-        logger.debug('Reading snw')
-        snc_data = read_and_check(pointers['snw_nc'],
-                                  pointers['snw'], lons2, lats2, ntime2)
-    else:
-        logger.debug('Reading snc')
-        snc_data = read_and_check(pointers['snc_nc'],
-                                  pointers['snc'], lons2, lats2, ntime2)
+    snow_var = 'snc' if pointers['snc_nc'] else 'snw'
+    input_vars = {'albisccp': 'albisccp', 'pctisccp': 'pctisccp',
+                  'cltisccp': 'cltisccp', 'rsut': 'rsut', 'rsutcs': 'rsutcs',
+                  'rlut': 'rlut', 'rlutcs': 'rlutcs', 'sic': 'sic',
+                  'snow': snow_var}
+
+    with Dataset(pointers['albisccp_nc'], 'r') as src_dataset:
+        ntime2 = len(src_dataset.variables['time'])
+    for var in input_vars.values():
+        logger.debug('Checking %s', var)
+        check_input(pointers[var + '_nc'], lons2, lats2, ntime2)
 
     # -----------------------------------------------------------
 
@@ -499,69 +579,48 @@ def crem_calc(pointers):
     model_ncf[:] = 999.9
     r_crem_pd[:] = 999.9
 
-    # Normalize data used for assignment to regimes to be in the range 0-1
-    pctisccp_data = pctisccp_data / 100000.0
-    cltisccp_data = cltisccp_data / 100.0
-
-    # Calculate cloud forcing
-    swcf_data = rsutcs_data - rsut_data
-    lwcf_data = rlutcs_data - rlut_data
-
-    # loop over 3 regions
-    # (0 = tropics, 1 = ice-free extra-tropics, 2 = snow/ice covered)
-    for idx_region, (region, regime) in enumerate(nregimes.items()):
-
-        # Set up validity mask for region
-
-        mask = pctisccp_data.copy()
-        if region == 'tropics':
-            mask[:, (lats2 < -20) | (lats2 > 20), :] = np.NAN
-        elif region == 'extra-tropics':
-            mask[:, (lats2 >= -20) & (lats2 <= 20), :] = np.NAN
-            mask[(snc_data >= 0.1) | (sic_data >= 0.1)] = np.NAN
-        elif region == 'snow-ice':
-            mask[:, (lats2 >= -20) & (lats2 <= 20), :] = np.NAN
-            mask[(snc_data < 0.1) & (sic_data < 0.1)] = np.NAN
-
-        mask[cltisccp_data == 0.0] = np.NAN
-
-        points = np.isfinite(mask)
-        npoints = len(mask[points])  # Number of valid data points in region
-
-        group = np.zeros(npoints)
-        e_d = np.zeros((npoints, regime))
-
-        swcf_data_pts = swcf_data[points]
-        lwcf_data_pts = lwcf_data[points]
-
-        # Assign model data to observed regimes
-
-        for i in range(regime):
-            e_d[:, i] = \
-                ((albisccp_data[points] - obs_alb[idx_region, i]) ** 2) + \
-                ((pctisccp_data[points] - obs_pct[idx_region, i]) ** 2) + \
-                ((cltisccp_data[points] - obs_clt[idx_region, i]) ** 2)
-
-        group[:] = np.argmin(e_d, axis=1)
-
-        for i in range(regime):
-            mem = (group == i)
-
-            count = len(group[mem])
-
-            if count > 0:
-
-                model_rfo[idx_region, i] = float(count) / float(npoints)
-                model_ncf[idx_region, i] = np.average(swcf_data_pts[mem]) \
-                    * solar_weights[idx_region] +                         \
-                    np.average(lwcf_data_pts[mem])
-            else:
-                logger.info("Model does not reproduce all observed cloud "
-                            "regimes.")
-                logger.info("Cannot calculate CREM. Abort.")
-                sys.exit()
-                model_rfo[idx_region, i] = 0.0
-                model_ncf[idx_region, i] = 0.0
+    centroids = np.stack([obs_alb, obs_pct, obs_clt], axis=-1)
+    npoints = np.zeros(numreg)
+    counts = np.zeros((numreg, numrgm))
+    sum_swcf = np.zeros((numreg, numrgm))
+    sum_lwcf = np.zeros((numreg, numrgm))
+
+    # Read input data and assign it to regimes chunk by chunk
+    # --------------------------------------------------------
+
+    with contextlib.ExitStack() as stack:
+        src_datasets = {
+            key: stack.enter_context(Dataset(pointers[var + '_nc'], 'r'))
+            for (key, var) in input_vars.items()
+        }
+        for start in range(0, ntime2, chunk_size):
+            time_slice = slice(start, min(start + chunk_size, ntime2))
+            logger.debug('Processing time steps %i to %i', time_slice.start,
+                         time_slice.stop - 1)
+            chunk = {
+                key: read_chunk(src_datasets[key], pointers[var], time_slice)
+                for (key, var) in input_vars.items()
+            }
+            chunk_stats = accumulate_regimes(chunk, lats2, nregimes,
+                                             centroids)
+            npoints += chunk_stats[0]
+            counts += chunk_stats[1]
+            sum_swcf += chunk_stats[2]
+            sum_lwcf += chunk_stats[3]
+
+    # Relative frequency of occurrence and net cloud forcing of regimes
+    for idx_region, regime in enumerate(nregimes.values()):
+        if np.any(counts[idx_region, :regime] == 0):
+            logger.info("Model does not reproduce all observed cloud "
+                        "regimes.")
+            logger.info("Cannot calculate CREM. Abort.")
+            sys.exit()
+        model_rfo[idx_region, :regime] = (counts[idx_region, :regime] /
+                                          npoints[idx_region])
+        model_ncf[idx_region, :regime] = (
+            sum_swcf[idx_region, :regime] / counts[idx_region, :regime] *
+            solar_weights[idx_region] +
+            sum_lwcf[idx_region, :regime] / counts[idx_region, :regime])
 
     # Calculation of eq 3 in WW09
     for idx_region, (region, regime) in enumerate(nregimes.items()):
@@ -25,7 +25,9 @@ metric : str, optional (default: 'regression_slope')
     constraint. Must be one of ``'regression_slope'``,
     ``'correlation_coefficient'``.
 n_jobs : int, optional (default: 1)
-    Maximum number of jobs spawned by this class.
+    Maximum number of threads used to process the spatial chunks in the
+    calculation of vertical level widths (values smaller than 1 use all
+    available cores).
 output_attributes : dict, optional
     Write additional attributes to netcdf files.
 pattern : str, optional
@@ -51,8 +53,6 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 from esmvalcore.cmor.fixes import add_plev_from_altitude, add_sigma_factory
-from joblib import Parallel, delayed
-from scipy.interpolate import interp1d
 from scipy.stats import linregress
 
 import esmvaltool.diag_scripts.emergent_constraints as ec
@@ -106,18 +106,84 @@ def _get_cube(datasets, short_name):
                           ih.var_name_constraint(short_name))
 
 
-def _get_level_width(air_pressure_bounds, ref_lev, ref_zg):
-    """Get level widths of a single grid cell."""
-    ref_lev = ref_lev.compressed()
-    ref_zg = ref_zg.compressed()
-    if len(ref_lev) < 2:
-        return np.full(air_pressure_bounds.shape[0], np.nan)
-    func = interp1d(ref_lev, ref_zg, kind='cubic', fill_value='extrapolate')
-    level_widths = []
-    for bounds in air_pressure_bounds:
-        level_width = abs(func(bounds[0]) - func(bounds[1]))
-        level_widths.append(level_width)
-    return np.array(level_widths)
+def _interpolate_altitude(air_pressure, ref_lev, ref_zg):
+    """Linearly interpolate pressure levels to altitude for many columns.
+
+    Parameters
+    ----------
+    air_pressure : numpy.ndarray
+        Target pressure levels of shape ``(n_columns, n_targets)``.
+    ref_lev : numpy.ndarray
+        Reference pressure levels of shape ``(n_ref_levels, )``.
+    ref_zg : numpy.ndarray
+        Geopotential height of shape ``(n_columns, n_ref_levels)`` at the
+        reference levels (missing values are given by ``NaN``).
+
+    Returns
+    -------
+    numpy.ndarray
+        Altitudes of shape ``(n_columns, n_targets)``. Values outside the
+        range of valid reference levels are linearly extrapolated using the
+        two outermost valid levels, columns with less than two valid levels
+        are set to ``NaN``.
+
+    """
+    sort_idx = np.argsort(ref_lev)
+    ref_lev = ref_lev[sort_idx]
+    ref_zg = ref_zg[:, sort_idx]
+    n_ref = ref_lev.shape[0]
+    valid = ~np.isnan(ref_zg)
+    ref_idx = np.broadcast_to(np.arange(n_ref), ref_zg.shape)
+
+    # For every reference level: index of last valid level below or at it
+    # and of first valid level above or at it (-1 or n_ref if not existent)
+    prev_valid = np.maximum.accumulate(np.where(valid, ref_idx, -1), axis=1)
+    next_valid = np.minimum.accumulate(
+        np.where(valid, ref_idx, n_ref)[:, ::-1], axis=1)[:, ::-1]
+
+    # Outermost valid levels (used for extrapolation)
+    first = np.clip(next_valid[:, :1], 0, n_ref - 1)
+    second = np.take_along_axis(next_valid, np.clip(first + 1, 0, n_ref - 1),
+                                axis=1)
+    last = np.clip(prev_valid[:, -1:], 0, n_ref - 1)
+    second_last = np.take_along_axis(prev_valid,
+                                     np.clip(last - 1, 0, n_ref - 1), axis=1)
+
+    # Valid neighbours of target levels
+    pos = np.searchsorted(ref_lev, air_pressure)
+    lower = np.where(
+        pos > 0,
+        np.take_along_axis(prev_valid, np.clip(pos - 1, 0, n_ref - 1),
+                           axis=1),
+        -1)
+    upper = np.where(
+        pos < n_ref,
+        np.take_along_axis(next_valid, np.clip(pos, 0, n_ref - 1), axis=1),
+        n_ref)
+    below = lower < 0
+    above = upper >= n_ref
+    idx_0 = np.where(below, first, np.where(above, second_last, lower))
+    idx_1 = np.where(below, second, np.where(above, last, upper))
+    idx_0 = np.clip(idx_0, 0, n_ref - 1)
+    idx_1 = np.clip(idx_1, 0, n_ref - 1)
+
+    # Linear interpolation
+    (lev_0, lev_1) = (ref_lev[idx_0], ref_lev[idx_1])
+    zg_0 = np.take_along_axis(ref_zg, idx_0, axis=1)
+    zg_1 = np.take_along_axis(ref_zg, idx_1, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (zg_1 - zg_0) / (lev_1 - lev_0)
+        altitude = zg_0 + (air_pressure - lev_0) * slope
+    altitude[valid.sum(axis=1) < 2] = np.nan
+    return altitude
+
+
+def _get_level_width_block(air_pressure_bounds, ref_zg, ref_lev):
+    """Get level widths of a block of grid cells."""
+    shape = air_pressure_bounds.shape
+    altitude = _interpolate_altitude(air_pressure_bounds.reshape(shape[0], -1),
+                                     ref_lev, ref_zg).reshape(shape)
+    return np.abs(altitude[..., 1] - altitude[..., 0])
 
 
 def _get_level_widths(cube, zg_cube, n_jobs=1):
@@ -132,22 +198,21 @@ def _get_level_widths(cube, zg_cube, n_jobs=1):
             f"Derived coordiante 'air_pressure' of cube "
             f"{cube.summary(shorten=True)} does not have bounds")
     if air_pressure_coord.shape == cube.shape:
-        air_pressure_bounds = air_pressure_coord.bounds
+        air_pressure_bounds = da.asarray(air_pressure_coord.core_bounds())
     else:
-        air_pressure_bounds = np.expand_dims(air_pressure_coord.bounds, 0)
-        air_pressure_bounds = np.broadcast_to(air_pressure_bounds,
+        air_pressure_bounds = da.expand_dims(
+            da.asarray(air_pressure_coord.core_bounds()), 0)
+        air_pressure_bounds = da.broadcast_to(air_pressure_bounds,
                                               cube.shape + (2, ))
-    air_pressure_bounds = np.moveaxis(air_pressure_bounds, z_idx, -2)
+    air_pressure_bounds = da.moveaxis(air_pressure_bounds, z_idx, -2)
     air_pressure_shape = air_pressure_bounds.shape[:-1]
     air_pressure_bounds = air_pressure_bounds.reshape(-1, cube.shape[z_idx], 2)
 
     # Geopotential height (pressure level -> altitude)
     (z_coord_zg, z_idx_zg) = _get_z_coord(zg_cube)
-    ref_zg = np.moveaxis(zg_cube.data, z_idx_zg,
+    ref_zg = da.moveaxis(zg_cube.lazy_data(), z_idx_zg,
                          -1).reshape(-1, zg_cube.shape[z_idx_zg])
-    mask = np.ma.getmaskarray(ref_zg)
-    ref_lev = np.expand_dims(z_coord_zg.points, 0)
-    ref_lev = np.ma.array(np.broadcast_to(ref_lev, ref_zg.shape), mask=mask)
+    ref_zg = da.ma.filled(ref_zg.astype(float), np.nan)
 
     # Check shapes
     if air_pressure_bounds.shape[0] != ref_zg.shape[0]:
@@ -156,12 +221,26 @@ def _get_level_widths(cube, zg_cube, n_jobs=1):
                          f"{zg_cube.summary(shorten=True)}, got shapes "
                          f"{air_pressure_bounds.shape} and {ref_zg.shape}")
 
-    # Cacluate level widths in parallel
-    parallel = Parallel(n_jobs=n_jobs)
-    level_widths = parallel(
-        [delayed(_get_level_width)(b, l, z) for (b, l, z) in zip(
-            air_pressure_bounds, ref_lev, ref_zg)]
-    )
+    # Calculate level widths (vectorized over all columns of a spatial chunk,
+    # chunks are processed in parallel)
+    air_pressure_bounds = air_pressure_bounds.rechunk({
+        0: 'auto',
+        1: -1,
+        2: -1,
+    })
+    ref_zg = ref_zg.rechunk({0: air_pressure_bounds.chunks[0], 1: -1})
+    level_widths = da.blockwise(_get_level_width_block,
+                                'ij',
+                                air_pressure_bounds,
+                                'ijk',
+                                ref_zg,
+                                'il',
+                                ref_lev=np.array(z_coord_zg.points,
+                                                 dtype=float),
+                                concatenate=True,
+                                dtype=float)
+    level_widths = level_widths.compute(
+        scheduler='threads', num_workers=n_jobs if n_jobs > 0 else None)
     level_widths = np.ma.masked_invalid(level_widths)
     level_widths = level_widths.reshape(air_pressure_shape)
     level_widths = np.moveaxis(level_widths, -1, z_idx)
@@ -758,7 +837,7 @@ def get_default_settings(cfg):
         'dpi': 600,
         'orientation': 'landscape',
     })
-    logger.info("Using at most %i processes", cfg['n_jobs'])
+    logger.info("Using at most %i threads", cfg['n_jobs'])
     return cfg
 
 
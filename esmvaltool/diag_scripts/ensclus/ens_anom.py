@@ -1,14 +1,50 @@
 """Computation of ensemble anomalies based on a desired value."""
 
 import os
+
+import dask.array as da
 import numpy as np
-from scipy import stats
 
 # User-defined packages
 from read_netcdf import read_iris, save_n_2d_fields
 from sel_season_area import sel_area, sel_season
 
 
+def _linear_trend(var, axis):
+    """Least-squares slope along axis, ignoring masked and NaN values."""
+    var = np.moveaxis(np.ma.filled(np.ma.asarray(var, dtype=float), np.nan),
+                      axis, 0)
+    time = np.arange(var.shape[0], dtype=float).reshape(
+        (-1, ) + (1, ) * (var.ndim - 1))
+    valid = ~np.isnan(var)
+    count = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        time_mean = np.where(valid, time, 0.0).sum(axis=0) / count
+        var_mean = np.where(valid, var, 0.0).sum(axis=0) / count
+        time_anom = np.where(valid, time - time_mean, 0.0)
+        var_anom = np.where(valid, var - var_mean, 0.0)
+        slope = ((time_anom * var_anom).sum(axis=0) /
+                 (time_anom**2).sum(axis=0))
+    return np.where(count > 1, slope, np.nan)
+
+
+def linear_trend(var, axis=0):
+    """Compute the linear trend per time step at every grid point.
+
+    Closed-form least-squares slope along axis (identical to the slope of
+    scipy.stats.linregress against range(n)) for all other dimensions at
+    once. Masked and NaN values are ignored, points with less than two
+    valid values are NaN. For dask arrays, the trend is computed lazily
+    chunk by chunk.
+    """
+    if isinstance(var, da.Array):
+        axis = axis % var.ndim
+        var = var.rechunk({axis: -1})
+        return da.map_blocks(_linear_trend, var, axis, drop_axis=axis,
+                             dtype=float)
+    return _linear_trend(var, axis)
+
+
 def ens_anom(filenames, dir_output, name_outputs, varname, numens, season,
              area, extreme):
     """Ensemble anomalies.
@@ -74,17 +110,11 @@ def ens_anom(filenames, dir_output, name_outputs, varname, numens, season,
 
     elif extreme == 'trend':
         # Compute the linear trend over the period, for each ensemble member
-        trendmap = np.empty((var_ens[0].shape[1], var_ens[0].shape[2]))
-        trendmap_ens = []
-        for i in range(numens):
-            for jla in range(var_ens[0].shape[1]):
-                for jlo in range(var_ens[0].shape[2]):
-                    slope, _, _, _, _ = \
-                        stats.linregress(range(var_ens[0].shape[0]),
-                                         var_ens[i][:, jla, jlo])
-                    trendmap[jla, jlo] = slope
-            trendmap_ens.append(trendmap.copy())
-        varextreme_ens = trendmap_ens
+        # (for all members at once if they have the same shape)
+        if len({var.shape for var in var_ens}) == 1:
+            varextreme_ens = linear_trend(np.stack(var_ens), axis=1)
+        else:
+            varextreme_ens = [linear_trend(var_ens[i]) for i in range(numens)]
 
     varextreme_ens_np = np.array(varextreme_ens)
     print('Anomalies are computed with respect to the {0}'.format(extreme))
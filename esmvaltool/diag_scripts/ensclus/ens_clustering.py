@@ -0,0 +1,118 @@
+"""K-means clustering of the principal components with multiple restarts."""
+
+import datetime
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+# Number of restarts between two checks of the convergence criterion
+RESTART_BATCH = 25
+
+
+def _fit_restarts(pcs, numclus, seeds, method, batch_size):
+    """Run one k-means restart for each seed."""
+    results = []
+    for seed in seeds:
+        if method == 'minibatch':
+            clus = MiniBatchKMeans(n_clusters=numclus, n_init=1,
+                                   init='k-means++', max_iter=1000,
+                                   batch_size=batch_size, random_state=seed)
+        else:
+            clus = KMeans(n_clusters=numclus, n_init=1,
+                          init='k-means++', tol=1e-4,
+                          max_iter=1000, random_state=seed)
+        clus.fit(pcs)
+        centroids = clus.cluster_centers_
+        labels = clus.predict(pcs)
+        inertia = np.sum((pcs - centroids[labels])**2)
+        results.append((inertia, centroids, labels))
+    return results
+
+
+def kmeans_clustering(pcs, numclus, method='kmeans', n_init=2000,
+                      patience=200, n_jobs=1, random_state=42,
+                      batch_size=1024, reference=False):
+    """Cluster the PCs with k-means and return the best of several restarts.
+
+    Each restart uses its own seed derived from random_state, so that the
+    result does not depend on the number of parallel processes. Restarts are
+    stopped early if the inertia did not improve for patience restarts.
+
+    Parameters
+    ----------
+    pcs: numpy.ndarray
+        PCs of shape (number of ensemble members, number of PCs).
+    numclus: int
+        Number of clusters.
+    method: str
+        'kmeans' (default) or 'minibatch' (for large ensembles).
+    n_init: int
+        Maximum number of restarts.
+    patience: int
+        Stop if the inertia did not improve for this number of restarts
+        (0 disables the early stop).
+    n_jobs: int
+        Number of processes running the restarts in parallel.
+    random_state: int
+        Seed for the restarts.
+    batch_size: int
+        Size of the mini-batches (only used for 'minibatch').
+    reference: bool
+        Additionally run the exhaustive baseline (KMeans with n_init
+        restarts) and report its inertia.
+
+    Returns
+    -------
+    tuple
+        Centroids of shape (numclus, number of PCs), labels of shape
+        (number of ensemble members,) and a dict with the achieved inertia,
+        the number of restarts and the baseline inertia (if computed).
+    """
+    if method not in ('kmeans', 'minibatch'):
+        raise ValueError(
+            "Clustering method must be 'kmeans' or 'minibatch', got "
+            "'{0}'".format(method))
+    seeds = np.random.RandomState(random_state).randint(
+        np.iinfo(np.int32).max, size=n_init)
+
+    start = datetime.datetime.now()
+    best = None
+    last_improvement = 0
+    n_restarts = 0
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for idx in range(0, n_init, RESTART_BATCH):
+            batch = seeds[idx:idx + RESTART_BATCH]
+            n_chunks = min(len(batch), effective_n_jobs(n_jobs))
+            chunks = np.array_split(batch, n_chunks)
+            results = parallel(
+                delayed(_fit_restarts)(pcs, numclus, chunk, method,
+                                       batch_size) for chunk in chunks)
+            for result in (res for chunk in results for res in chunk):
+                n_restarts += 1
+                if best is None or result[0] < best[0] * (1.0 - 1e-10):
+                    best = result
+                    last_improvement = n_restarts
+            if patience and n_restarts - last_improvement >= patience:
+                print('No improvement of inertia in the last {0} restarts, '
+                      'stopping after {1} of {2} restarts'
+                      .format(n_restarts - last_improvement, n_restarts,
+                              n_init))
+                break
+    end = datetime.datetime.now()
+    print('k-means algorithm took me %s seconds' % (end - start))
+
+    (inertia, centroids, labels) = best
+    report = {'inertia': inertia, 'n_restarts': n_restarts}
+    print('Inertia of best clustering: {0:.6g} ({1} restarts)'
+          .format(inertia, n_restarts))
+    if reference:
+        clus = KMeans(n_clusters=numclus, n_init=n_init,
+                      init='k-means++', tol=1e-4,
+                      max_iter=1000, random_state=random_state)
+        clus.fit(pcs)
+        report['reference_inertia'] = clus.inertia_
+        print('Inertia of exhaustive baseline ({0} restarts): {1:.6g} '
+              '(ratio achieved/baseline: {2:.6f})'
+              .format(n_init, clus.inertia_, inertia / clus.inertia_))
+    return centroids, labels, report
@@ -1,20 +1,20 @@
 """Find the most representative ensemble member for each cluster."""
 
 import collections
-import datetime
 import math
 import os
 
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
 
 # User-defined libraries
+from ens_clustering import kmeans_clustering
 from eof_tool import eof_computation
 from read_netcdf import read_n_2d_fields
 
 
-def ens_eof_kmeans(dir_output, name_outputs, numens, numpcs, perc, numclus):
+def ens_eof_kmeans(dir_output, name_outputs, numens, numpcs, perc, numclus,
+                   clustering=None, eof_method='exact'):
     """Find the most representative ensemble member for each cluster.
 
     METHODS:
@@ -23,6 +23,11 @@ def ens_eof_kmeans(dir_output, name_outputs, numens, numpcs, perc, numclus):
       Principal Components (PCs)
     OUTPUT:
     Frequency
+
+    The k-means analysis can be configured with the clustering dictionary
+    (see ens_clustering.kmeans_clustering). With eof_method 'randomized',
+    only the leading EOFs which are needed for the k-means analysis are
+    computed.
     """
     print('The name of the output files will be <variable>_{0}.txt'
           .format(name_outputs))
@@ -54,7 +59,20 @@ def ens_eof_kmeans(dir_output, name_outputs, numens, numpcs, perc, numclus):
     print('_________________________________________________________')
     print('EOF analysis:')
     # --------------------------------------------------------------------
-    _, _, _, pcs_unscal0, eofs_unscal0, varfrac = eof_computation(var, lat)
+    if eof_method == 'randomized':
+        # Only compute the leading EOFs, double their number until they
+        # explain perc of the total variance
+        neofs = numpcs if numpcs else min(10, numens)
+        while True:
+            _, _, _, pcs_unscal0, eofs_unscal0, varfrac = eof_computation(
+                var, lat, neofs=neofs, method=eof_method)
+            if (numpcs or neofs >= numens
+                    or np.sum(varfrac) * 100 > perc):
+                break
+            neofs = min(2 * neofs, numens)
+    else:
+        _, _, _, pcs_unscal0, eofs_unscal0, varfrac = eof_computation(
+            var, lat, method=eof_method)
 
     acc = np.cumsum(varfrac * 100)
     if numpcs:
@@ -77,16 +95,9 @@ def ens_eof_kmeans(dir_output, name_outputs, numens, numpcs, perc, numclus):
 
     pcs = pcs_unscal0[:, :numpcs]
 
-    clus = KMeans(n_clusters=numclus, n_init=2000,
-                  init='k-means++', tol=1e-4,
-                  max_iter=1000, random_state=42)
-    start = datetime.datetime.now()
-    clus.fit(pcs)
-    end = datetime.datetime.now()
-    print('k-means algorithm took me %s seconds' % (end - start))
-
-    centroids = clus.cluster_centers_          # shape---> (numclus,numpcs)
-    labels = clus.labels_                      # shape---> (numens,)
+    # centroids: shape---> (numclus,numpcs), labels: shape---> (numens,)
+    centroids, labels, report = kmeans_clustering(pcs, numclus,
+                                                  **(clustering or {}))
 
     print('\nClusters are identified for {0} PCs (explained variance {1}%)'
           .format(numpcs, "%.2f" % exctperc))
@@ -177,5 +188,10 @@ def ens_eof_kmeans(dir_output, name_outputs, numens, numpcs, perc, numclus):
     outfiles.append(namef)
     with open(namef, 'w') as text_file:
         text_file.write(stat_output.__repr__())
+        text_file.write('\n\nk-means inertia: {0} ({1} restarts)\n'
+                        .format(report['inertia'], report['n_restarts']))
+        if 'reference_inertia' in report:
+            text_file.write('k-means inertia of exhaustive baseline: {0}\n'
+                            .format(report['reference_inertia']))
 
     return outfiles
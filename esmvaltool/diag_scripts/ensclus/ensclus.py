@@ -93,7 +93,8 @@ def main(cfg):
 
     # ###################### EOF AND K-MEANS ANALYSES #######################
     outfiles2 = ens_eof_kmeans(out_dir, name_outputs, numens, numpcs,
-                               perc, cfg['numclus'])
+                               perc, cfg['numclus'], cfg.get('clustering'),
+                               cfg.get('eof_method', 'exact'))
 
     outfiles = outfiles + outfiles2
     provenance_record = get_provenance_record(
@@ -6,43 +6,48 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 import cartopy.crs as ccrs
-from eofs.standard import Eof
+from esmvaltool.diag_scripts.shared import truncated_eof
 
 
-def eof_computation(var, lat):
+def eof_computation(var, lat, neofs=None, method='exact'):
     """Computing the EOFs and PCs.
 
     EOF analysis of a data array with spatial dimensions that
     represent latitude and longitude with weighting. In this example
     the data array is dimensioned (ntime, nlat, nlon), and in order
     for the latitude weights to be broadcastable to this shape, an
-    extra length-1 dimension is added to the end
+    extra length-1 dimension is added to the end.
+    Only the leading neofs modes are computed (all if None), method is
+    'exact' (full SVD) or 'randomized' (randomized truncated SVD, see
+    esmvaltool.diag_scripts.shared.truncated_eof).
     """
     print('_________________________________________________________')
     print('Computing the EOFs and PCs')
     weights_array = np.sqrt(np.cos(np.deg2rad(lat)))[:, np.newaxis]
 
     start = datetime.datetime.now()
-    solver = Eof(var, weights=weights_array)
+    result = truncated_eof(var, n_modes=neofs, weights=weights_array,
+                           method=method, random_state=0)
     end = datetime.datetime.now()
     print('EOF computation took me %s seconds' % (end - start))
 
-    # ALL VARIANCE FRACTIONS
-    varfrac = solver.varianceFraction()
+    # VARIANCE FRACTIONS (of the total variance)
+    varfrac = result.variance_fraction
     # acc = np.cumsum(varfrac * 100)
 
     # ---------------------------------------PCs unscaled  (case 0 of scaling)
-    pcs_unscal0 = solver.pcs()
+    pcs_unscal0 = result.pcs
     # ---------------------------------------EOFs unscaled  (case 0 of scaling)
-    eofs_unscal0 = solver.eofs()
+    eofs_unscal0 = result.eofs
 
     # ---------------------------------------PCs scaled  (case 1 of scaling)
-    pcs_scal1 = solver.pcs(pcscaling=1)
+    pcs_scal1 = pcs_unscal0 / np.sqrt(result.eigenvalues)
 
     # ---------------------------------------EOFs scaled (case 2 of scaling)
-    eofs_scal2 = solver.eofs(eofscaling=2)
+    eofs_scal2 = eofs_unscal0 * np.sqrt(result.eigenvalues)[:, np.newaxis,
+                                                            np.newaxis]
 
-    return solver, pcs_scal1, eofs_scal2, pcs_unscal0, eofs_unscal0, varfrac
+    return result, pcs_scal1, eofs_scal2, pcs_unscal0, eofs_unscal0, varfrac
 
 
 def eof_plots(neof, pcs_scal1, eofs_scal2, var, varunits, lat, lon,
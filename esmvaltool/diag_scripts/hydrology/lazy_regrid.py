@@ -2,11 +2,24 @@
 
 Iris issue requesting the feature:
 https://github.com/SciTools/iris/issues/3700
+
+Besides the iris schemes, the sparse schemes ``bilinear`` and
+``conservative`` are supported. Their weights are computed once per pair of
+grids, stored as a sparse matrix (optionally cached on disk) and applied
+with a single sparse matrix multiplication per block of time steps.
 """
 import copy
+import hashlib
+import logging
+import os
+from pathlib import Path
 
+import dask
 import iris
 import numpy as np
+import scipy.sparse
+
+logger = logging.getLogger(Path(__file__).name)
 
 HORIZONTAL_SCHEMES = {
     'linear': iris.analysis.Linear(extrapolation_mode='mask'),
@@ -17,10 +30,30 @@ HORIZONTAL_SCHEMES = {
 }
 """Supported horizontal regridding schemes."""
 
+DEFAULT_BLOCK_BYTES = 50 * (1 << 20)  # 50 MB block size
+MIN_BLOCK_BYTES = 16 * (1 << 20)
+MAX_BLOCK_BYTES = 1 << 30
+
+_WEIGHTS_CACHE = {}
+
+
+def _get_block_bytes():
+    """Get the block size in bytes from the available memory.
+
+    Each worker thread may hold several blocks (source, target and
+    intermediate data) in memory at the same time.
+    """
+    try:
+        available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return DEFAULT_BLOCK_BYTES
+    block_bytes = available // (4 * dask.system.CPU_COUNT)
+    return int(np.clip(block_bytes, MIN_BLOCK_BYTES, MAX_BLOCK_BYTES))
+
 
 def _compute_chunks(src, tgt):
     """Compute the chunk sizes needed to regrid src to tgt."""
-    block_bytes = 50 * (1 << 20)  # 50 MB block size
+    block_bytes = _get_block_bytes()
 
     if src.dtype == np.float32:
         dtype_bytes = 4  # size of float32 in bytes
@@ -28,12 +61,15 @@ def _compute_chunks(src, tgt):
         dtype_bytes = 8  # size of float64 in bytes
 
     ntime = src.coord('time').shape[0]
+    src_size = (src.coord('latitude').shape[0] *
+                src.coord('longitude').shape[0])
     tgt_nlat = tgt.coord('latitude').shape[0]
     tgt_nlon = tgt.coord('longitude').shape[0]
 
     # Define blocks along the time dimension
-    min_nblocks = int(ntime * tgt_nlat * tgt_nlon * dtype_bytes / block_bytes)
-    min_nblocks = max(min_nblocks, 1)
+    step_bytes = (src_size + tgt_nlat * tgt_nlon) * dtype_bytes
+    min_nblocks = int(np.ceil(ntime * step_bytes / block_bytes))
+    min_nblocks = min(max(min_nblocks, 1), ntime)
     timefull = ntime // min_nblocks
     timepart = ntime % timefull
 
@@ -55,20 +91,204 @@ def _compute_chunks(src, tgt):
     return src_chunks, tgt_chunks
 
 
-def _regrid_data(src, tgt, scheme):
+def _get_bounds(coord):
+    """Get the cell bounds of a coordinate, guess them if necessary."""
+    if not coord.has_bounds():
+        coord = coord.copy()
+        coord.guess_bounds()
+    bounds = np.sort(coord.bounds.astype(np.float64), axis=1)
+    if coord.name() == 'latitude':
+        bounds = np.clip(bounds, -90., 90.)
+    return bounds
+
+
+def _linear_weights(src_coord, tgt_coord):
+    """Compute 1D linear interpolation weights, outside points get none."""
+    order = np.argsort(src_coord.points)
+    src_points = src_coord.points[order].astype(np.float64)
+    tgt_points = tgt_coord.points.astype(np.float64)
+    if getattr(src_coord, 'circular', False):
+        # map target onto [src_start, src_start + 360] and close the circle
+        order = np.append(order, order[0])
+        src_points = np.append(src_points, src_points[0] + 360.)
+        tgt_points = src_points[0] + (tgt_points - src_points[0]) % 360.
+
+    index = np.searchsorted(src_points, tgt_points, side='right') - 1
+    index = np.clip(index, 0, len(src_points) - 2)
+    frac = ((tgt_points - src_points[index]) /
+            (src_points[index + 1] - src_points[index]))
+    rows = np.flatnonzero((tgt_points >= src_points[0])
+                          & (tgt_points <= src_points[-1]))
+    index = index[rows]
+    frac = frac[rows]
+
+    weights = scipy.sparse.coo_matrix(
+        (np.concatenate([1. - frac, frac]),
+         (np.concatenate([rows, rows]),
+          np.concatenate([order[index], order[index + 1]]))),
+        shape=(len(tgt_points), len(src_coord.points)),
+    )
+    return weights.tocsr()
+
+
+def _conservative_weights(src_coord, tgt_coord):
+    """Compute 1D overlaps of cells (in sine of latitude for latitudes)."""
+    src_bounds = _get_bounds(src_coord)
+    tgt_bounds = _get_bounds(tgt_coord)
+    if src_coord.name() == 'latitude':
+        src_bounds = np.sin(np.deg2rad(src_bounds))
+        tgt_bounds = np.sin(np.deg2rad(tgt_bounds))
+        shifts = (0., )
+    else:
+        shifts = (-360., 0., 360.)
+
+    weights = np.zeros((len(tgt_bounds), len(src_bounds)))
+    for shift in shifts:
+        lower = np.maximum(tgt_bounds[:, [0]], src_bounds[:, 0] + shift)
+        upper = np.minimum(tgt_bounds[:, [1]], src_bounds[:, 1] + shift)
+        weights += np.clip(upper - lower, 0., None)
+
+    # Target cells that are not completely covered by the source grid get no
+    # weights (and are thus masked), as in iris.analysis.AreaWeighted
+    widths = tgt_bounds[:, 1] - tgt_bounds[:, 0]
+    weights[weights.sum(axis=1) < (1. - 1e-7) * widths] = 0.
+    return scipy.sparse.csr_matrix(weights)
+
+
+SPARSE_SCHEMES = {
+    'bilinear': (_linear_weights, 0.),
+    'conservative': (_conservative_weights, 1.),
+}
+"""Supported sparse regridding schemes with their 1D weights function and
+tolerated fraction of masked source data (as ``mdtol`` of
+:class:`iris.analysis.AreaWeighted`).
+
+``bilinear`` masks target points outside of the source grid and target points
+with a masked source neighbour of non-zero weight. Neighbours with zero
+weight, e.g. for target points on a latitude or longitude line of the source
+grid, are ignored. This is the same as :class:`iris.analysis.Linear` with
+``extrapolation_mode='mask'``, which interpolates the mask.
+
+``conservative`` masks target cells that are not completely covered by the
+source grid or that only overlap masked source cells, like
+:class:`iris.analysis.AreaWeighted` (``mdtol=1``). It differs from iris for
+target cells whose overlapping source cells are all masked but which touch an
+unmasked source cell at a boundary. Iris returns the value of that cell,
+while the sparse scheme masks the target cell.
+"""
+
+
+def _get_grid_hash(src, tgt, scheme):
+    """Compute a hash that identifies scheme and the grids of src and tgt."""
+    grid_hash = hashlib.sha256(scheme.encode())
+    for cube in (src, tgt):
+        for name in ('latitude', 'longitude'):
+            coord = cube.coord(name)
+            grid_hash.update(f'{name}:{getattr(coord, "circular", False)}'
+                             .encode())
+            grid_hash.update(coord.points.astype(np.float64).tobytes())
+            if coord.has_bounds():
+                grid_hash.update(coord.bounds.astype(np.float64).tobytes())
+    return grid_hash.hexdigest()
+
+
+def get_weights(src, tgt, scheme, weights_dir=None):
+    """Get the sparse matrix that regrids flattened (lat, lon) fields.
+
+    The weights are cached in memory and, if `weights_dir` is given, on
+    disk, keyed on the scheme and the grids of src and tgt.
+    """
+    key = _get_grid_hash(src, tgt, scheme)
+    if key in _WEIGHTS_CACHE:
+        return _WEIGHTS_CACHE[key]
+
+    filename = None
+    if weights_dir is not None:
+        filename = Path(weights_dir) / f'{scheme}_{key}.npz'
+        if filename.exists():
+            logger.info("Loading regridding weights from %s", filename)
+            weights = scipy.sparse.load_npz(filename).tocsr()
+            _WEIGHTS_CACHE[key] = weights
+            return weights
+
+    weights_function = SPARSE_SCHEMES[scheme][0]
+    weights = scipy.sparse.kron(
+        weights_function(src.coord('latitude'), tgt.coord('latitude')),
+        weights_function(src.coord('longitude'), tgt.coord('longitude')),
+        format='csr',
+    )
+    weights.eliminate_zeros()
+
+    if filename is not None:
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        tmp_filename = filename.with_suffix(f'.{os.getpid()}.tmp.npz')
+        scipy.sparse.save_npz(tmp_filename, weights, compressed=False)
+        os.replace(tmp_filename, filename)
+        logger.info("Saved regridding weights to %s", filename)
+    _WEIGHTS_CACHE[key] = weights
+    return weights
+
+
+def _apply_weights(block, weights, weight_sums, mdtol, tgt_shape):
+    """Regrid a (time, lat, lon) block with a single sparse matmul.
+
+    Target points are normalized by the weights of the valid source points
+    and masked if these are smaller than ``1 - mdtol`` times all weights.
+    """
+    ntime = block.shape[0]
+    data = block.reshape(ntime, -1)
+    mask = np.ma.getmask(data)
+    min_sums = (1. - mdtol) * weight_sums * (1. - 1e-7)
+    if mask is np.ma.nomask or (mask == mask[0]).all():
+        # Normalization and mask are the same for all time steps
+        if mask is np.ma.nomask:
+            valid_sums = weight_sums
+        else:
+            valid_sums = weights @ (~mask[0]).astype(np.float64)
+        result = weights @ np.ma.filled(data, 0.).T.astype(np.float64)
+        result_mask = (valid_sums <= 0.) | (valid_sums < min_sums)
+        result /= np.where(result_mask, 1., valid_sums)[:, np.newaxis]
+        result_mask = np.broadcast_to(result_mask, (ntime, len(weight_sums)))
+    else:
+        # Regrid data and valid points in one go
+        stacked = np.concatenate(
+            [np.ma.filled(data, 0.).astype(np.float64), ~mask], axis=0)
+        stacked = weights @ stacked.T
+        result, valid_sums = stacked[:, :ntime], stacked[:, ntime:]
+        result_mask = ((valid_sums <= 0.) |
+                       (valid_sums < min_sums[:, np.newaxis]))
+        np.divide(result, valid_sums, out=result, where=~result_mask)
+        result_mask = result_mask.T
+    result = np.ma.masked_array(result.T, mask=result_mask, dtype=block.dtype)
+    return result.reshape((ntime, ) + tgt_shape)
+
+
+def _regrid_data(src, tgt, scheme, weights_dir=None):
     """Regrid data from cube src onto grid of cube tgt."""
     src_chunks, tgt_chunks = _compute_chunks(src, tgt)
 
     # Define the block regrid function
-    if scheme not in HORIZONTAL_SCHEMES:
-        raise ValueError(f"Regridding scheme {scheme} not supported, "
-                         f"choose from {HORIZONTAL_SCHEMES.keys()}.")
-    regridder = HORIZONTAL_SCHEMES[scheme].regridder(src, tgt)
+    if scheme in SPARSE_SCHEMES:
+        weights = get_weights(src, tgt, scheme, weights_dir)
+        weight_sums = np.asarray(weights.sum(axis=1)).ravel()
+        mdtol = SPARSE_SCHEMES[scheme][1]
+        tgt_shape = (tgt.coord('latitude').shape[0],
+                     tgt.coord('longitude').shape[0])
 
-    def regrid(block):
-        tlen = block.shape[0]
-        cube = src[:tlen].copy(block)
-        return regridder(cube).core_data()
+        def regrid(block):
+            return _apply_weights(block, weights, weight_sums, mdtol,
+                                  tgt_shape)
+    elif scheme in HORIZONTAL_SCHEMES:
+        regridder = HORIZONTAL_SCHEMES[scheme].regridder(src, tgt)
+
+        def regrid(block):
+            tlen = block.shape[0]
+            cube = src[:tlen].copy(block)
+            return regridder(cube).core_data()
+    else:
+        schemes = list(HORIZONTAL_SCHEMES) + list(SPARSE_SCHEMES)
+        raise ValueError(f"Regridding scheme {scheme} not supported, "
+                         f"choose from {schemes}.")
 
     # Regrid
     data = src.core_data().rechunk(src_chunks).map_blocks(
@@ -80,9 +300,12 @@ def _regrid_data(src, tgt, scheme):
     return data
 
 
-def lazy_regrid(src, tgt, scheme):
-    """Regrid cube src onto the grid of cube tgt."""
-    data = _regrid_data(src, tgt, scheme)
+def lazy_regrid(src, tgt, scheme, weights_dir=None):
+    """Regrid cube src onto the grid of cube tgt.
+
+    Weights of the sparse schemes are cached in `weights_dir` if given.
+    """
+    data = _regrid_data(src, tgt, scheme, weights_dir)
 
     result = iris.cube.Cube(data)
     result.metadata = copy.deepcopy(src.metadata)
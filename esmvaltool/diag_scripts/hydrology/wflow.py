@@ -90,14 +90,18 @@ def lapse_rate_correction(height):
     return height * gamma
 
 
-def regrid_temperature(src_temp, src_height, target_height, scheme):
+def regrid_temperature(src_temp,
+                       src_height,
+                       target_height,
+                       scheme,
+                       weights_dir=None):
     """Convert temperature to target grid with lapse rate correction."""
     # Convert 2m temperature to sea-level temperature (slt)
     src_dtemp = lapse_rate_correction(src_height)
     src_slt = src_temp.copy(data=src_temp.core_data() + src_dtemp.core_data())
 
     # Interpolate sea-level temperature to target grid
-    target_slt = lazy_regrid(src_slt, target_height, scheme)
+    target_slt = lazy_regrid(src_slt, target_height, scheme, weights_dir)
 
     # Convert sea-level temperature to new target elevation
     target_dtemp = lapse_rate_correction(target_height)
@@ -216,7 +220,9 @@ def main(cfg):
 
         logger.info("Processing variable precipitation_flux")
         scheme = cfg['regrid']
-        pr_dem = lazy_regrid(all_vars['pr'], dem, scheme)
+        weights_dir = cfg.get('regrid_weights_dir',
+                              Path(cfg['work_dir']) / 'regrid_weights')
+        pr_dem = lazy_regrid(all_vars['pr'], dem, scheme, weights_dir)
 
         logger.info("Processing variable temperature")
         tas_dem = regrid_temperature(
@@ -224,17 +230,18 @@ def main(cfg):
             all_vars['orog'],
             dem,
             scheme,
+            weights_dir,
         )
 
         logger.info("Processing variable potential evapotranspiration")
         if 'evspsblpot' in all_vars:
             pet = all_vars['evspsblpot']
-            pet_dem = lazy_regrid(pet, dem, scheme)
+            pet_dem = lazy_regrid(pet, dem, scheme, weights_dir)
         else:
             logger.info("Potential evapotransporation not available, deriving")
-            psl_dem = lazy_regrid(all_vars['psl'], dem, scheme)
-            rsds_dem = lazy_regrid(all_vars['rsds'], dem, scheme)
-            rsdt_dem = lazy_regrid(all_vars['rsdt'], dem, scheme)
+            psl_dem = lazy_regrid(all_vars['psl'], dem, scheme, weights_dir)
+            rsds_dem = lazy_regrid(all_vars['rsds'], dem, scheme, weights_dir)
+            rsdt_dem = lazy_regrid(all_vars['rsdt'], dem, scheme, weights_dir)
             pet_dem = debruin_pet(
                 tas=tas_dem,
                 psl=psl_dem,
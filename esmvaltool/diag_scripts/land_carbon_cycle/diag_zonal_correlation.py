@@ -21,7 +21,6 @@ from esmvaltool.diag_scripts.shared import (
 
 import esmvaltool.diag_scripts.land_carbon_cycle.plot_utils as plut
 from esmvaltool.diag_scripts.land_carbon_cycle.shared import (
-    _apply_common_mask,
     _get_obs_data_zonal,
     _load_variable,
     _remove_invalid,
@@ -102,46 +101,111 @@ def partial_corr(dat_columns, fig_config):
     return r123
 
 
+def _get_partial_corr_from_moments(sums, num_points):
+    """
+    Calculate partial correlations from sums of first and second moments.
+
+    Argument:
+    --------
+        sums - tuple of sums of the variables (shape (3, ...)) and sums of
+        their products (shape (3, 3, ...))
+        num_points - number of data points
+
+    Return:
+    ------
+        r12.3 and r13.2, correlations between variable 1 and 2 (3)
+        controlled for 3 (2)
+    """
+    (sum_1, sum_2) = sums
+    cov = sum_2 - sum_1[:, np.newaxis] * sum_1[np.newaxis] / num_points
+    std = np.sqrt(np.diagonal(cov, axis1=0, axis2=1))
+    std = np.moveaxis(std, -1, 0)
+    r12 = cov[0, 1] / (std[0] * std[1])
+    r13 = cov[0, 2] / (std[0] * std[2])
+    r23 = cov[1, 2] / (std[1] * std[2])
+    r123 = (r12 - r13 * r23) / np.sqrt((1 - r13**2) * (1 - r23**2))
+    r132 = (r13 - r12 * r23) / np.sqrt((1 - r12**2) * (1 - r23**2))
+    return r123, r132
+
+
 def _calc_zonal_correlation(dat_tau, dat_pr, dat_tas, dat_lats, fig_config):
     """
     Calculate zonal partial correlations for sliding windows.
 
+    For pearson correlations, all windows are computed at once from
+    cumulative sums (along latitude) of the first and second moments of
+    the data. The data may contain leading dimensions (e.g. models on a
+    common grid), which are processed at once, too.
+
     Argument:
     --------
-        dat_tau - data of global tau
-        dat_pr - precipitation
-        dat_tas - air temperature
+        dat_tau - data of global tau (..., lat, lon)
+        dat_pr - precipitation (..., lat, lon)
+        dat_tas - air temperature (..., lat, lon)
         dat_lats - latitude of the given model
         fig_config - figure/diagnostic configurations
 
     Return:
     ------
-        corr_dat zonal correlations
+        corr_dat zonal correlations (..., lat, 2)
     """
     # get the interval of latitude and create array for partial correlation
     lat_int = abs(dat_lats[1] - dat_lats[0])
-    corr_dat = np.ones((np.shape(dat_tau)[0], 2)) * np.nan
+    corr_dat = np.ones(np.shape(dat_tau)[:-1] + (2, )) * np.nan
 
     # get the size of the sliding window based on the bandsize in degrees
     window_size = round(fig_config['bandsize'] / (lat_int * 2.))
-
-    dat_tau, dat_pr, dat_tas = _apply_common_mask(dat_tau, dat_pr, dat_tas)
+    n_lats = np.shape(dat_tau)[-2]
+    lat_index = np.arange(n_lats)
+    istart = np.maximum(0, lat_index - window_size)
+    iend = np.minimum(np.size(dat_lats), lat_index + window_size + 1)
+
+    # common mask of all variables
+    dat_all = np.ma.filled(
+        np.ma.masked_invalid(np.ma.stack(
+            (dat_tau, dat_pr, dat_tas)).astype(float)), np.nan)
+    valid = np.all(np.isfinite(dat_all), axis=0)
     # minimum 1/8 of the given window has valid data points
-    min_points = np.shape(dat_tau)[1] * fig_config['min_points_frac']
-    for lat_index in range(len(corr_dat)):
-        istart = np.int(max(0, lat_index - window_size))
-        iend = np.int(min(np.size(dat_lats), lat_index + window_size + 1))
-        dat_tau_zone = dat_tau[istart:iend, :]
-        dat_pr_zone = dat_pr[istart:iend, :]
-        dat_tas_zone = dat_tas[istart:iend, :]
-        dat_x = np.ma.masked_invalid(dat_tau_zone).compressed().flatten()
-        dat_y = np.ma.masked_invalid(dat_pr_zone).compressed().flatten()
-        dat_z = np.ma.masked_invalid(dat_tas_zone).compressed().flatten()
-        num_valid_points = sum(~np.isnan(dat_x + dat_y + dat_z))
-        if num_valid_points > min_points:
-            corr_dat[lat_index, 1] = partial_corr(
+    min_points = np.shape(dat_tau)[-1] * fig_config['min_points_frac']
+
+    # number of valid data points in each window
+    cum_valid = np.cumsum(np.sum(valid, axis=-1), axis=-1)
+    cum_valid = np.concatenate(
+        (np.zeros(cum_valid.shape[:-1] + (1, )), cum_valid), axis=-1)
+    num_valid_points = cum_valid[..., iend] - cum_valid[..., istart]
+    windows = num_valid_points > min_points
+
+    if fig_config['correlation_method'] == 'pearson':
+        # remove mean to avoid loss of precision in the cumulative sums
+        dat_all = dat_all - np.nanmean(
+            dat_all, axis=(-2, -1), keepdims=True)
+        dat_all[:, ~valid] = 0.0
+        moments = (np.sum(dat_all, axis=-1),
+                   np.einsum('i...k,j...k->ij...', dat_all, dat_all))
+        sums = []
+        for moment in moments:
+            cum_moment = np.cumsum(moment, axis=-1)
+            cum_moment = np.concatenate(
+                (np.zeros(cum_moment.shape[:-1] + (1, )), cum_moment),
+                axis=-1)
+            sums.append(cum_moment[..., iend] - cum_moment[..., istart])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            (r_pr, r_tas) = _get_partial_corr_from_moments(
+                sums, num_valid_points)
+        corr_dat[..., 1] = np.where(windows, r_pr, np.nan)
+        corr_dat[..., 0] = np.where(windows, r_tas, np.nan)
+    else:
+        # rank correlations need the data of each window
+        for index in np.ndindex(windows.shape):
+            if not windows[index]:
+                continue
+            zone = slice(istart[index[-1]], iend[index[-1]])
+            dat_zone = dat_all[(slice(None), ) + index[:-1]][:, zone]
+            zone_valid = valid[index[:-1]][zone]
+            (dat_x, dat_y, dat_z) = dat_zone[:, zone_valid]
+            corr_dat[index + (1, )] = partial_corr(
                 np.vstack((dat_x, dat_y, dat_z)).T, fig_config)
-            corr_dat[lat_index, 0] = partial_corr(
+            corr_dat[index + (0, )] = partial_corr(
                 np.vstack((dat_x, dat_z, dat_y)).T, fig_config)
     return corr_dat
 
@@ -383,8 +447,8 @@ def main(diag_config):
                                      'dataset')
     fig_config = _get_fig_config(diag_config)
     zonal_correlation_mod = {}
+    model_data = {}
     for model_name, model_dataset in model_data_dict.items():
-        zonal_correlation_mod[model_name] = {}
         mod_coords = {}
         ctotal = _load_variable(model_dataset, 'ctotal')
         gpp = _load_variable(model_dataset, 'gpp')
@@ -400,11 +464,28 @@ def main(diag_config):
         _tau_dat = _remove_invalid(tau_ctotal.data, fill_value=np.nan)
         _precip_dat = _remove_invalid(precip.data, fill_value=np.nan)
         _tas_dat = _remove_invalid(tas.data, fill_value=np.nan)
-        zon_corr = _calc_zonal_correlation(_tau_dat, _precip_dat, _tas_dat,
-                                           mod_coords['latitude'].points,
-                                           fig_config)
-        zonal_correlation_mod[model_name]['data'] = zon_corr
-        zonal_correlation_mod[model_name]['latitude'] = mod_coords['latitude']
+        model_data[model_name] = (_tau_dat, _precip_dat, _tas_dat,
+                                  mod_coords['latitude'])
+
+    # calculate the correlations of all models at once if they share a grid
+    model_shapes = [np.shape(dat[0]) for dat in model_data.values()]
+    model_lats = [dat[3].points for dat in model_data.values()]
+    if all(
+            shape == model_shapes[0] and np.array_equal(lats, model_lats[0])
+            for (shape, lats) in zip(model_shapes, model_lats)):
+        zon_corrs = _calc_zonal_correlation(
+            *[np.stack([dat[idx] for dat in model_data.values()])
+              for idx in range(3)], model_lats[0], fig_config)
+    else:
+        zon_corrs = [
+            _calc_zonal_correlation(*dat[:3], dat[3].points, fig_config)
+            for dat in model_data.values()
+        ]
+    for (model_name, zon_corr) in zip(model_data, zon_corrs):
+        zonal_correlation_mod[model_name] = {
+            'data': zon_corr,
+            'latitude': model_data[model_name][3],
+        }
     zonal_correlation_obs = _get_obs_data_zonal(diag_config)
 
     base_name = '{title}_{corr}_{source_label}_{grid_label}z'.format(
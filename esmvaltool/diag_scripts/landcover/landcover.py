@@ -47,6 +47,9 @@ from esmvaltool.diag_scripts.shared import ProvenanceLogger
 
 logger = logging.getLogger(os.path.basename(__file__))
 
+# Region labels and cell areas for each grid (see get_region_grid)
+_REGION_GRIDS = {}
+
 
 def write_plotdata(infos, modnam, values):
     """Write region values for all datasets of one variable.
@@ -241,22 +244,72 @@ def make_landcover_bars(cfg, regnam, modnam, values, var):
         pdf.close()
 
 
-def sel_lats(latlist, bounds):
-    """Return subset of latitudes within bounds.
+def get_region_grid(cube, regdef):
+    """Return region labels and cell areas for the grid of a cube.
+
+    Each grid cell is labelled with the (1-based) index of the latitude
+    band in ``regdef`` it belongs to (0 for cells outside of all bands).
+    Regions with bounds ``None`` (global) are not labelled, the latitude
+    bands must not overlap. Labels and areas are computed only once for
+    each unique grid.
 
     Parameters
     ----------
-    latlist : numpy array
-        contains all latitudes for the cube
-    bounds : list
-        bounds for latitude selection
+    cube : iris.cube.Cube
+        cube with latitude and longitude coordinates
+    regdef : dict
+        region names and latitude bounds (or None for the whole globe)
     """
-    subset = []
-    for lat in latlist.tolist():
-        if min(bounds) < lat < max(bounds):
-            subset.append(lat)
+    lats = cube.coord('latitude')
+    lons = cube.coord('longitude')
+    key = (cube.shape, cube.coord_dims(lats), cube.coord_dims(lons),
+           lats.points.tobytes(), lons.points.tobytes(),
+           tuple((reg, None if bounds is None else tuple(bounds))
+                 for (reg, bounds) in regdef.items()))
+    if key not in _REGION_GRIDS:
+        lat_labels = np.zeros(lats.shape, dtype=int)
+        for (idx, bounds) in enumerate(regdef.values()):
+            if bounds is not None:
+                lat_labels[(min(bounds) < lats.points)
+                           & (lats.points < max(bounds))] = idx + 1
+        labels = iris.util.broadcast_to_shape(lat_labels, cube.shape,
+                                              cube.coord_dims(lats))
+        cellarea = iris.analysis.cartography.area_weights(cube)
+        _REGION_GRIDS[key] = (labels.ravel(), cellarea.ravel())
+    return _REGION_GRIDS[key]
+
+
+def reduce_regions(cube, regdef):
+    """Return area sums and area weighted means of all regions.
+
+    All regions are reduced in a single pass over the data. Missing values
+    are ignored.
 
-    return subset
+    Parameters
+    ----------
+    cube : iris.cube.Cube
+        cube with latitude and longitude coordinates
+    regdef : dict
+        region names and latitude bounds (or None for the whole globe)
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        area weighted sums and areas of valid cells for each region in
+        the order of ``regdef``.
+    """
+    (labels, cellarea) = get_region_grid(cube, regdef)
+    data = np.ma.masked_invalid(cube.data).ravel()
+    weights = np.where(np.ma.getmaskarray(data), 0.0, cellarea)
+    nlabels = len(regdef) + 1
+    sums = np.bincount(labels, weights=weights * np.ma.filled(data, 0.0),
+                       minlength=nlabels)
+    areas = np.bincount(labels, weights=weights, minlength=nlabels)
+    for (idx, bounds) in enumerate(regdef.values()):
+        if bounds is None:
+            sums[idx + 1] = sums.sum()
+            areas[idx + 1] = areas.sum()
+    return (sums[1:], areas[1:])
 
 
 def get_timmeans(attr, cubes, refset, prov_rec):
@@ -379,42 +432,14 @@ def compute_landcover(var, lcdata, cubes):
     for sub_cube in cubes:
         modnam['area'].append(sub_cube.var_name)
         modnam['frac'].append(sub_cube.var_name)
-        cellarea = sub_cube.copy()
-        cellarea.name = 'cellarea'
-        cellarea.data = iris.analysis.cartography.area_weights(cubes[0])
-        row = {'area': [], 'frac': []}
+        (sums, areas) = reduce_regions(sub_cube, regdef)
         # Compute land cover area in million km2:
         # area = Percentage * 0.01 * area [m2]
         #      / 1.0e+6 [km2]
         #      / 1.0e+6 [1.0e+6 km2]
-        coverarea = sub_cube.copy()
-        coverarea.data *= (0.01 * cellarea.data / 1.0E+6 / 1.0e+6)
-        # Sum over area for different regions
-        for reg in regdef:
-            if regdef[reg] is not None:
-                zone = iris.Constraint(
-                    latitude=sel_lats(
-                        sub_cube.coord('latitude').points, regdef[reg]))
-                row['area'].append(
-                    coverarea.extract(zone).collapsed(
-                        ['longitude', 'latitude'],
-                        iris.analysis.SUM).data.tolist())
-                row['frac'].append(
-                    sub_cube.extract(zone).collapsed(
-                        ['longitude', 'latitude'],
-                        iris.analysis.MEAN,
-                        weights=cellarea.extract(zone).data).data.tolist())
-
-            else:
-                row['area'].append(
-                    coverarea.collapsed(['longitude', 'latitude'],
-                                        iris.analysis.SUM).data.tolist())
-                row['frac'].append(
-                    sub_cube.collapsed(['longitude', 'latitude'],
-                                       iris.analysis.MEAN,
-                                       weights=cellarea.data).data.tolist())
-        values['area'].append(row['area'])
-        values['frac'].append(row['frac'])
+        values['area'].append((sums * 0.01 / 1.0E+6 / 1.0e+6).tolist())
+        with np.errstate(invalid='ignore'):
+            values['frac'].append((sums / areas).tolist())
     # Compute relative bias in average fractions compared to reference
     reffrac = np.array(values['frac'][-1])
     for imod, modfrac in enumerate(values['frac'][:-1]):
@@ -0,0 +1,294 @@
+"""Batched local explanations based on :mod:`lime`.
+
+Note
+----
+:meth:`lime.lime_tabular.LimeTabularExplainer.explain_instance` explains a
+single instance per call, which requires thousands of ``predict()`` calls and
+one regression fit for every prediction point. For gridded prediction input
+(e.g. 64800 grid cells times several years), this is not feasible. The class
+:class:`BatchedLimeExplainer` provided by this module reproduces the
+explanations of a (fitted) :class:`lime.lime_tabular.LimeTabularExplainer`
+(regression mode, continuous features are not discretized) but processes many
+instances at once: perturbations are sampled for a whole batch of instances,
+the model is evaluated with a single ``predict()`` call per batch and the
+weighted ridge regressions of all instances are solved simultaneously.
+
+In addition, explanations can be calculated for a subset of the instances only
+and interpolated to the others (``max_points``) and, for models where the
+local coefficients are analytic (e.g. linear models or Gaussian process
+regression), be given in closed form by the gradient of the model
+(``analytic``).
+
+"""
+
+import logging
+import os
+
+import numpy as np
+from joblib import Parallel, delayed
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+
+def _weighted_ridge(x_data, y_data, weights, alpha):
+    """Solve weighted ridge regressions (with intercept) for many instances.
+
+    Equivalent to fitting :class:`sklearn.linear_model.Ridge` with
+    ``sample_weight`` for every instance (first axis) separately.
+
+    """
+    n_features = x_data.shape[-1]
+    weights_sum = weights.sum(axis=1)[:, np.newaxis]
+    x_mean = np.einsum('bs,bsf->bf', weights, x_data) / weights_sum
+    y_mean = np.sum(weights * y_data, axis=1)[:, np.newaxis] / weights_sum
+    x_centered = x_data - x_mean[:, np.newaxis, :]
+    y_centered = y_data - y_mean
+    weighted_x = x_centered * weights[..., np.newaxis]
+    lhs = (np.einsum('bsf,bsg->bfg', weighted_x, x_centered) +
+           alpha * np.eye(n_features))
+    rhs = np.einsum('bsf,bs->bf', weighted_x, y_centered)
+    return np.linalg.solve(lhs, rhs[..., np.newaxis])[..., 0]
+
+
+class BatchedLimeExplainer():
+    """Batched version of :class:`lime.lime_tabular.LimeTabularExplainer`.
+
+    Parameters
+    ----------
+    explainer : lime.lime_tabular.LimeTabularExplainer
+        Fitted explainer (with ``mode='regression'`` and
+        ``discretize_continuous=False``). Its scaler, sampling strategy,
+        categorical feature statistics and kernel are used.
+    predict_fn : callable
+        Prediction function of the model, has to accept a
+        :class:`numpy.ndarray` of shape ``(n_samples, n_features)``.
+    num_samples : int, optional (default: 5000)
+        Size of the neighborhood used to fit the local linear models (as in
+        :meth:`lime.lime_tabular.LimeTabularExplainer.explain_instance`).
+    num_features : int, optional (default: 10)
+        Maximum number of features present in an explanation (as in
+        :meth:`lime.lime_tabular.LimeTabularExplainer.explain_instance`).
+    max_points : int, optional
+        If given, only explain (evenly spaced) ``max_points`` instances and
+        linearly interpolate the local coefficients to all other instances
+        (along the order of the given instances).
+    analytic : bool, optional (default: False)
+        Use the gradient of ``predict_fn`` (calculated with central finite
+        differences) as local coefficients instead of sampling-based local
+        linear models. These are identical in expectation for linear models
+        and the exact local coefficients of smooth models like Gaussian
+        process regression. Only possible without categorical features.
+    batch_size : int, optional
+        Number of instances processed in a single ``predict_fn()`` call. By
+        default, this is chosen so that each call contains approximately
+        :math:`2^{20}` samples.
+    n_jobs : int, optional (default: 1)
+        Maximum number of batches processed in parallel.
+    random_state : int or numpy.random.RandomState, optional
+        Seed for the random perturbations.
+
+    Raises
+    ------
+    ValueError
+        ``analytic`` is ``True`` and categorical features are present.
+
+    """
+
+    def __init__(self, explainer, predict_fn, num_samples=5000,
+                 num_features=10, max_points=None, analytic=False,
+                 batch_size=None, n_jobs=1, random_state=None):
+        """Initialize class members."""
+        self.explainer = explainer
+        self.predict_fn = predict_fn
+        self.num_samples = num_samples
+        self.num_features = num_features
+        self.max_points = max_points
+        self.analytic = analytic
+        self.n_jobs = n_jobs
+        if isinstance(random_state, np.random.RandomState):
+            self.random_state = random_state
+        else:
+            self.random_state = np.random.RandomState(random_state)
+        self.categorical_features = list(explainer.categorical_features)
+        if analytic and self.categorical_features:
+            raise ValueError(
+                f"Analytic local coefficients are not possible with "
+                f"categorical features, got {self.categorical_features}")
+        if batch_size is None:
+            samples_per_instance = (2 * len(explainer.scaler.scale_)
+                                    if analytic else num_samples)
+            batch_size = max(1, 2**20 // samples_per_instance)
+        self.batch_size = batch_size
+
+    def feature_importance(self, x_data):
+        """Get local feature importance (normalized absolute coefficients).
+
+        Parameters
+        ----------
+        x_data : numpy.ndarray
+            Instances of shape ``(n_points, n_features)``.
+
+        Returns
+        -------
+        numpy.ndarray
+            Local feature importance of shape ``(n_points, n_features)``
+            (sums up to 1 for every point).
+
+        """
+        abs_coefs = np.abs(self.local_coefficients(x_data))
+        norm = abs_coefs.sum(axis=1)[:, np.newaxis]
+        return np.divide(abs_coefs,
+                         norm,
+                         out=np.zeros(abs_coefs.shape),
+                         where=(norm > 0.0))
+
+    def local_coefficients(self, x_data):
+        """Get coefficients of local linear models (in scaled feature space).
+
+        Parameters
+        ----------
+        x_data : numpy.ndarray
+            Instances of shape ``(n_points, n_features)``.
+
+        Returns
+        -------
+        numpy.ndarray
+            Local coefficients of shape ``(n_points, n_features)``.
+
+        """
+        x_data = np.asarray(x_data, dtype=np.float64)
+        n_points = x_data.shape[0]
+        if self.max_points is not None and n_points > self.max_points:
+            idx = np.unique(
+                np.linspace(0, n_points - 1, self.max_points).round().astype(
+                    int))
+            logger.info(
+                "Calculating local explanations for %i of %i point(s) and "
+                "interpolating the others", len(idx), n_points)
+            sub_coefs = self.local_coefficients(x_data[idx])
+            all_idx = np.arange(n_points)
+            return np.stack([
+                np.interp(all_idx, idx, sub_coefs[:, col])
+                for col in range(sub_coefs.shape[1])
+            ], axis=1)
+
+        # Process batches (in parallel if desired)
+        batches = [
+            x_data[idx:idx + self.batch_size]
+            for idx in range(0, n_points, self.batch_size)
+        ]
+        seeds = self.random_state.randint(np.iinfo(np.int32).max,
+                                          size=len(batches))
+        if self.analytic:
+            func = self._get_gradient_coefs
+        else:
+            func = self._get_lime_coefs
+        parallel = Parallel(n_jobs=self.n_jobs)
+        coefs = parallel(
+            [delayed(func)(batch, seed) for (batch, seed) in zip(
+                batches, seeds)])
+        if not coefs:
+            return np.empty((0, x_data.shape[1]))
+        return np.concatenate(coefs)
+
+    def propagated_squared_errors(self, x_data, x_err):
+        """Propagate errors of instances linearly using local coefficients.
+
+        Categorical features are ignored.
+
+        Parameters
+        ----------
+        x_data : numpy.ndarray
+            Instances of shape ``(n_points, n_features)``.
+        x_err : numpy.ndarray
+            Errors of instances of shape ``(n_points, n_features)``. Missing
+            values are interpreted as ``0.0``.
+
+        Returns
+        -------
+        numpy.ndarray
+            Squared propagated errors of shape ``(n_points, )``.
+
+        """
+        coefs = self.local_coefficients(x_data)
+        x_err_scaled = (np.nan_to_num(np.asarray(x_err, dtype=np.float64)) /
+                        self.explainer.scaler.scale_)
+        squared_errors = (x_err_scaled * coefs)**2
+        squared_errors[:, self.categorical_features] = 0.0
+        return squared_errors.sum(axis=1)
+
+    def _get_feature_mask(self, coefs, scaled_instances):
+        """Get mask of features with highest weights (``num_features``)."""
+        scores = np.abs(coefs * scaled_instances)
+        ranks = np.argsort(np.argsort(-scores, axis=1), axis=1)
+        return ranks < self.num_features
+
+    def _get_gradient_coefs(self, x_data, _, step=1e-3):
+        """Get local coefficients from gradients (central differences)."""
+        (n_points, n_features) = x_data.shape
+        offsets = step * np.diag(self.explainer.scaler.scale_)
+        x_eval = np.concatenate([
+            x_data[:, np.newaxis, :] + offsets,
+            x_data[:, np.newaxis, :] - offsets,
+        ], axis=1)
+        y_eval = np.asarray(self.predict_fn(x_eval.reshape(-1, n_features)))
+        y_eval = y_eval.reshape(n_points, 2, n_features)
+        coefs = (y_eval[:, 0] - y_eval[:, 1]) / (2.0 * step)
+        if n_features > self.num_features:
+            scaled_data = ((x_data - self.explainer.scaler.mean_) /
+                           self.explainer.scaler.scale_)
+            coefs = coefs * self._get_feature_mask(coefs, scaled_data)
+        return coefs
+
+    def _get_lime_coefs(self, x_data, seed):
+        """Get local coefficients from LIME for a batch of instances."""
+        random_state = np.random.RandomState(seed)
+        (scaled_data, inverse) = self._sample_neighborhoods(x_data,
+                                                            random_state)
+        (n_points, n_samples, n_features) = scaled_data.shape
+
+        # Model evaluation (single call for all instances)
+        y_data = np.asarray(self.predict_fn(inverse.reshape(-1, n_features)))
+        y_data = y_data.reshape(n_points, n_samples)
+
+        # Sample weights
+        distances = np.linalg.norm(scaled_data - scaled_data[:, :1], axis=-1)
+        weights = self.explainer.base.kernel_fn(distances)
+
+        # Select features with highest weights if necessary
+        if n_features > self.num_features:
+            coefs = _weighted_ridge(scaled_data, y_data, weights, 0.01)
+            mask = self._get_feature_mask(coefs, scaled_data[:, 0])
+            scaled_data = scaled_data * mask[:, np.newaxis, :]
+
+        return _weighted_ridge(scaled_data, y_data, weights, 1.0)
+
+    def _sample_neighborhoods(self, x_data, random_state):
+        """Sample neighborhoods of all instances (see LIME for details)."""
+        explainer = self.explainer
+        scale = explainer.scaler.scale_
+        mean = explainer.scaler.mean_
+        (n_points, n_features) = x_data.shape
+        data = random_state.normal(
+            0.0, 1.0, (n_points, self.num_samples, n_features)) * scale
+        if explainer.sample_around_instance:
+            data += x_data[:, np.newaxis, :]
+        else:
+            data += mean
+        data[:, 0] = x_data
+        inverse = data.copy()
+        for col in self.categorical_features:
+            values = np.asarray(explainer.feature_values[col])
+            freqs = explainer.feature_frequencies[col]
+            inverse_col = random_state.choice(values,
+                                              size=(n_points,
+                                                    self.num_samples),
+                                              replace=True,
+                                              p=freqs)
+            binary_col = (inverse_col == x_data[:, col:col + 1]).astype(int)
+            binary_col[:, 0] = 1
+            inverse_col[:, 0] = x_data[:, col]
+            data[..., col] = binary_col
+            inverse[..., col] = inverse_col
+        scaled_data = (data - mean) / scale
+        return (scaled_data, inverse)
@@ -45,9 +45,23 @@ group_metadata: str, optional
     ``pseudo_reality``.
 ignore: list of dict, optional
     Ignore specific datasets by specifying multiple :obj:`dict` s of metadata.
+load_fitted_model: str, optional
+    Directory containing fitted MLR model(s) saved by a previous run with the
+    option ``save_fitted_model`` (usually the ``work_dir`` of that run). If
+    the training data and the fit settings of an MLR model have not changed
+    (checked via
+    :meth:`esmvaltool.diag_scripts.mlr.models.MLRModel.get_training_data_hash`),
+    the fitted MLR model is loaded and fitting is skipped (predict-only mode).
+    Otherwise, the MLR model is fitted as usual. The split into training and
+    test data (see ``test_size``) is restored from the fitted MLR model.
 mlr_model_type: str
     MLR model type. The given model has to be defined in
     :mod:`esmvaltool.diag_scripts.mlr.models`.
+n_parallel_groups: int, optional (default: 1)
+    Maximum number of MLR models of different groups (see ``group_metadata``
+    and ``pseudo_reality``) which are processed concurrently in separate
+    processes. The total number of jobs given by ``n_jobs`` is split evenly
+    between these MLR models.
 only_predict: bool, optional (default: False)
     If ``True``, only use
     :meth:`esmvaltool.diag_scripts.mlr.models.MLRModel.predict` and do not
@@ -91,6 +105,9 @@ save_mlr_model_error: str or int, optional
     possible if ``group_datasets_by_attributes`` is given. If the option is set
     to an integer ``n`` (!= 0), the (constant) error is estimated as RMSEP
     using n-fold cross-validation.
+save_fitted_model: bool, optional (default: False)
+    Save fitted MLR model(s) to the work directory so that they can be reused
+    by other runs (see ``load_fitted_model``).
 save_lime_importance: bool, optional (default: False)
     Additionally save local feature importance given by LIME (Local
     Interpretable Model-agnostic Explanations).
@@ -110,15 +127,20 @@ Additional optional parameters are optional parameters for
 
 import logging
 import os
+import shutil
+import time
 from copy import deepcopy
 from pprint import pformat
 
+import yaml
+from joblib import Parallel, delayed, effective_n_jobs
 from sklearn.gaussian_process import kernels as sklearn_kernels
 
 from esmvaltool.diag_scripts import mlr
 from esmvaltool.diag_scripts.mlr.mmm import main as create_mmm_model
 from esmvaltool.diag_scripts.mlr.models import MLRModel
 from esmvaltool.diag_scripts.shared import (
+    ProvenanceLogger,
     group_metadata,
     run_diagnostic,
     select_metadata,
@@ -126,6 +148,25 @@ from esmvaltool.diag_scripts.shared import (
 
 logger = logging.getLogger(os.path.basename(__file__))
 
+FITTED_MLR_MODEL_FILE = 'fitted_mlr_model.joblib'
+
+
+def _fit_mlr_model(cfg, mlr_model):
+    """Fit MLR model using the desired method."""
+    if ('grid_search_cv_param_grid' in cfg and
+            cfg['grid_search_cv_param_grid']):
+        cv_param_grid = cfg['grid_search_cv_param_grid']
+        cv_kwargs = cfg.get('grid_search_cv_kwargs', {})
+        mlr_model.grid_search_cv(cv_param_grid, **cv_kwargs)
+    elif 'efecv_kwargs' in cfg:
+        mlr_model.efecv(**cfg['efecv_kwargs'])
+    elif 'rfecv_kwargs' in cfg:
+        mlr_model.rfecv(**cfg['rfecv_kwargs'])
+    else:
+        mlr_model.fit()
+    if cfg.get('save_fitted_model'):
+        mlr_model.save_fitted_model(FITTED_MLR_MODEL_FILE)
+
 
 def _get_grouped_data(cfg, input_data):
     """Group input data to create individual MLR models for each group."""
@@ -208,6 +249,52 @@ def _get_raw_input_data(cfg):
     return input_data
 
 
+def _load_fitted_mlr_model(cfg, mlr_model):
+    """Load fitted MLR model if possible (returns ``True`` if successful)."""
+    if not cfg.get('load_fitted_model'):
+        return False
+    path = os.path.join(cfg['load_fitted_model'], cfg.get('sub_dir', ''),
+                        FITTED_MLR_MODEL_FILE)
+    if not os.path.isfile(path):
+        logger.warning(
+            "Fitted MLR model %s does not exist, fitting MLR model", path)
+        return False
+    try:
+        mlr_model.load_fitted_model(path)
+    except ValueError as exc:
+        logger.warning("%s, fitting MLR model", exc)
+        return False
+    return True
+
+
+def _merge_provenance(cfg, run_dirs):
+    """Merge provenance records of MLR models run in separate processes."""
+    with ProvenanceLogger(cfg) as provenance_logger:
+        for run_dir in run_dirs:
+            provenance_file = os.path.join(run_dir,
+                                           'diagnostic_provenance.yml')
+            if os.path.exists(provenance_file):
+                with open(provenance_file, 'r') as file_:
+                    table = yaml.safe_load(file_)
+                for (filename, record) in table.items():
+                    provenance_logger.log(filename, record)
+
+            # The run directory is only created if provenance was logged
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def _run_mlr_model_in_subprocess(cfg, mlr_model_type, group_attribute, descr,
+                                 datasets):
+    """Run single MLR model in separate process."""
+    logging.basicConfig(format="%(asctime)s [%(process)d] %(levelname)-8s "
+                        "%(name)s,%(lineno)s\t%(message)s")
+    logging.Formatter.converter = time.gmtime
+    logging.getLogger().setLevel(cfg.get('log_level', 'info').upper())
+    mlr.ignore_warnings()
+    run_single_mlr_model(cfg, mlr_model_type, group_attribute, descr,
+                         datasets)
+
+
 def _update_mlr_model(mlr_model_type, mlr_model):
     """Update MLR model parameters during run time."""
     if mlr_model_type == 'gpr_sklearn':
@@ -249,47 +336,37 @@ def get_grouped_data(cfg):
 
 def run_mlr_model(cfg, mlr_model_type, group_attribute, grouped_datasets):
     """Run MLR model(s) of desired type on input data."""
-    for (descr, datasets) in grouped_datasets.items():
-        if descr is not None:
-            attr = '' if group_attribute is None else f'{group_attribute} '
-            logger.info("Creating MLR model '%s' for %s'%s'", mlr_model_type,
-                        attr, descr)
-            cfg['sub_dir'] = descr
-        mlr_model = MLRModel.create(mlr_model_type, datasets, **cfg)
-
-        # Update MLR model parameters dynamically
-        _update_mlr_model(mlr_model_type, mlr_model)
-
-        # Fit and predict
-        if ('grid_search_cv_param_grid' in cfg and
-                cfg['grid_search_cv_param_grid']):
-            cv_param_grid = cfg['grid_search_cv_param_grid']
-            cv_kwargs = cfg.get('grid_search_cv_kwargs', {})
-            mlr_model.grid_search_cv(cv_param_grid, **cv_kwargs)
-        elif 'efecv_kwargs' in cfg:
-            mlr_model.efecv(**cfg['efecv_kwargs'])
-        elif 'rfecv_kwargs' in cfg:
-            mlr_model.rfecv(**cfg['rfecv_kwargs'])
-        else:
-            mlr_model.fit()
-        predict_args = {
-            'save_mlr_model_error': cfg.get('save_mlr_model_error'),
-            'save_lime_importance': cfg.get('save_lime_importance'),
-            'save_propagated_errors': cfg.get('save_propagated_errors'),
-            **cfg.get('predict_kwargs', {}),
-        }
-        mlr_model.predict(**predict_args)
-
-        # Print further information
-        mlr_model.print_correlation_matrices()
-        mlr_model.print_regression_metrics()
-        mlr_model.test_normality_of_residuals()
-
-        # Skip further output if desired
-        if not cfg.get('only_predict'):
-            mlr_model.export_training_data()
-            mlr_model.export_prediction_data()
-            run_mlr_model_plots(cfg, mlr_model, mlr_model_type)
+    n_groups = min(cfg.get('n_parallel_groups', 1), len(grouped_datasets))
+    if n_groups <= 1:
+        for (descr, datasets) in grouped_datasets.items():
+            run_single_mlr_model(cfg, mlr_model_type, group_attribute, descr,
+                                 datasets)
+        return
+
+    # Split available jobs between groups and estimators
+    n_jobs = max(1, effective_n_jobs(cfg.get('n_jobs', 1)) // n_groups)
+    logger.info(
+        "Processing %i MLR models using %i parallel processes (each MLR "
+        "model uses at most %i jobs)", len(grouped_datasets), n_groups,
+        n_jobs)
+
+    # Every process writes its own provenance file to avoid race conditions
+    group_cfgs = []
+    for (idx, descr) in enumerate(grouped_datasets):
+        group_cfg = deepcopy(cfg)
+        group_cfg['n_jobs'] = n_jobs
+        group_cfg['run_dir'] = os.path.join(cfg['run_dir'],
+                                            f'mlr_model_group_{idx:d}')
+        group_cfgs.append(group_cfg)
+    parallel = Parallel(n_jobs=n_groups)
+    parallel([
+        delayed(_run_mlr_model_in_subprocess)(group_cfg, mlr_model_type,
+                                              group_attribute, descr,
+                                              datasets)
+        for (group_cfg, (descr, datasets)) in zip(group_cfgs,
+                                                  grouped_datasets.items())
+    ])
+    _merge_provenance(cfg, [group_cfg['run_dir'] for group_cfg in group_cfgs])
 
 
 def run_mlr_model_plots(cfg, mlr_model, mlr_model_type):
@@ -330,6 +407,42 @@ def run_mmm_model(cfg, group_attribute, grouped_datasets):
         create_mmm_model(cfg, input_data=datasets, description=descr)
 
 
+def run_single_mlr_model(cfg, mlr_model_type, group_attribute, descr,
+                         datasets):
+    """Run single MLR model of desired type on input data."""
+    if descr is not None:
+        attr = '' if group_attribute is None else f'{group_attribute} '
+        logger.info("Creating MLR model '%s' for %s'%s'", mlr_model_type,
+                    attr, descr)
+        cfg['sub_dir'] = descr
+    mlr_model = MLRModel.create(mlr_model_type, datasets, **cfg)
+
+    # Update MLR model parameters dynamically
+    _update_mlr_model(mlr_model_type, mlr_model)
+
+    # Fit (or load fitted MLR model) and predict
+    if not _load_fitted_mlr_model(cfg, mlr_model):
+        _fit_mlr_model(cfg, mlr_model)
+    predict_args = {
+        'save_mlr_model_error': cfg.get('save_mlr_model_error'),
+        'save_lime_importance': cfg.get('save_lime_importance'),
+        'save_propagated_errors': cfg.get('save_propagated_errors'),
+        **cfg.get('predict_kwargs', {}),
+    }
+    mlr_model.predict(**predict_args)
+
+    # Print further information
+    mlr_model.print_correlation_matrices()
+    mlr_model.print_regression_metrics()
+    mlr_model.test_normality_of_residuals()
+
+    # Skip further output if desired
+    if not cfg.get('only_predict'):
+        mlr_model.export_training_data()
+        mlr_model.export_prediction_data()
+        run_mlr_model_plots(cfg, mlr_model, mlr_model_type)
+
+
 def main(cfg):
     """Run the diagnostic."""
     check_cfg(cfg)
@@ -232,6 +232,20 @@ imputation_strategy: str (default: 'remove')
     Strategy for the imputation of missing values in the features. Must be one
     of ``'remove'``, ``'mean'``, ``'median'``, ``'most_frequent'`` or
     ``'constant'``.
+lime_analytic: bool (default: False)
+    For MLR models whose local linear approximations are analytic (linear
+    models and Gaussian process regression), calculate the LIME coefficients
+    from the gradient of the model instead of sampling the neighborhood of
+    every prediction point. This is much faster, but the results differ
+    from the sampled LIME coefficients (which contain sampling noise).
+    Ignored for models with categorical features.
+lime_max_points: int
+    If given, only calculate LIME explanations (used for the LIME feature
+    importance and the propagation of prediction input errors) for this
+    number of evenly spaced prediction points and linearly interpolate the
+    results to all other points.
+lime_num_samples: int (default: 5000)
+    Size of the neighborhood sampled by LIME for every prediction point.
 log_level: str (default: 'info')
     Verbosity for the logger. Must be one of ``'debug'``, ``'info'``,
     ``'warning'`` or ``'error'``.
@@ -259,6 +273,18 @@ plot_dir: str (default: ~/plots)
     Root directory to save plots.
 plot_units: dict
     Replace specific units (keys) with other text (values) in plots.
+prediction_block_size: int
+    If given, perform the prediction in blocks of at most this number of
+    prediction input points (the blocks are formed along the leading
+    dimensions of the prediction input cubes) and write the output
+    incrementally to preallocated netCDF files. This keeps the memory usage
+    bounded for large prediction inputs. At most ``n_jobs`` blocks are
+    processed in parallel (using threads). In this case, the prediction input
+    is not kept in memory and thus not exported by
+    :meth:`export_prediction_data`.
+random_state: int, optional
+    Seed for the random split of the input data into training and test data
+    (see ``test_size``). By default, the split is different for every run.
 savefig_kwargs: dict
     Keyword arguments for :func:`matplotlib.pyplot.savefig`.
 seaborn_settings: dict
@@ -284,20 +310,25 @@ write_plots: bool (default: True)
 
 """
 
+import hashlib
 import importlib
+import itertools
+import json
 import logging
 import os
 from copy import deepcopy
 from inspect import getfullargspec
 from pprint import pformat
 
+import dask.array as da
 import iris
+import joblib
 import matplotlib.pyplot as plt
+import netCDF4
 import numpy as np
 import pandas as pd
 import seaborn as sns
 from cf_units import Unit
-from joblib import Parallel, delayed
 from lime.lime_tabular import LimeTabularExplainer
 from matplotlib.ticker import ScalarFormatter
 from scipy.stats import shapiro
@@ -316,6 +347,7 @@ from sklearn.model_selection import (
 from sklearn.preprocessing import StandardScaler
 
 from esmvaltool.diag_scripts import mlr
+from esmvaltool.diag_scripts.mlr.custom_lime import BatchedLimeExplainer
 from esmvaltool.diag_scripts.mlr.custom_sklearn import (
     AdvancedPipeline,
     AdvancedRFECV,
@@ -337,6 +369,7 @@ logger = logging.getLogger(os.path.basename(__file__))
 class MLRModel():
     """Base class for MLR models."""
 
+    _ANALYTIC_LOCAL_COEFS = False
     _CLF_TYPE = None
     _MODELS = {}
     _MLR_MODEL_TYPE = None
@@ -628,12 +661,22 @@ class MLRModel():
     def export_prediction_data(self, filename=None):
         """Export all prediction data contained in `self._data`.
 
+        Note
+        ----
+        For block-wise prediction (option ``prediction_block_size``), the
+        prediction data is not kept in memory and thus not exported.
+
         Parameters
         ----------
         filename : str, optional (default: '{data_type}_{pred_name}.csv')
             Name of the exported files.
 
         """
+        if self._cfg.get('prediction_block_size'):
+            logger.info(
+                "Skipping export of prediction data, not available for "
+                "block-wise prediction (option 'prediction_block_size')")
+            return
         for pred_name in self.data['pred']:
             self._save_csv_file('pred', filename, pred_name=pred_name)
 
@@ -786,6 +829,48 @@ class MLRModel():
             data_frame = self._impute_nans(data_frame)
         return data_frame
 
+    def get_training_data_hash(self):
+        """Return hash of training data and settings relevant for fitting.
+
+        Note
+        ----
+        This hash is used to check if a fitted MLR model saved with
+        :meth:`save_fitted_model` can be reused for the current training data
+        (see :meth:`load_fitted_model`). The complete input data is hashed
+        together with the options ``test_size`` and ``random_state`` (and not
+        the training data after splitting off the test data), so that the hash
+        does not depend on the random split. The split itself is saved
+        together with the fitted MLR model.
+
+        Returns
+        -------
+        str
+            Hexadecimal SHA-256 hash.
+
+        """
+        fit_settings = {
+            key: self._cfg.get(key)
+            for key in ('efecv_kwargs', 'fit_kwargs', 'grid_search_cv_kwargs',
+                        'grid_search_cv_param_grid', 'imputation_strategy',
+                        'parameters', 'parameters_final_regressor', 'pca',
+                        'random_state', 'rfecv_kwargs', 'standardize_data',
+                        'test_size')
+        }
+        metadata = {
+            'mlr_model_type': self.mlr_model_type,
+            'fit_settings': fit_settings,
+            'features': self._classes['features'].to_csv(),
+            'label': self._classes['label'].to_csv(),
+            'columns': [str(col) for col in self.data['all'].columns],
+        }
+        hasher = hashlib.sha256()
+        hasher.update(
+            json.dumps(metadata, sort_keys=True, default=str).encode())
+        hasher.update(
+            pd.util.hash_pandas_object(self.data['all'],
+                                       index=True).values.tobytes())
+        return hasher.hexdigest()
+
     def get_x_array(self, data_type, impute_nans=False):
         """Return x data of specific type.
 
@@ -901,6 +986,59 @@ class MLRModel():
         # LIME
         self._load_lime_explainer()
 
+    def load_fitted_model(self, path):
+        """Load fitted MLR model saved by :meth:`save_fitted_model`.
+
+        This replaces calling :meth:`fit`, :meth:`grid_search_cv`,
+        :meth:`rfecv` or :meth:`efecv`.
+
+        Parameters
+        ----------
+        path : str
+            Path to the saved MLR model.
+
+        Raises
+        ------
+        ValueError
+            Saved MLR model has a different type or has been fitted on
+            different training data or with different settings (see
+            :meth:`get_training_data_hash`).
+
+        """
+        artifact = joblib.load(path)
+        if artifact['mlr_model_type'] != self.mlr_model_type:
+            raise ValueError(
+                f"Cannot load fitted MLR model from {path}, expected MLR "
+                f"model type '{self.mlr_model_type}', got "
+                f"'{artifact['mlr_model_type']}'")
+        training_data_hash = self.get_training_data_hash()
+        if artifact['training_data_hash'] != training_data_hash:
+            raise ValueError(
+                f"Cannot load fitted MLR model from {path}, it has been "
+                f"fitted on different training data or with different "
+                f"settings (training data hash "
+                f"'{artifact['training_data_hash']}', expected "
+                f"'{training_data_hash}')")
+        memory = self._clf.memory
+        self._clf = artifact['clf']
+        self._clf.memory = memory
+        self._parameters = artifact['parameters']
+
+        # Restore split of training and test data used for fitting
+        for data_type in ('train', 'test'):
+            self._data.pop(data_type, None)
+            if artifact['data_index'].get(data_type) is not None:
+                self._data[data_type] = self.data['all'].loc[
+                    artifact['data_index'][data_type]]
+        logger.info("Loaded fitted MLR model from %s", path)
+        logger.debug("Pipeline steps:")
+        logger.debug(pformat(list(self._clf.named_steps.keys())))
+        logger.debug("Parameters:")
+        logger.debug(pformat(self.parameters))
+
+        # LIME
+        self._load_lime_explainer()
+
     def plot_1d_model(self, filename=None, n_points=1000):
         """Plot lineplot that represents the MLR model.
 
@@ -1501,6 +1639,9 @@ class MLRModel():
         ValueError
             ``save_propagated_errors`` is ``True`` and no
             ``prediction_input_error`` data is available.
+        ValueError
+            ``return_cov`` is used together with the option
+            ``prediction_block_size``.
 
         """
         self._check_fit_status('Prediction')
@@ -1515,6 +1656,16 @@ class MLRModel():
         for pred_name in self._datasets['prediction_input']:
             logger.info("Predicting '%s'", self._get_name(pred_name))
 
+            # Block-wise prediction (output is directly written to files)
+            if self._cfg.get('prediction_block_size'):
+                self._predict_in_blocks(
+                    pred_name,
+                    save_mlr_model_error=save_mlr_model_error,
+                    save_lime_importance=save_lime_importance,
+                    save_propagated_errors=save_propagated_errors,
+                    **kwargs)
+                continue
+
             # Prediction
             (x_pred, x_err, y_ref,
              x_cube) = self._extract_prediction_input(pred_name)
@@ -1737,6 +1888,51 @@ class MLRModel():
         # LIME
         self._load_lime_explainer()
 
+    def save_fitted_model(self, filename=None):
+        """Save fitted MLR model (can be loaded by :meth:`load_fitted_model`).
+
+        Saves the fitted pipeline together with its parameters, the feature
+        and label metadata, the training data hash (see
+        :meth:`get_training_data_hash`) and the split of the input data into
+        training and test data.
+
+        Parameters
+        ----------
+        filename : str, optional (default: 'fitted_mlr_model.joblib')
+            Name of the file (saved in the work directory of the MLR model).
+
+        Returns
+        -------
+        str
+            Path to the saved MLR model.
+
+        Raises
+        ------
+        sklearn.exceptions.NotFittedError
+            MLR model is not fitted.
+
+        """
+        self._check_fit_status('Saving fitted model')
+        if filename is None:
+            filename = 'fitted_mlr_model.joblib'
+        path = os.path.join(self._cfg['mlr_work_dir'], filename)
+        artifact = {
+            'mlr_model_type': self.mlr_model_type,
+            'training_data_hash': self.get_training_data_hash(),
+            'clf': self._clf,
+            'parameters': self.parameters,
+            'features': self._classes['features'],
+            'label': self._classes['label'],
+            'data_index': {
+                data_type: (self.data[data_type].index
+                            if data_type in self.data else None)
+                for data_type in ('train', 'test')
+            },
+        }
+        joblib.dump(artifact, path)
+        logger.info("Wrote %s", path)
+        return path
+
     def test_normality_of_residuals(self):
         """Perform Shapiro-Wilk test to normality of residuals.
 
@@ -1990,11 +2186,11 @@ class MLRModel():
 
         return (x_data, y_data, sample_weights)
 
-    def _extract_prediction_input(self, prediction_name):
+    def _extract_prediction_input(self, prediction_name, block=None):
         """Extract prediction input data points for ``prediction_name``."""
         (x_pred, x_cube, _) = self._extract_x_data(
             self._datasets['prediction_input'][prediction_name],
-            'prediction_input')
+            'prediction_input', block=block)
         logger.info(
             "Found %i raw prediction input data point(s) with data type '%s'",
             len(x_pred.index), self._cfg['dtype'])
@@ -2008,7 +2204,7 @@ class MLRModel():
         else:
             y_ref = self._extract_y_data(
                 self._datasets['prediction_reference'][prediction_name],
-                'prediction_reference')
+                'prediction_reference', block=block)
             if y_ref is not None:
                 if not x_pred.index.equals(y_ref.index):
                     raise ValueError(
@@ -2031,7 +2227,7 @@ class MLRModel():
         else:
             (x_err, _, _) = self._extract_x_data(
                 self._datasets['prediction_input_error'][prediction_name],
-                'prediction_input_error')
+                'prediction_input_error', block=block)
             if not x_pred.index.equals(x_err.index):
                 raise ValueError(
                     f"Got differing point(s) for prediction input and "
@@ -2054,7 +2250,7 @@ class MLRModel():
 
         return (x_pred, x_err, y_ref, x_cube)
 
-    def _extract_x_data(self, datasets, var_type):
+    def _extract_x_data(self, datasets, var_type, block=None):
         """Extract required x data of type ``var_type`` from ``datasets``."""
         allowed_types = ('feature', 'prediction_input',
                          'prediction_input_error')
@@ -2086,7 +2282,7 @@ class MLRModel():
                 raise ValueError(f"No '{var_type}' data{msg} found")
             (group_data, x_cube,
              weights) = self._get_x_data_for_group(group_datasets, var_type,
-                                                   group_attr)
+                                                   group_attr, block=block)
             x_data = x_data.append(group_data)
 
             # Append weights if desired
@@ -2116,7 +2312,7 @@ class MLRModel():
 
         return (x_data, x_cube, sample_weights)
 
-    def _extract_y_data(self, datasets, var_type):
+    def _extract_y_data(self, datasets, var_type, block=None):
         """Extract required y data of type ``var_type`` from ``datasets``."""
         allowed_types = ('label', 'prediction_reference')
         if var_type not in allowed_types:
@@ -2142,6 +2338,8 @@ class MLRModel():
             if dataset is None:
                 return None
             cube = self._load_cube(dataset)
+            if block is not None:
+                cube = cube[block]
             text = f"{var_type} '{self.label}'{msg}"
             self._check_cube_dimensions(cube, None, text)
             cube_data = pd.DataFrame(
@@ -2158,11 +2356,14 @@ class MLRModel():
 
         return y_data
 
-    def _get_broadcasted_cube(self, dataset, ref_cube, text=None):
+    def _get_broadcasted_cube(self, dataset, ref_cube, text=None, block=None):
         """Get broadcasted cube."""
         msg = '' if text is None else text
         target_shape = ref_cube.shape
         cube_to_broadcast = self._load_cube(dataset)
+        if block is not None:
+            cube_to_broadcast = cube_to_broadcast[tuple(
+                block[idx] for idx in dataset['broadcast_from'])]
         data_to_broadcast = np.ma.filled(cube_to_broadcast.data, np.nan)
         logger.info("Broadcasting %s from %s to %s", msg,
                     data_to_broadcast.shape, target_shape)
@@ -2351,30 +2552,31 @@ class MLRModel():
                                        columns=['units'])
         return label
 
+    def _get_batched_lime_explainer(self):
+        """Get :class:`mlr.custom_lime.BatchedLimeExplainer` for MLR model."""
+        analytic = (self._cfg['lime_analytic'] and self._ANALYTIC_LOCAL_COEFS
+                    and not self.categorical_features.size)
+        if analytic:
+            logger.info(
+                "Using gradient of %s as local LIME coefficients",
+                self._cfg['mlr_model_name'])
+        return BatchedLimeExplainer(
+            self._lime_explainer,
+            self._clf.predict,
+            num_samples=self._cfg['lime_num_samples'],
+            max_points=self._cfg.get('lime_max_points'),
+            analytic=analytic,
+            n_jobs=self._cfg['n_jobs'],
+        )
+
     def _get_lime_feature_importance(self, x_pred):
         """Get most important feature given by LIME."""
         logger.info(
             "Calculating global feature importance using LIME (this may take "
             "a while...)")
         x_pred = self._impute_nans(x_pred)
-
-        # Most important feature for single input
-        def _most_important_feature(x_single_pred, explainer, predict_fn):
-            """Get most important feature for single input."""
-            explanation = explainer.explain_instance(x_single_pred, predict_fn)
-            local_exp = explanation.local_exp[1]
-            sorted_exp = sorted(local_exp, key=lambda elem: elem[0])
-            norm = sum([abs(elem[1]) for elem in sorted_exp])
-            return [abs(elem[1]) / norm for elem in sorted_exp]
-
-        # Apply on whole input (using multiple processes)
-        parallel = Parallel(n_jobs=self._cfg['n_jobs'])
-        lime_feature_importance = parallel(
-            [delayed(_most_important_feature)(x,
-                                              explainer=self._lime_explainer,
-                                              predict_fn=self._clf.predict)
-             for x in x_pred.values]
-        )
+        explainer = self._get_batched_lime_explainer()
+        lime_feature_importance = explainer.feature_importance(x_pred.values)
         lime_feature_importance = np.array(lime_feature_importance,
                                            dtype=self._cfg['dtype'])
         lime_feature_importance = np.moveaxis(lime_feature_importance, -1, 0)
@@ -2568,10 +2770,13 @@ class MLRModel():
                              param, str(function), parameters[param])
         return parameters
 
-    def _get_x_data_for_group(self, datasets, var_type, group_attr=None):
+    def _get_x_data_for_group(self, datasets, var_type, group_attr=None,
+                              block=None):
         """Get x data for a group of datasets."""
         msg = '' if group_attr is None else f" for '{group_attr}'"
         ref_cube = self._get_reference_cube(datasets, var_type, msg)
+        if block is not None:
+            ref_cube = ref_cube[block]
         group_data = pd.DataFrame(
             columns=self.features,
             index=self._get_multiindex(ref_cube, group_attr=group_attr),
@@ -2603,9 +2808,11 @@ class MLRModel():
                     # Broadcast if necessary
                     if 'broadcast_from' in dataset:
                         cube = self._get_broadcasted_cube(
-                            dataset, ref_cube, text)
+                            dataset, ref_cube, text, block=block)
                     else:
                         cube = self._load_cube(dataset)
+                        if block is not None:
+                            cube = cube[block]
                     self._check_cube_dimensions(cube, ref_cube, text)
 
                     # Do not accept errors for categorical features
@@ -2753,8 +2960,10 @@ class MLRModel():
         test_size = self._cfg['test_size']
         if test_size:
             (self._data['train'],
-             self._data['test']) = train_test_split(self._data['all'].copy(),
-                                                    test_size=test_size)
+             self._data['test']) = train_test_split(
+                 self._data['all'].copy(),
+                 test_size=test_size,
+                 random_state=self._cfg.get('random_state'))
             self._data['train'] = self._data['train'].sort_index()
             self._data['test'] = self._data['test'].sort_index()
             for data_type in ('train', 'test'):
@@ -2952,6 +3161,96 @@ class MLRModel():
                                     caption=title + '.', plot_types=['bar'])
         plt.close()
 
+    def _predict_in_blocks(self, pred_name, save_mlr_model_error=None,
+                           save_lime_importance=False,
+                           save_propagated_errors=False, **kwargs):
+        """Perform prediction block-wise and write output incrementally."""
+        if 'return_cov' in kwargs:
+            raise ValueError(
+                "Block-wise prediction (option 'prediction_block_size') is "
+                "not possible when 'return_cov' is used")
+        datasets = select_metadata(
+            self._datasets['prediction_input'][pred_name],
+            var_type='prediction_input')
+        ref_cube = self._get_reference_cube(datasets, 'prediction_input')
+        blocks = self._get_prediction_blocks(
+            ref_cube.shape, self._cfg['prediction_block_size'])
+        n_workers = joblib.effective_n_jobs(self._cfg['n_jobs'])
+        logger.info(
+            "Predicting %i point(s) in %i block(s) (using at most %i "
+            "thread(s))", np.prod(ref_cube.shape, dtype=np.int64),
+            len(blocks), n_workers)
+
+        # The MLR model error is constant and only needs to be estimated once
+        mlr_model_error = None
+        if save_mlr_model_error:
+            mlr_model_error = self._estimate_mlr_model_error(
+                1, save_mlr_model_error)[0]
+
+        # Process groups of blocks (one block per worker)
+        paths = {}
+        parallel = joblib.Parallel(n_jobs=n_workers, backend='threading')
+        for idx in range(0, len(blocks), n_workers):
+            block_group = blocks[idx:idx + n_workers]
+            pred_inputs = [
+                self._extract_prediction_input(pred_name, block=block)
+                for block in block_group
+            ]
+            pred_inputs = [(block, pred_input) for (block, pred_input) in
+                           zip(block_group, pred_inputs)
+                           if len(pred_input[0].index)]
+            pred_dicts = parallel([
+                joblib.delayed(self._get_prediction_dict)(
+                    pred_name, x_pred, x_err, y_ref,
+                    get_lime_importance=save_lime_importance,
+                    get_propagated_errors=save_propagated_errors, **kwargs)
+                for (_, (x_pred, x_err, y_ref, _)) in pred_inputs
+            ])
+
+            # Write output (blocks with missing input only remain masked)
+            for ((block, pred_input), pred_dict) in zip(pred_inputs,
+                                                        pred_dicts):
+                (x_pred, _, _, x_cube) = pred_input
+                if mlr_model_error is not None:
+                    pred_dict['squared_mlr_model_error_estim'] = np.full(
+                        len(x_pred.index), mlr_model_error,
+                        dtype=self._cfg['dtype'])
+                if not paths:
+                    paths = self._preallocate_prediction_files(
+                        pred_dict, pred_name, ref_cube)
+                for (pred_type, y_pred) in pred_dict.items():
+                    y_pred = self._mask_prediction_array(y_pred, x_cube)
+                    (path, pred_cube) = paths[pred_type]
+                    with netCDF4.Dataset(path, mode='a') as nc_file:
+                        nc_file.variables[pred_cube.var_name][block] = (
+                            y_pred.reshape(x_cube.shape))
+
+        # Provenance
+        if not paths:
+            logger.warning(
+                "Prediction input for prediction '%s' does not contain any "
+                "valid points, no output written", self._get_name(pred_name))
+        for (pred_type, (path, pred_cube)) in paths.items():
+            logger.info("Wrote %s", path)
+            self._write_prediction_provenance(pred_cube, path, pred_type,
+                                              pred_name)
+        logger.info(
+            "Prediction input for '%s' is not kept in memory for block-wise "
+            "prediction", self._get_name(pred_name))
+
+    def _preallocate_prediction_files(self, pred_dict, pred_name, ref_cube):
+        """Create (masked) prediction output files for block-wise writing."""
+        paths = {}
+        for pred_type in pred_dict:
+            placeholder = da.ma.masked_equal(
+                da.zeros(ref_cube.shape, dtype=self._cfg['dtype']), 0.0)
+            pred_cube = ref_cube.copy(placeholder)
+            path = self._set_prediction_cube_attributes(
+                pred_cube, pred_type, pred_name=pred_name)
+            io.iris_save(pred_cube, path)
+            paths[pred_type] = (path, pred_cube)
+        return paths
+
     def _prediction_to_dict(self, pred_out, **kwargs):
         """Convert output of final regressor's ``predict()`` to :obj:`dict`."""
         if not isinstance(pred_out, (list, tuple)):
@@ -3066,31 +3365,9 @@ class MLRModel():
                 "'feature_selection' step is present (usually because of "
                 "calling rfecv())")
         x_pred = self._impute_nans(x_pred)
-
-        # Propagated error for single input
-        def _propagated_error(x_single_pred, x_single_err, explainer,
-                              predict_fn, features, categorical_features):
-            """Get propagated prediction input error for single input."""
-            exp = explainer.explain_instance(x_single_pred, predict_fn)
-            x_single_err = np.nan_to_num(x_single_err)
-            x_err_scaled = x_single_err / explainer.scaler.scale_
-            squared_error = 0.0
-            for (idx, coef) in exp.local_exp[1]:
-                if features[idx] in categorical_features:
-                    continue
-                squared_error += (x_err_scaled[idx] * coef)**2
-            return squared_error
-
-        # Apply on whole input (using multiple processes)
-        parallel = Parallel(n_jobs=self._cfg['n_jobs'])
-        errors = parallel(
-            [delayed(_propagated_error)(
-                x, x_e, explainer=self._lime_explainer,
-                predict_fn=self._clf.predict,
-                features=self.features,
-                categorical_features=self.categorical_features,
-            ) for (x, x_e) in zip(x_pred.values, x_err.values)]
-        )
+        explainer = self._get_batched_lime_explainer()
+        errors = explainer.propagated_squared_errors(x_pred.values,
+                                                     x_err.values)
         return np.array(errors, dtype=self._cfg['dtype'])
 
     def _remove_missing_features(self, x_data, y_data, sample_weights):
@@ -3146,21 +3423,8 @@ class MLRModel():
             new_path = self._set_prediction_cube_attributes(
                 pred_cube, pred_type, pred_name=pred_name)
             io.iris_save(pred_cube, new_path)
-
-            # Save provenance
-            ancestors = self.get_ancestors(
-                prediction_names=[pred_name],
-                prediction_reference=pred_type == 'residual')
-            record = {
-                'ancestors': ancestors,
-                'authors': ['schlund_manuel'],
-                'caption': (f"{pred_cube.long_name} of MLR model "
-                            f"{self._cfg['mlr_model_name']} for prediction "
-                            f"{pred_name}."),
-                'references': ['schlund20jgr'],
-            }
-            with ProvenanceLogger(self._cfg) as provenance_logger:
-                provenance_logger.log(new_path, record)
+            self._write_prediction_provenance(pred_cube, new_path, pred_type,
+                                              pred_name)
 
     def _save_csv_file(self, data_type, filename, pred_name=None):
         """Save CSV file."""
@@ -3198,6 +3462,8 @@ class MLRModel():
         self._cfg.setdefault('fit_kwargs', {})
         self._cfg.setdefault('group_datasets_by_attributes', [])
         self._cfg.setdefault('imputation_strategy', 'remove')
+        self._cfg.setdefault('lime_analytic', False)
+        self._cfg.setdefault('lime_num_samples', 5000)
         self._cfg.setdefault('log_level', 'info')
         self._cfg.setdefault('mlr_model_name', f'{self._CLF_TYPE} model')
         self._cfg.setdefault('n_jobs', 1)
@@ -3300,6 +3566,23 @@ class MLRModel():
         with ProvenanceLogger(self._cfg) as provenance_logger:
             provenance_logger.log(netcdf_path, record)
 
+    def _write_prediction_provenance(self, pred_cube, path, pred_type,
+                                     pred_name):
+        """Write provenance record for prediction output."""
+        ancestors = self.get_ancestors(
+            prediction_names=[pred_name],
+            prediction_reference=pred_type == 'residual')
+        record = {
+            'ancestors': ancestors,
+            'authors': ['schlund_manuel'],
+            'caption': (f"{pred_cube.long_name} of MLR model "
+                        f"{self._cfg['mlr_model_name']} for prediction "
+                        f"{pred_name}."),
+            'references': ['schlund20jgr'],
+        }
+        with ProvenanceLogger(self._cfg) as provenance_logger:
+            provenance_logger.log(path, record)
+
     @staticmethod
     def _convert_units_in_cube(cube, new_units, power=None, text=None):
         """Convert units of cube if possible."""
@@ -3426,6 +3709,26 @@ class MLRModel():
             kwargs.update({'alpha': 0.5, 'marker': 'o', 's': 6})
         return kwargs
 
+    @staticmethod
+    def _get_prediction_blocks(shape, block_size):
+        """Get slices of blocks with at most ``block_size`` points."""
+        shape = tuple(shape)
+        split_dim = 0
+        while (split_dim < len(shape) - 1 and
+               np.prod(shape[split_dim + 1:], dtype=np.int64) > block_size):
+            split_dim += 1
+        inner_size = int(np.prod(shape[split_dim + 1:], dtype=np.int64))
+        step = max(1, block_size // inner_size)
+        trailing_slices = (slice(None), ) * (len(shape) - split_dim - 1)
+        blocks = []
+        for outer_idx in itertools.product(
+                *[range(dim_size) for dim_size in shape[:split_dim]]):
+            outer_slices = tuple(slice(idx, idx + 1) for idx in outer_idx)
+            for start in range(0, shape[split_dim], step):
+                blocks.append(outer_slices + (slice(start, start + step), ) +
+                              trailing_slices)
+        return blocks
+
     @staticmethod
     def _get_residuals(y_true, y_pred):
         """Calculate residuals (true minus predicted values)."""
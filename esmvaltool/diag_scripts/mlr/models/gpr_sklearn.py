@@ -32,6 +32,7 @@ class AdvancedGaussianProcessRegressor(GaussianProcessRegressor):
 class SklearnGPRModel(MLRModel):
     """Gaussian Process Regression model (:mod:`sklearn` implementation)."""
 
+    _ANALYTIC_LOCAL_COEFS = True
     _CLF_TYPE = AdvancedGaussianProcessRegressor
 
     def print_kernel_info(self):
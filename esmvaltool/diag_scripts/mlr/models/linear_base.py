@@ -15,6 +15,7 @@ logger = logging.getLogger(os.path.basename(__file__))
 class LinearModel(MLRModel):
     """Base class for linear Machine Learning models."""
 
+    _ANALYTIC_LOCAL_COEFS = True
     _CLF_TYPE = None
 
     def plot_coefs(self, filename=None):
@@ -113,6 +113,7 @@ OPS = {
     'mean': iris.analysis.MEAN,
     'sum': iris.analysis.SUM,
 }
+MAX_BLOCK_ELEMENTS = 2**24
 
 
 def _calculate_lower_error_bound(cfg, squared_error_cube, basepath):
@@ -209,24 +210,6 @@ def _collapse_regular_cube(cfg, cube, power=1):
     return cube
 
 
-def _corrcoef(array, rowvar=True, weights=None):
-    """Fast version of :func:`numpy.ma.corrcoef`."""
-    if not rowvar:
-        array = array.T
-        if weights is not None:
-            weights = weights.T
-    mean = np.ma.average(array, axis=1, weights=weights).reshape(-1, 1)
-    if weights is None:
-        sqrt_weights = 1.0
-    else:
-        sqrt_weights = np.ma.sqrt(weights)
-    demean = (array - mean) * sqrt_weights
-    res = np.ma.dot(demean, demean.T)
-    row_norms = np.ma.sqrt(np.ma.sum(demean**2, axis=1))
-    res /= np.ma.outer(row_norms, row_norms)
-    return res
-
-
 def _estim_cov_differing_shape(cfg, squared_error_cube, cov_est_cube, weights):
     """Collapse estimated covariance.
 
@@ -257,16 +240,13 @@ def _estim_cov_differing_shape(cfg, squared_error_cube, cov_est_cube, weights):
             f"and 'prediction_output_error' datasets, got {cov_est.shape} and "
             f"{error.shape}")
 
-    # Estimate covariance
+    # Estimate and collapse covariance
     error = error.ravel()
     cov_est = cov_est.reshape(-1, *error.shape)
-    pearson_coeffs = _corrcoef(cov_est, rowvar=False)
-    covariance = pearson_coeffs * np.ma.outer(error, error)
-
-    # Collapse covariance
-    weights = weights.ravel()
-    weights = np.outer(weights, weights)
-    error = np.ma.sqrt(np.ma.sum(covariance * weights))
+    norm_anomalies = _get_normalized_anomalies(cov_est)
+    weighted_error = error * weights.ravel()
+    error = _get_collapsed_errors(weighted_error[np.newaxis],
+                                  norm_anomalies)[0]
     return error
 
 
@@ -290,25 +270,21 @@ def _estim_cov_identical_shape(squared_error_cube, cov_est_cube, weights):
         cov_est = cov_est.reshape(cov_est.shape[0], -1)
         weights = weights.reshape(weights.shape[0], -1)
 
-    # Pearson coefficients (= normalized covariance) over both dimensions
-    pearson_dim0 = _corrcoef(cov_est, weights=weights)
-    pearson_dim1 = _corrcoef(cov_est, rowvar=False, weights=weights)
-
-    # Covariances
-    cov_dim0 = (np.einsum('...i,...j->...ij', error, error) *
-                np.einsum('...i,...j->...ij', weights, weights) * pearson_dim1)
-    cov_dim1 = (np.einsum('i...,j...->...ij', error, error) *
-                np.einsum('i...,j...->...ij', weights, weights) * pearson_dim0)
+    # Pearson coefficients (= normalized covariance) over both dimensions are
+    # given implicitly by the normalized anomalies
+    norm_anomalies_dim0 = _get_normalized_anomalies(cov_est.T, weights.T)
+    norm_anomalies_dim1 = _get_normalized_anomalies(cov_est, weights)
 
     # Errors over dimensions
-    error_dim0 = np.ma.sqrt(np.ma.sum(cov_dim0, axis=(1, 2)))
-    error_dim1 = np.ma.sqrt(np.ma.sum(cov_dim1, axis=(1, 2)))
+    weighted_error = error * weights
+    error_dim0 = _get_collapsed_errors(weighted_error, norm_anomalies_dim1)
+    error_dim1 = _get_collapsed_errors(weighted_error.T, norm_anomalies_dim0)
 
     # Collaps further (all weights are already included in first step)
-    cov_order_0 = pearson_dim0 * np.ma.outer(error_dim0, error_dim0)
-    cov_order_1 = pearson_dim1 * np.ma.outer(error_dim1, error_dim1)
-    error_order_0 = np.ma.sqrt(np.ma.sum(cov_order_0))
-    error_order_1 = np.ma.sqrt(np.ma.sum(cov_order_1))
+    error_order_0 = _get_collapsed_errors(error_dim0[np.newaxis],
+                                          norm_anomalies_dim0)[0]
+    error_order_1 = _get_collapsed_errors(error_dim1[np.newaxis],
+                                          norm_anomalies_dim1)[0]
     logger.debug(
         "Found real errors %e and %e after collapsing with different "
         "orderings, using maximum", error_order_0, error_order_1)
@@ -442,6 +418,26 @@ def _get_ancestors(cube):
     return ancestors
 
 
+def _get_collapsed_errors(weighted_errors, norm_anomalies):
+    """Collapse covariance given implicitly by normalized anomalies.
+
+    Calculate :math:`\\sqrt{\\sum_{ij} a_{ki} a_{kj} \\rho_{ij}}` for every
+    row :math:`k` of ``weighted_errors`` (weighted errors :math:`a`), where
+    the matrix of Pearson correlation coefficients is given by
+    :math:`\\rho = U^T U` (``norm_anomalies`` :math:`U`). Since the sum is
+    equal to the squared norm of :math:`U a_k`, the full covariance matrix is
+    never built. Rows are processed in blocks to limit memory usage.
+
+    """
+    n_samples = norm_anomalies.shape[0]
+    block_size = max(1, MAX_BLOCK_ELEMENTS // max(1, n_samples))
+    errors = []
+    for idx in range(0, weighted_errors.shape[0], block_size):
+        projection = weighted_errors[idx:idx + block_size] @ norm_anomalies.T
+        errors.append(np.sqrt(np.sum(projection**2, axis=1)))
+    return np.concatenate(errors)
+
+
 def _get_covariance_dataset(error_datasets, ref_cube):
     """Extract covariance dataset."""
     explanation = ("i.e. dataset with short_name == '*_cov' among "
@@ -526,6 +522,28 @@ def _get_normalization_factor(weights, coords, cube, normalize=False):
     return norm[0]
 
 
+def _get_normalized_anomalies(array, weights=None):
+    """Get normalized (weighted) anomalies along first axis.
+
+    The columns of the returned array have unit length, i.e. the matrix of
+    Pearson correlation coefficients between the columns of ``array`` is
+    given by ``norm_anomalies.T @ norm_anomalies``. Masked values and columns
+    without variance are set to 0 (they do not contribute to the correlation).
+
+    """
+    mean = np.ma.average(array, axis=0, weights=weights)
+    if weights is None:
+        sqrt_weights = 1.0
+    else:
+        sqrt_weights = np.ma.sqrt(weights)
+    anomalies = np.ma.filled((array - mean) * sqrt_weights, 0.0)
+    norms = np.sqrt(np.sum(anomalies**2, axis=0))
+    return np.divide(anomalies,
+                     norms,
+                     out=np.zeros(anomalies.shape),
+                     where=(norms > 0.0))
+
+
 def _get_time_weights(cfg, cube, power=1):
     """Calculate time weights."""
     time_weights = None
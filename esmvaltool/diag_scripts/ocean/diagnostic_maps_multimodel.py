@@ -177,6 +177,12 @@ def load_cubes(filenames, obs_filename, metadata):
         the preprocessed observations file.
     metadata: dict
         the input files dictionary
+
+    Returns
+    -------
+    tuple
+        A dictionary of dataset name : cube (with lazy data) and the name of
+        the observations.
     """
     # check if observations are provided
     if obs_filename:
@@ -187,34 +193,28 @@ def load_cubes(filenames, obs_filename, metadata):
         obsname = ''
         logger.info('Observations not provided. Plot each model data.')
 
-    # Load the data for each layer as a separate cube
-    layers = {}
+    # Load the data lazily, layers are extracted when plotting
     cubes = {}
     for thename in filenames:
         logger.debug('loading: \t%s', thename)
         cube = iris.load_cube(thename)
         cube = diagtools.bgc_units(cube, metadata[thename]['short_name'])
         model_name = metadata[thename]['dataset']
-        cubes[model_name] = diagtools.make_cube_layer_dict(cube)
-        for layer in cubes[model_name]:
-            layers[layer] = True
+        cubes[model_name] = cube
 
-    logger.debug('layers: %s', layers)
     logger.debug('cubes: %s', ', '.join(cubes.keys()))
 
-    return cubes, layers, obsname
+    return cubes, obsname
 
 
-def select_cubes(cubes, layer, obsname, metadata):
+def select_cubes(cubes, obsname, metadata):
     """
     Create a dictionary of input layer data & metadata to plot.
 
     Parameters
     ----------
-    cubes: list
-        Input data iris cubes
-    layer: list
-        Data level to be plotted
+    cubes: dict
+        Input data iris cubes of a single layer
     obsname: string
          Observation data name
     metadata: dict
@@ -225,7 +225,7 @@ def select_cubes(cubes, layer, obsname, metadata):
 
     for thename in cubes:
         plot_cubes[thename] = {
-            'cube': cubes[thename][layer],
+            'cube': cubes[thename],
             'title': thename,
             'cmap': 'viridis',
             'range': None,
@@ -234,7 +234,7 @@ def select_cubes(cubes, layer, obsname, metadata):
         }
         if (obsname != '') & (thename != obsname):
             plot_cubes[thename] = {
-                'cube': cubes[thename][layer] - cubes[obsname][layer],
+                'cube': cubes[thename] - cubes[obsname],
                 'title': thename,
                 'cmap': 'RdBu_r',
                 'range': None,
@@ -306,7 +306,7 @@ def make_multiple_plots(cfg, metadata, obsname):
     layout = metadata[filenames[0]]['layout_rowcol']
 
     # load input data
-    [cubes, layers, obsname] = load_cubes(filenames, obsname, metadata)
+    [cubes, obsname] = load_cubes(filenames, obsname, metadata)
 
     if obsname != '':
         layout[0] = layout[0] + 1
@@ -318,14 +318,14 @@ def make_multiple_plots(cfg, metadata, obsname):
             'Number of inputfiles is larger than layout scheme (rows x cols). '
             'Revise layout_rowcol size in recipe.')
 
-    # Make a plot for each layer
-    for layer in layers:
+    # Make a plot for each layer (only one layer is held in memory)
+    for layer, layer_cubes in diagtools.iterate_cube_layers(cubes):
 
         fig = plt.figure()
         fig.set_size_inches(layout[1] * 4., layout[0] * 2. + 2.)
 
         # select cubes to plot
-        plot_cubes = select_cubes(cubes, layer, obsname,
+        plot_cubes = select_cubes(layer_cubes, obsname,
                                   metadata[filenames[0]])
 
         # create individual subplot
@@ -147,19 +147,15 @@ def make_model_vs_obs_plots(
     filenames = {'model': model_filename, 'obs': obs_filename}
     logger.debug('make_model_vs_obs_plots filenames: %s', filenames)
     # ####
-    # Load the data for each layer as a separate cube
+    # Load the data lazily, layers are extracted when plotting
     input_file = None
-    layers = {}
     cubes = {}
     for model_type, input_file in filenames.items():
         logger.debug('loading: \t%s, \t%s', model_type, input_file)
         cube = iris.load_cube(input_file)
         cube = diagtools.bgc_units(cube, metadata[input_file]['short_name'])
-        cubes[model_type] = diagtools.make_cube_layer_dict(cube)
-        for layer in cubes[model_type]:
-            layers[layer] = True
+        cubes[model_type] = cube
 
-    logger.debug('layers: %s', layers)
     logger.debug('cubes: %s', ', '.join(cubes.keys()))
 
     # ####
@@ -167,23 +163,23 @@ def make_model_vs_obs_plots(
     model = metadata[filenames['model']]['dataset']
     obs = metadata[filenames['obs']]['dataset']
 
-    long_name = cubes['model'][list(layers.keys())[0]].long_name
-    units = str(cubes['model'][list(layers.keys())[0]].units)
+    long_name = cubes['model'].long_name
+    units = str(cubes['model'].units)
 
     # Load image format extention
     image_extention = diagtools.get_image_format(cfg)
 
-    # Make a plot for each layer
-    for layer in layers:
+    # Make a plot for each layer (only one layer is held in memory)
+    for layer, layer_cubes in diagtools.iterate_cube_layers(cubes):
 
         fig = plt.figure()
         fig.set_size_inches(9, 6)
 
         # Create the cubes
-        cube221 = cubes['model'][layer]
-        cube222 = cubes['obs'][layer]
-        cube223 = cubes['model'][layer] - cubes['obs'][layer]
-        cube224 = cubes['model'][layer] / cubes['obs'][layer]
+        cube221 = layer_cubes['model']
+        cube222 = layer_cubes['obs']
+        cube223 = layer_cubes['model'] - layer_cubes['obs']
+        cube224 = layer_cubes['model'] / layer_cubes['obs']
 
         # create the z axis for plots 2, 3, 4.
         extend = 'neither'
@@ -366,18 +362,14 @@ def make_scatter(
     filenames = {'model': model_filename, 'obs': obs_filename}
     logger.debug('make_model_vs_obs_plots: \t%s', filenames)
     # ####
-    # Load the data for each layer as a separate cube
-    layers = {}
+    # Load the data lazily, layers are extracted when plotting
     cubes = {}
     for model_type, input_file in filenames.items():
         logger.debug('loading: \t%s, \t%s', model_type, input_file)
         cube = iris.load_cube(input_file)
         cube = diagtools.bgc_units(cube, metadata[input_file]['short_name'])
-        cubes[model_type] = diagtools.make_cube_layer_dict(cube)
-        for layer in cubes[model_type]:
-            layers[layer] = True
+        cubes[model_type] = cube
 
-    logger.debug('layers: %s', layers)
     logger.debug('cubes: %s', ', '.join(cubes))
 
     # ####
@@ -385,20 +377,20 @@ def make_scatter(
     model = metadata[filenames['model']]['dataset']
     obs = metadata[filenames['obs']]['dataset']
 
-    long_name = cubes['model'][list(layers.keys())[0]].long_name
+    long_name = cubes['model'].long_name
 
     # Load image format extention
     image_extention = diagtools.get_image_format(cfg)
 
-    # Make a plot for each layer
-    for layer in layers:
+    # Make a plot for each layer (only one layer is held in memory)
+    for layer, layer_cubes in diagtools.iterate_cube_layers(cubes):
 
         fig = plt.figure()
         fig.set_size_inches(7, 6)
 
         # Create the cubes
-        model_data = np.ma.array(cubes['model'][layer].data)
-        obs_data = np.ma.array(cubes['obs'][layer].data)
+        model_data = np.ma.array(layer_cubes['model'].data)
+        obs_data = np.ma.array(layer_cubes['obs'].data)
 
         mask = model_data.mask + obs_data.mask
         model_data = np.ma.masked_where(mask, model_data).compressed()
@@ -93,6 +93,10 @@ def moving_average(cube, window):
     """
     Calculate a moving average.
 
+    This uses the calendar-aware moving window engine
+    :func:`esmvaltool.diag_scripts.ocean.diagnostic_tools.moving_average`,
+    which is linear in the number of time points.
+
     The window is a string which is a number and a measuremet of time.
     For instance, the following are acceptable window strings:
 
@@ -124,53 +128,7 @@ def moving_average(cube, window):
         A cube with the movinage average set as the data points.
 
     """
-    window = window.split()
-    window_len = int(window[0]) / 2.
-    win_units = str(window[1])
-
-    if win_units not in [
-            'days', 'day', 'dy', 'months', 'month', 'mn', 'years', 'yrs',
-            'year', 'yr'
-    ]:
-        raise ValueError("Moving average window units not recognised: " +
-                         "{}".format(win_units))
-
-    times = cube.coord('time').units.num2date(cube.coord('time').points)
-
-    datetime = diagtools.guess_calendar_datetime(cube)
-
-    output = []
-
-    times = np.array([
-        datetime(time_itr.year, time_itr.month, time_itr.day, time_itr.hour,
-                 time_itr.minute) for time_itr in times
-    ])
-
-    for time_itr in times:
-        if win_units in ['years', 'yrs', 'year', 'yr']:
-            tmin = datetime(time_itr.year - window_len, time_itr.month,
-                            time_itr.day, time_itr.hour, time_itr.minute)
-            tmax = datetime(time_itr.year + window_len, time_itr.month,
-                            time_itr.day, time_itr.hour, time_itr.minute)
-
-        if win_units in ['months', 'month', 'mn']:
-            tmin = datetime(time_itr.year, time_itr.month - window_len,
-                            time_itr.day, time_itr.hour, time_itr.minute)
-            tmax = datetime(time_itr.year, time_itr.month + window_len,
-                            time_itr.day, time_itr.hour, time_itr.minute)
-
-        if win_units in ['days', 'day', 'dy']:
-            tmin = datetime(time_itr.year, time_itr.month,
-                            time_itr.day - window_len, time_itr.hour,
-                            time_itr.minute)
-            tmax = datetime(time_itr.year, time_itr.month,
-                            time_itr.day + window_len, time_itr.hour,
-                            time_itr.minute)
-
-        arr = np.ma.masked_where((times < tmin) + (times > tmax), cube.data)
-        output.append(arr.mean())
-    cube.data = np.array(output)
-    return cube
+    return diagtools.moving_average(cube, window)
 
 
 def make_time_series_plots(
@@ -282,24 +240,19 @@ def multi_model_time_series(
     """
 
     ####
-    # Load the data for each layer as a separate cube
+    # Load the data lazily, layers are extracted when plotting
     model_cubes = {}
-    layers = {}
     for filename in sorted(metadata):
         if metadata[filename]['frequency'] != 'fx':
             cube = iris.load_cube(filename)
             cube = diagtools.bgc_units(cube, metadata[filename]['short_name'])
-
-            cubes = diagtools.make_cube_layer_dict(cube)
-            model_cubes[filename] = cubes
-            for layer in cubes:
-                layers[layer] = True
+            model_cubes[filename] = cube
 
     # Load image format extention
     image_extention = diagtools.get_image_format(cfg)
 
-    # Make a plot for each layer
-    for layer in layers:
+    # Make a plot for each layer (only one layer is held in memory)
+    for layer, layer_cubes in diagtools.iterate_cube_layers(model_cubes):
 
         title = ''
         z_units = ''
@@ -308,6 +261,8 @@ def multi_model_time_series(
 
         # Plot each file in the group
         for index, filename in enumerate(sorted(metadata)):
+            if filename not in layer_cubes:
+                continue
             if len(metadata) > 1:
                 color = cmap(index / (len(metadata) - 1.))
             else:
@@ -315,10 +270,10 @@ def multi_model_time_series(
 
             # Take a moving average, if needed.
             if 'moving_average' in cfg:
-                cube = moving_average(model_cubes[filename][layer],
+                cube = moving_average(layer_cubes[filename],
                                       cfg['moving_average'])
             else:
-                cube = model_cubes[filename][layer]
+                cube = layer_cubes[filename]
 
             if 'MultiModel' in metadata[filename]['dataset']:
                 timeplot(
@@ -351,8 +306,8 @@ def multi_model_time_series(
 
             title = metadata[filename]['long_name']
             if layer != '':
-                if model_cubes[filename][layer].coords('depth'):
-                    z_units = model_cubes[filename][layer].coord('depth').units
+                if layer_cubes[filename].coords('depth'):
+                    z_units = layer_cubes[filename].coord('depth').units
                 else:
                     z_units = ''
         # Add title, legend to plots
@@ -360,7 +315,7 @@ def multi_model_time_series(
             title = ' '.join([title, '(', str(layer), str(z_units), ')'])
         plt.title(title)
         plt.legend(loc='best')
-        plt.ylabel(str(model_cubes[filename][layer].units))
+        plt.ylabel(str(cube.units))
 
         # Saving files:
         if cfg['write_plots']:
@@ -17,6 +17,8 @@ import iris
 
 import numpy as np
 import cftime
+import cf_units
+import dask
 import matplotlib.pyplot as plt
 import yaml
 
@@ -26,6 +28,20 @@ from esmvaltool.diag_scripts.shared._base import _get_input_data_files
 logger = logging.getLogger(os.path.basename(__file__))
 logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
 
+# Units accepted for moving windows
+WINDOW_UNITS = {
+    'days': 'days',
+    'day': 'days',
+    'dy': 'days',
+    'months': 'months',
+    'month': 'months',
+    'mn': 'months',
+    'years': 'years',
+    'yrs': 'years',
+    'year': 'years',
+    'yr': 'years',
+}
+
 
 def get_obs_projects():
     """
@@ -298,6 +314,173 @@ def decadal_average(cube):
     return cube.aggregated_by('decade', iris.analysis.MEAN)
 
 
+def parse_window(window):
+    """
+    Parse a moving window description like ``10 years``.
+
+    Parameters
+    ----------
+    window: str
+        A number and a measurement of time (days, months or years).
+
+    Returns
+    -------
+    tuple
+        The window width (float) and the normalised unit (``'days'``,
+        ``'months'`` or ``'years'``).
+    """
+    window = window.split()
+    win_units = str(window[1])
+    if win_units not in WINDOW_UNITS:
+        raise ValueError("Moving average window units not recognised: " +
+                         "{}".format(win_units))
+    return float(window[0]), WINDOW_UNITS[win_units]
+
+
+def get_calendar_positions(cube, unit):
+    """
+    Calculate calendar-aware numeric positions of the time points.
+
+    For ``days``, this is the time in days. For ``months``, the integer
+    part is the number of months since year 0 and the fractional part is
+    the time elapsed in the current month in days, divided by the maximum
+    length of a month (31 days). Positions for ``years`` are the positions
+    for ``months`` divided by 12. Thus, shifting a position by whole months
+    or years keeps the day of the month, independent of the calendar.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        the opened dataset as a cube.
+    unit: str
+        One of ``'days'``, ``'months'`` or ``'years'``.
+
+    Returns
+    -------
+    numpy.array
+        Positions of the time points in the requested unit.
+    """
+    time_coord = cube.coord('time')
+    time_units = time_coord.units
+    day_units = cf_units.Unit('days since 1850-01-01',
+                              calendar=time_units.calendar)
+    days = time_units.convert(time_coord.points.astype(np.float64), day_units)
+    if unit == 'days':
+        return days
+
+    # Start of each month containing a time point (only computed once for
+    # each distinct month)
+    datetime = guess_calendar_datetime(cube)
+    dtimes = time_units.num2date(time_coord.points)
+    months = np.array([12 * dtime.year + dtime.month - 1 for dtime in dtimes])
+    (unique_months, inverse) = np.unique(months, return_inverse=True)
+    starts = [datetime(month // 12, month % 12 + 1, 1)
+              for month in unique_months]
+    starts = np.array(day_units.date2num(starts))[inverse.ravel()]
+    positions = months + (days - starts) / 31.
+    if unit == 'years':
+        positions /= 12.
+    return positions
+
+
+def get_window_bounds(positions, width):
+    """
+    Get the index bounds of centred moving windows.
+
+    Parameters
+    ----------
+    positions: numpy.array
+        Monotonically increasing positions (e.g. from
+        :func:`get_calendar_positions`).
+    width: float
+        The total width of the window (same unit as ``positions``). All
+        points within ``width / 2`` of a point are in its window.
+
+    Returns
+    -------
+    tuple of numpy.array
+        The lower (inclusive) and upper (exclusive) index of each window.
+    """
+    positions = np.asarray(positions)
+    if np.any(np.diff(positions) < 0):
+        raise ValueError("Moving windows require increasing time points")
+    # Points exactly at the edge of a window belong to it
+    tolerance = 64. * np.spacing(np.max(np.abs(positions)))
+    lower = np.searchsorted(positions,
+                            positions - width / 2. - tolerance,
+                            side='left')
+    upper = np.searchsorted(positions,
+                            positions + width / 2. + tolerance,
+                            side='right')
+    return lower, upper
+
+
+def windowed_mean(data, lower, upper, axis=0):
+    """
+    Calculate the mean over windows using cumulative sums.
+
+    Masked values are ignored, windows without valid values are masked.
+    This is linear in the length of ``axis``, independent of the window
+    size.
+
+    Parameters
+    ----------
+    data: numpy.array
+        The input data (may be masked).
+    lower: numpy.array
+        The lower (inclusive) index of each window along ``axis``.
+    upper: numpy.array
+        The upper (exclusive) index of each window along ``axis``.
+    axis: int
+        The axis to compute the windows along.
+
+    Returns
+    -------
+    numpy.ma.array
+        The mean of each window.
+    """
+    data = np.moveaxis(np.ma.asarray(data), axis, 0)
+    valid = ~np.ma.getmaskarray(data)
+    zeros = np.zeros((1, ) + data.shape[1:])
+    sums = np.concatenate(
+        [zeros, np.cumsum(np.ma.filled(data, 0.), axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    window_sums = sums[upper] - sums[lower]
+    window_counts = counts[upper] - counts[lower]
+    mean = np.ma.masked_where(window_counts == 0,
+                              window_sums / np.maximum(window_counts, 1))
+    return np.moveaxis(mean, 0, axis)
+
+
+def moving_average(cube, window):
+    """
+    Calculate a centred, calendar-aware moving average along time.
+
+    The window is a string which is a number and a measurement of time,
+    e.g. ``5 days``, ``12 years``, ``1 month`` or ``5 yr``, and gives the
+    total width of the window. At the start and end of the data, only the
+    available values are averaged.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        Input cube
+    window: str
+        A description of the window to use.
+
+    Returns
+    ----------
+    iris.cube.Cube:
+        The input cube with the moving average set as the data points.
+    """
+    (width, unit) = parse_window(window)
+    positions = get_calendar_positions(cube, unit)
+    (lower, upper) = get_window_bounds(positions, width)
+    axis = cube.coord_dims('time')[0]
+    cube.data = windowed_mean(cube.data, lower, upper, axis=axis)
+    return cube
+
+
 def load_thresholds(cfg, metadata):
     """
     Load the thresholds for contour plots from the config files.
@@ -550,6 +733,47 @@ def get_image_path(
     return path
 
 
+def get_cube_layer_indices(cube):
+    """
+    Determine the layers of a cube without touching its data.
+
+    A cube is split into layers along its `depth` or `region` coordinate.
+    Cubes with no (or a scalar) depth or region component consist of a single
+    layer, which is given by a blank empty string.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        the opened dataset as a cube.
+
+    Returns
+    ---------
+    dict
+        A dictionairy of layer name : index tuple which extracts the layer
+        from the cube (``None`` for the single layer of a cube without
+        layers).
+    """
+    layers = []
+    for coord in cube.coords():
+        if coord.standard_name in ['depth', 'region']:
+            layers.append(coord)
+
+    if layers == [] or len(layers[0].points) == 1:
+        return {'': None}
+
+    # iris stores coords as a list with one entry:
+    layer_dim = layers[0]
+    coord_dim = cube.coord_dims(layer_dim)[0]
+    indices = {}
+    for layer_index, layer in enumerate(layer_dim.points):
+        slices = [slice(None) for index in cube.shape]
+        slices[coord_dim] = layer_index
+        if layer_dim.standard_name == 'region':
+            layer = layer.replace('_', ' ').title()
+        indices[layer] = tuple(slices)
+    return indices
+
+
 def make_cube_layer_dict(cube):
     """
     Take a cube and return a dictionairy layer:cube
@@ -570,55 +794,59 @@ def make_cube_layer_dict(cube):
     dict
         A dictionairy of layer name : layer cube.
     """
-    #####
-    # Check layering:
-    coords = cube.coords()
-    layers = []
-    for coord in coords:
-        if coord.standard_name in ['depth', 'region']:
-            layers.append(coord)
-
     cubes = {}
-    if layers == []:
-        cubes[''] = cube
-        return cubes
+    for layer, index in get_cube_layer_indices(cube).items():
+        cubes[layer] = cube if index is None else cube[index]
+    return cubes
 
-    # if len(layers) > 1:
-    #     # This field has a strange number of layer dimensions.
-    #     # depth and regions?
-    #     print(cube)
-    #     raise ValueError('This cube has both `depth` & `region` coordinates:'
-    #                      ' %s', layers)
 
-    # iris stores coords as a list with one entry:
-    layer_dim = layers[0]
-    if len(layer_dim.points) in [
-            1,
-    ]:
-        cubes[''] = cube
-        return cubes
-
-    if layer_dim.standard_name == 'depth':
-        coord_dim = cube.coord_dims('depth')[0]
-        for layer_index, layer in enumerate(layer_dim.points):
-            slices = [slice(None) for index in cube.shape]
-            slices[coord_dim] = layer_index
-            cubes[layer] = cube[tuple(slices)]
-
-    if layer_dim.standard_name == 'region':
-        coord_dim = cube.coord_dims('region')[0]
-        for layer_index, layer in enumerate(layer_dim.points):
-            slices = [slice(None) for index in cube.shape]
-            slices[coord_dim] = layer_index
-            layer = layer.replace('_', ' ').title()
-            cubes[layer] = cube[tuple(slices)]
-    return cubes
+def iterate_cube_layers(cubes):
+    """
+    Iterate over the layers of several cubes, one layer at a time.
+
+    The cubes should have lazy data (as given by :func:`iris.load_cube`). For
+    each layer, only the data of this layer is realised (for all cubes at
+    once), so that the memory usage is bounded by the size of a single layer
+    times the number of cubes instead of the size of all full fields. The
+    layers are given in the order in which they first appear in the cubes.
+
+    Parameters
+    ----------
+    cubes: dict
+        A dictionairy of name : cube.
+
+    Yields
+    ------
+    tuple
+        The layer name and a dictionairy of name : layer cube (realised) of
+        all cubes which contain this layer.
+    """
+    layer_indices = {}
+    for name, cube in cubes.items():
+        for layer, index in get_cube_layer_indices(cube).items():
+            layer_indices.setdefault(layer, {})[name] = index
+    logger.debug('layers: %s', list(layer_indices))
+
+    for layer, indices in layer_indices.items():
+        layer_cubes = {}
+        for name, index in indices.items():
+            cube = cubes[name]
+            layer_cubes[name] = cube.copy() if index is None else cube[index]
+        lazy_cubes = [cube for cube in layer_cubes.values()
+                      if cube.has_lazy_data()]
+        data = dask.compute(*[cube.lazy_data() for cube in lazy_cubes])
+        for cube, cube_data in zip(lazy_cubes, data):
+            cube.data = cube_data
+        yield layer, layer_cubes
 
 
 def get_cube_range(cubes):
     """
     Determinue the minimum and maximum values of a list of cubes.
 
+    Lazy cubes are not realised, the minima and maxima of all cubes are
+    calculated with a single pass over the data.
+
     Parameters
     ----------
     cubes: list of iris.cube.Cube
@@ -631,11 +859,9 @@ def get_cube_range(cubes):
         list of cubes.
 
     """
-    mins = []
-    maxs = []
-    for cube in cubes:
-        mins.append(cube.data.min())
-        maxs.append(cube.data.max())
+    mins = [cube.core_data().min() for cube in cubes]
+    maxs = [cube.core_data().max() for cube in cubes]
+    (mins, maxs) = dask.compute(mins, maxs)
     return [np.min(mins), np.max(maxs), ]
 
 
@@ -643,6 +869,8 @@ def get_cube_range_diff(cubes):
     """
     Determinue the largest deviation from zero in an list of cubes.
 
+    Lazy cubes are not realised (see :func:`get_cube_range`).
+
     Parameters
     ----------
     cubes: list of iris.cube.Cube
@@ -653,11 +881,9 @@ def get_cube_range_diff(cubes):
     list:
         A list of two values: the maximum deviation from zero and its opposite.
     """
-    ranges = []
-    for cube in cubes:
-        ranges.append(np.abs(cube.data.min()))
-        ranges.append(np.abs(cube.data.max()))
-    return [-1. * np.max(ranges), np.max(ranges)]
+    (minimum, maximum) = get_cube_range(cubes)
+    max_range = np.max([np.abs(minimum), np.abs(maximum)])
+    return [-1. * max_range, max_range]
 
 
 def get_array_range(arrays):
@@ -1,5 +1,6 @@
 """Sea ice drift diagnostic."""
 import os
+import hashlib
 import logging
 import math
 import csv
@@ -17,7 +18,11 @@ import iris.coords
 from iris.util import broadcast_to_shape
 from iris.aux_factory import AuxCoordFactory
 from pyproj import Transformer
-from shapely.geometry import Polygon, Point
+from shapely.geometry import Polygon
+try:
+    from shapely import contains_xy
+except ImportError:
+    from shapely.vectorized import contains as contains_xy
 
 
 import esmvaltool.diag_scripts.shared
@@ -581,10 +586,15 @@ class InsidePolygonFactory(AuxCoordFactory):
         self.units = '1.0'
         self.attributes = {}
 
+        # Masks computed so far, key is grid hash
+        self._cache = {}
+
+        polygon = [tuple(point) for point in polygon]
         polygon.append(polygon[0])
         self.transformer = Transformer.from_crs(
             "WGS84",
-            "North_Pole_Stereographic"
+            "North_Pole_Stereographic",
+            always_xy=True,
         )
 
         transformed = []
@@ -600,16 +610,25 @@ class InsidePolygonFactory(AuxCoordFactory):
         return {'lat': self.lat, 'lon': self.lon}
 
     def _derive(self, lat, lon):
-        def in_polygon(lat, lon):
-            """Check if point is inside polygon"""
-            if lon > 180:
-                lon -= 360
-            point = self.transformer.transform(lon, lat)
-            if self.polygon.contains(Point(point[0], point[1])):
-                return 1.
-            return np.nan
-        vectorized = np.vectorize(in_polygon)
-        return vectorized(lat, lon)
+        """Check which points are inside polygon (1.0 inside, NaN outside).
+
+        All points are projected in a single call and tested at once. The
+        result is cached for each grid (every access of the derived
+        coordinate calls this method again).
+        """
+        (lat, lon) = np.broadcast_arrays(np.asarray(lat, dtype=np.float64),
+                                         np.asarray(lon, dtype=np.float64))
+        grid_hash = hashlib.sha1()
+        grid_hash.update(str(lat.shape).encode())
+        grid_hash.update(np.ascontiguousarray(lat).tobytes())
+        grid_hash.update(np.ascontiguousarray(lon).tobytes())
+        key = grid_hash.hexdigest()
+        if key not in self._cache:
+            lon = np.where(lon > 180, lon - 360, lon)
+            (x_points, y_points) = self.transformer.transform(lon, lat)
+            inside = contains_xy(self.polygon, x_points, y_points)
+            self._cache[key] = np.where(inside, 1., np.nan)
+        return self._cache[key].copy()
 
     def make_coord(self, coord_dims_func):
         """
@@ -10,9 +10,10 @@ branch develop-fmasson
 import os
 import logging
 import math
-import warnings
 import numpy as np
 
+import dask
+import dask.array as da
 import scipy.stats
 import iris
 import matplotlib.pyplot as plt
@@ -25,6 +26,44 @@ from esmvaltool.diag_scripts.shared._base import ProvenanceLogger
 logger = logging.getLogger(os.path.basename(__file__))
 
 
+def _polyfit_columns(data, order):
+    """
+    Fit polynomials to all columns of a 2D array at once.
+
+    Equivalent to calling :func:`numpy.polyfit` for every column separately
+    after removing its NaNs (the time coordinate of the fit is the index of
+    the valid values), but solves all least-squares problems simultaneously.
+
+    Parameters
+    ----------
+    data : numpy.array
+        Data of shape (time, columns), may contain NaNs
+    order : int
+        Order of the polynomial
+
+    Returns
+    -------
+    numpy.array
+        Polynomial coefficients of shape (order + 1, columns), highest power
+        first (as returned by :func:`numpy.polyfit`); columns with less than
+        ``order + 1`` valid values cannot be fitted and get NaN coefficients
+    """
+    valid = ~np.isnan(data)
+    time_nonan = np.cumsum(valid, axis=0) - 1.0
+    vander = time_nonan[..., np.newaxis]**np.arange(order, -1, -1)
+    vander = vander * valid[..., np.newaxis]
+    values = np.where(valid, data, 0.0)
+    lhs = np.einsum('tci,tcj->cij', vander, vander)
+    rhs = np.einsum('tci,tc->ci', vander, values)
+
+    # Replace singular systems of degenerate columns by dummy ones
+    degenerate = np.sum(valid, axis=0) < order + 1
+    lhs[degenerate] = np.identity(order + 1)
+    polynom = np.linalg.solve(lhs, rhs[..., np.newaxis])[..., 0]
+    polynom[degenerate] = np.nan
+    return polynom.T
+
+
 class NegativeSeaIceFeedback(object):
     """
     Diagnostic to evaluate the negative ice growth-ice thickness feedback
@@ -124,30 +163,32 @@ class NegativeSeaIceFeedback(object):
         """
         if np.max(mask) != 1.0 or np.min(mask) < 0.0:
             raise ValueError("Mask not between 0 and 1")
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore")
-            max_thick = avg_thick.collapsed(
-                avg_thick.coords(), iris.analysis.MAX
-            )
-        if float(max_thick.data) > 20.0:
-            logger.warning("Large sea ice thickness:"
-                           "Max = %f",
-                           max_thick.data)
-
-        if avg_thick.coords('time'):
-            vol = []
-            for thick_slice in avg_thick.slices_over('time'):
-                vol.append(
-                    np.sum(
-                        thick_slice.data * cellarea.data * mask.data
-                    ) / 1e12
-                )
-            vol = np.asarray(vol)
+        time_dims = avg_thick.coord_dims('time') if avg_thick.coords(
+            'time') else ()
+        if time_dims:
+            thick = da.moveaxis(avg_thick.lazy_data(), time_dims[0], 0)
         elif len(avg_thick.shape) == 2:
-            vol = np.sum(avg_thick * cellarea * mask) / 1e12
+            thick = avg_thick.lazy_data()[np.newaxis]
         else:
             raise ValueError("avgthickness has not 2 nor 3 dimensions")
-        return vol
+
+        # Area-weighted sum over all grid cells for all times at once, the
+        # maximum thickness is calculated in the same pass over the data.
+        # Masked cells (land) must not contribute to the volume, so their
+        # thickness and area are set to 0 before dropping the masks
+        thick = da.ma.filled(thick, 0.0)
+        weights = np.asarray(np.ma.filled(cellarea * mask, 0.0),
+                             dtype=np.float64)
+        vol = da.sum(thick * weights, axis=(1, 2)) / 1e12
+        (max_thick, vol) = dask.compute(da.max(thick), vol)
+        if float(max_thick) > 20.0:
+            logger.warning("Large sea ice thickness:"
+                           "Max = %f",
+                           max_thick)
+
+        if not avg_thick.coords('time'):
+            return vol[0]
+        return np.asarray(vol)
 
     @staticmethod
     def detrend(data, order=1, period=None):
@@ -197,40 +238,35 @@ class NegativeSeaIceFeedback(object):
         # residuals will be computed from the original data in order
         # to keep the same size and to restitute NaNs where they appeared
 
-        data_nonan = data[~np.isnan(data)]
-
         # If the signal has no periodicity, we just make a linear regression
-        if period is None:
-            time_nonan = np.arange(len(data_nonan))
-            time = np.arange(len(data))
-            polynom = np.polyfit(time_nonan, data_nonan, order)
-            residuals = data - np.sum([polynom[i] * time ** (order - i)
-                                       for i in range(order + 1)], axis=0)
-
+        # (equivalent to a period of one time step).
         # If the signal contains a periodical component, we do the regression
-        # time step per time step
-        else:
-            residuals = np.empty([n])
-
-            # For each time step of the period, detrend
-            # Note that another common option is to first remove a seasonal
-            # cycle and then detrend the anomalies. However this assumes that
-            # a cycle can be estimated, which in presence of a trend is tricky
-            # because the trend component interferes with the mean. I have
-            # tried that and it gives ugly step-wise anomalies. Detrending day
-            # per day seems the most natural way to do, at least as long as we
-            # assume that the raw signal at some time is the result of a
-            # seasonal cycle depending on the position of the time step in the
-            # period, plus a common trend, plus some noise.
-            for i in np.arange(period):
-                raw = data[np.arange(i, n, period)]
-                raw_nonan = raw[~np.isnan(raw)]
-                time = np.arange(len(raw))
-                time_nonan = np.arange(len(raw_nonan))
-                polynom = np.polyfit(time_nonan, raw_nonan, order)
-                residuals[np.arange(i, n, period)] = \
-                    raw - np.sum([polynom[i] * time ** (order - i)
-                                  for i in range(order + 1)], axis=0)
+        # time step per time step (for all time steps at once).
+        # Note that another common option is to first remove a seasonal
+        # cycle and then detrend the anomalies. However this assumes that
+        # a cycle can be estimated, which in presence of a trend is tricky
+        # because the trend component interferes with the mean. I have
+        # tried that and it gives ugly step-wise anomalies. Detrending day
+        # per day seems the most natural way to do, at least as long as we
+        # assume that the raw signal at some time is the result of a
+        # seasonal cycle depending on the position of the time step in the
+        # period, plus a common trend, plus some noise.
+        data = np.asarray(data, dtype=np.float64)
+        n_time = len(data)
+        if period is None:
+            period = 1
+
+        # Arrange data as (years, time steps of the period), incomplete
+        # periods are padded with NaNs, and fit all time steps at once
+        n_periods = -(-n_time // period)
+        raw = np.full(n_periods * period, np.nan)
+        raw[:n_time] = data
+        raw = raw.reshape(n_periods, period)
+        polynom = _polyfit_columns(raw, order)
+        time = np.arange(n_periods)[:, np.newaxis]
+        trend = np.sum([polynom[i] * time**(order - i)
+                        for i in range(order + 1)], axis=0)
+        residuals = (raw - trend).ravel()[:n_time]
         return residuals
 
     def negative_seaice_feedback(self, dataset_info, volume, period, order=1):
@@ -279,12 +315,13 @@ class NegativeSeaIceFeedback(object):
             )
 
         # 1. Locate the minima for each year
-        imin = [t + np.nanargmin(volume.data[t:t + period])
-                for t in range(0, volume.size, period)]
+        volume = np.asarray(volume)
+        yearly_volume = volume.reshape(-1, period)
+        start = np.arange(0, volume.size, period)
+        imin = start + np.nanargmin(yearly_volume, axis=1)
 
         # 2. Locate the maxima for each year
-        imax = [t + np.nanargmax(volume.data[t:t + period])
-                for t in np.arange(0, volume.size, period)]
+        imax = start + np.nanargmax(yearly_volume, axis=1)
 
         # 3. Detrend series. A one-year shift is introduced to make sure we
         #    compute volume production *after* the summer minimum
@@ -1,8 +1,19 @@
-"""Code that is shared between multiple diagnostic scripts."""
-from . import io, iris_helpers, names, plot
+"""Code that is shared between multiple diagnostic scripts.
+
+Note
+----
+To keep the startup time of diagnostics short, the submodules ``io``,
+``iris_helpers``, ``names`` and ``plot`` (which imports :mod:`matplotlib` and
+:mod:`cartopy`) and the functions and classes defined in them are only
+imported when they are accessed for the first time.
+
+"""
+import importlib
+
 from ._base import (
     ProvenanceLogger,
     extract_variables,
+    flush_figures,
     get_cfg,
     get_diagnostic_filename,
     get_plot_filename,
@@ -15,19 +26,31 @@ from ._base import (
     sorted_metadata,
     variables_available,
 )
-from ._diag import Datasets, Variable, Variables
-from ._validation import apply_supermeans, get_control_exper_obs
+from ._profiling import profile_phase
+
+_LAZY_SUBMODULES = ('io', 'iris_helpers', 'names', 'plot')
+_LAZY_ATTRIBUTES = {
+    'Datasets': '._diag',
+    'Variable': '._diag',
+    'Variables': '._diag',
+    'apply_supermeans': '._validation',
+    'get_control_exper_obs': '._validation',
+    'truncated_eof': '._eof',
+}
 
 __all__ = [
     # Main entry point for diagnostics
     'run_diagnostic',
     # Define and write output files
     'save_figure',
+    'flush_figures',
     'save_data',
     'get_plot_filename',
     'get_diagnostic_filename',
     # Log provenance
     'ProvenanceLogger',
+    # Record timings
+    'profile_phase',
     # Select and sort input metadata
     'select_metadata',
     'sorted_metadata',
@@ -49,4 +72,23 @@ __all__ = [
     # Validation module
     'get_control_exper_obs',
     'apply_supermeans',
+    # EOF analysis
+    'truncated_eof',
 ]
+
+
+def __getattr__(name):
+    """Import submodules and their members lazily."""
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__():
+    """List all (also lazily imported) attributes."""
+    return sorted(set(globals()) | set(__all__))
@@ -3,18 +3,160 @@ import argparse
 import contextlib
 import glob
 import logging
+import multiprocessing
 import os
+import pickle
 import shutil
 import sys
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from copy import deepcopy
 from pathlib import Path
 
 import iris
-import matplotlib.pyplot as plt
 import yaml
 
+from ._profiling import _record_phase, profile_diagnostic, profile_phase
+
 logger = logging.getLogger(__name__)
 
+_FIGURE_RENDER_POOL = None
+
+
+class _FigureRenderPool:
+    """Process pool which renders and saves figures in the background.
+
+    Matplotlib is not thread-safe, so figures are pickled and rendered in
+    separate (spawned) processes. At most ``max_pending`` figures are kept
+    in memory, submitting further figures blocks until a pending figure has
+    been written. Logging and profiling are not set up in the worker
+    processes, so render times are reported by the main process as soon as
+    a figure has been written.
+    """
+    def __init__(self, n_workers, max_pending):
+        self._executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context('spawn'))
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._futures = []
+
+    def submit(self, figure, filenames, on_saved=None, **kwargs):
+        """Render and save figure in the background.
+
+        ``on_saved`` is called without arguments in the main process (by
+        :meth:`flush`) once the figure has been written successfully. Returns
+        ``False`` if the figure cannot be pickled, it is not saved in this
+        case.
+        """
+        try:
+            pickled_figure = pickle.dumps(figure)
+        except (pickle.PicklingError, AttributeError, TypeError) as exc:
+            logger.debug("Cannot render figure asynchronously: %s", exc)
+            return False
+        for filename in filenames:
+            logger.info("Plotting analysis results to %s", filename)
+        self._pending.acquire()
+        future = self._executor.submit(_render_pickled_figure, pickled_figure,
+                                       filenames, **kwargs)
+        future.add_done_callback(self._report_render_time)
+        self._futures.append((future, on_saved))
+        return True
+
+    def _report_render_time(self, future):
+        """Report render time of a figure (called in the main process)."""
+        self._pending.release()
+        if future.cancelled() or future.exception() is not None:
+            return
+        (filename, render_time, cpu_time) = future.result()
+        _record_phase('render_figure', render_time, cpu_time)
+        logger.debug("Rendered %s in %.2f s", filename.stem, render_time)
+
+    def flush(self):
+        """Wait until all figures are written and return render times.
+
+        Raises the exception of the first figure that could not be written.
+        """
+        (futures, self._futures) = (self._futures, [])
+        try:
+            wait([future for (future, _) in futures])
+            render_times = []
+            for (future, on_saved) in futures:
+                render_times.append(future.result()[1])
+                if on_saved is not None:
+                    on_saved()
+        finally:
+            self._executor.shutdown()
+        return render_times
+
+
+def _get_figure_render_pool(cfg):
+    """Get pool for asynchronous rendering of figures (if desired)."""
+    global _FIGURE_RENDER_POOL
+    n_workers = cfg.get('save_figure_processes')
+    if not n_workers:
+        return None
+    if _FIGURE_RENDER_POOL is None:
+        max_pending = cfg.get('save_figure_max_pending', 2 * n_workers)
+        logger.info(
+            "Rendering figures asynchronously using %i process(es) (at most "
+            "%i pending figure(s))", n_workers, max_pending)
+        _FIGURE_RENDER_POOL = _FigureRenderPool(n_workers, max_pending)
+    return _FIGURE_RENDER_POOL
+
+
+@profile_phase('render_figure')
+def _render_figure(figure, filenames, **kwargs):
+    """Render and save figure to all given files and return render time."""
+    start_time = time.perf_counter()
+    for filename in filenames:
+        logger.info("Plotting analysis results to %s", filename)
+        figure.savefig(filename, **kwargs)
+    render_time = time.perf_counter() - start_time
+    logger.debug("Rendered %s in %.2f s", filenames[0].stem, render_time)
+    return render_time
+
+
+def _render_pickled_figure(pickled_figure, filenames, **kwargs):
+    """Unpickle figure in a worker process and render it.
+
+    Returns the first file name and the wall and CPU time of the rendering.
+    """
+    import matplotlib
+    matplotlib.use('agg')
+    import matplotlib.pyplot as plt
+
+    figure = pickle.loads(pickled_figure)
+    start_time = time.perf_counter()
+    start_cpu_time = time.process_time()
+    for filename in filenames:
+        figure.savefig(filename, **kwargs)
+    render_time = time.perf_counter() - start_time
+    cpu_time = time.process_time() - start_cpu_time
+    plt.close(figure)
+    return (filenames[0], render_time, cpu_time)
+
+
+def flush_figures():
+    """Wait until all figures saved asynchronously are written.
+
+    This is automatically called at the end of :func:`run_diagnostic`.
+
+    See Also
+    --------
+    save_figure: For details on asynchronous saving of figures.
+    """
+    global _FIGURE_RENDER_POOL
+    if _FIGURE_RENDER_POOL is None:
+        return
+    (render_pool, _FIGURE_RENDER_POOL) = (_FIGURE_RENDER_POOL, None)
+    render_times = render_pool.flush()
+    if render_times:
+        logger.info(
+            "Rendered %i figure(s) asynchronously (total render time %.1f s, "
+            "maximum render time %.1f s)", len(render_times),
+            sum(render_times), max(render_times))
+
 
 def get_plot_filename(basename, cfg):
     """Get a valid path for saving a diagnostic plot.
@@ -60,6 +202,7 @@ def get_diagnostic_filename(basename, cfg, extension='nc'):
     )
 
 
+@profile_phase('save_figure')
 def save_figure(basename, provenance, cfg, figure=None, close=True, **kwargs):
     """Save a figure to file.
 
@@ -78,11 +221,25 @@ def save_figure(basename, provenance, cfg, figure=None, close=True, **kwargs):
     **kwargs:
         Keyword arguments to pass to :obj:`matplotlib.figure.Figure.savefig`.
 
+    Note
+    ----
+    If the option ``save_figure_processes`` is given in ``cfg``, figures
+    which are closed after saving are pickled and rendered asynchronously by
+    this number of background processes (matplotlib is not thread-safe).
+    Figures that cannot be pickled are rendered immediately. At most
+    ``save_figure_max_pending`` (default: twice the number of processes)
+    figures are kept in memory. All figures are written at the latest at the
+    end of :func:`run_diagnostic` (see :func:`flush_figures`). The
+    provenance of these figures is recorded once they have been written.
+
     See Also
     --------
     ProvenanceLogger: For an example provenance record that can be used
         with this function.
     """
+    # Import matplotlib only when plotting (reduces startup time)
+    import matplotlib.pyplot as plt
+
     if cfg.get('output_file_type') is None:
         extensions = ('png', 'pdf')
     elif isinstance(cfg['output_file_type'], str):
@@ -90,19 +247,33 @@ def save_figure(basename, provenance, cfg, figure=None, close=True, **kwargs):
     else:
         extensions = cfg['output_file_type']
 
+    filenames = []
     for ext in extensions:
         filename = Path(cfg['plot_dir']) / ext / f"{basename}.{ext}"
         filename.parent.mkdir(exist_ok=True)
-        logger.info("Plotting analysis results to %s", filename)
-        fig = plt if figure is None else figure
-        fig.savefig(filename, **kwargs)
-        with ProvenanceLogger(cfg) as provenance_logger:
-            provenance_logger.log(filename, provenance)
+        filenames.append(filename)
+    provenance = deepcopy(provenance)
 
+    def log_provenance():
+        """Record provenance of the written files."""
+        with ProvenanceLogger(cfg) as provenance_logger:
+            for filename in filenames:
+                provenance_logger.log(filename, deepcopy(provenance))
+
+    render_pool = _get_figure_render_pool(cfg)
+    if render_pool is not None and close:
+        figure = plt.gcf() if figure is None else figure
+        if render_pool.submit(figure, filenames, log_provenance, **kwargs):
+            plt.close(figure)
+            return
+
+    _render_figure(plt if figure is None else figure, filenames, **kwargs)
+    log_provenance()
     if close:
         plt.close(figure)
 
 
+@profile_phase('save_data')
 def save_data(basename, provenance, cfg, cube, **kwargs):
     """Save the data used to create a plot to file.
 
@@ -467,6 +638,13 @@ def run_diagnostic():
 
     The `cfg` dict passed to `main` contains the script configuration that
     can be used with the other functions in this module.
+
+    Wall time, CPU time and peak memory usage of the diagnostic and of all
+    phases recorded with :func:`profile_phase` (including all calls of
+    :func:`iris.load`, :func:`save_data` and :func:`save_figure`) are written
+    to ``diagnostic_timings.json`` in the ``run_dir``. Use the command line
+    flag ``--profile`` to additionally profile the diagnostic with
+    :mod:`cProfile`.
     """
     # Implemented as context manager so we can support clean up actions later
     parser = argparse.ArgumentParser(description="Diagnostic script")
@@ -491,6 +669,13 @@ def run_diagnostic():
         help=("Set the log-level"),
         choices=['debug', 'info', 'warning', 'error'],
     )
+    parser.add_argument(
+        '-p',
+        '--profile',
+        help=("Profile the diagnostic with cProfile and write the statistics "
+              "to diagnostic_profile.prof in the run_dir"),
+        action='store_true',
+    )
     args = parser.parse_args()
 
     cfg = get_cfg(args.filename)
@@ -553,6 +738,9 @@ def run_diagnostic():
     if os.path.exists(provenance_file):
         os.remove(provenance_file)
 
-    yield cfg
+    with profile_diagnostic(cfg['run_dir'], cprofile=args.profile):
+        yield cfg
+        with profile_phase('flush_figures'):
+            flush_figures()
 
     logger.info("End of diagnostic script run.")
@@ -0,0 +1,145 @@
+"""Truncated empirical orthogonal function (EOF) analysis."""
+import collections
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+EOFResult = collections.namedtuple(
+    'EOFResult', ['eofs', 'pcs', 'eigenvalues', 'variance_fraction'])
+EOFResult.__doc__ = """Result of :func:`truncated_eof`.
+
+Attributes
+----------
+eofs: numpy.ndarray
+    EOFs (of the weighted data) of shape ``(n_modes, ...)``. Grid points
+    with missing values are NaN.
+pcs: numpy.ndarray
+    Unscaled principal components of shape ``(n_samples, n_modes)``.
+eigenvalues: numpy.ndarray
+    Eigenvalues of the covariance matrix of shape ``(n_modes, )``.
+variance_fraction: numpy.ndarray
+    Fraction of the total variance explained by each mode of shape
+    ``(n_modes, )``.
+
+"""
+
+EOF_METHODS = ('exact', 'randomized')
+
+
+def _randomized_svd(matrix, n_modes, n_oversamples, n_iter, random_state):
+    """Calculate the leading singular vectors with a randomized range finder.
+
+    See Halko et al. (2011), doi:10.1137/090771806.
+
+    """
+    n_random = min(n_modes + n_oversamples, min(matrix.shape))
+    test_matrix = random_state.normal(size=(matrix.shape[1], n_random))
+    (range_basis, _) = np.linalg.qr(matrix @ test_matrix)
+    for _ in range(n_iter):
+        (range_basis, _) = np.linalg.qr(matrix.T @ range_basis)
+        (range_basis, _) = np.linalg.qr(matrix @ range_basis)
+    (u_small, singular_values, v_transposed) = np.linalg.svd(
+        range_basis.T @ matrix, full_matrices=False)
+    u_matrix = range_basis @ u_small
+    return (u_matrix[:, :n_modes], singular_values[:n_modes],
+            v_transposed[:n_modes])
+
+
+def truncated_eof(data, n_modes=None, weights=None, method='randomized',
+                  n_oversamples=10, n_iter=4, random_state=None):
+    """Calculate the leading EOFs and principal components of a data array.
+
+    The first dimension of ``data`` is the sample dimension (e.g. time or
+    ensemble members), all other dimensions are flattened into a single
+    space dimension. The mean along the sample dimension is removed and the
+    anomalies are multiplied by ``weights`` before the decomposition (as in
+    :class:`eofs.standard.Eof`). Grid points which contain missing values
+    (NaN or masked) are ignored.
+
+    With ``method='randomized'``, only the requested modes are calculated
+    using a randomized singular value decomposition, whose costs scale
+    linearly with the number of grid points and samples. With
+    ``method='exact'``, a complete singular value decomposition is used.
+
+    Parameters
+    ----------
+    data: numpy.ndarray
+        Input data of shape ``(n_samples, ...)``.
+    n_modes: int, optional
+        Number of modes to calculate. If not given, all modes are returned.
+    weights: numpy.ndarray, optional
+        Weights which are broadcastable to ``data.shape[1:]`` (e.g. square
+        root of the cosine of the latitude).
+    method: str, optional (default: 'randomized')
+        ``'randomized'`` or ``'exact'``.
+    n_oversamples: int, optional (default: 10)
+        Additional number of random vectors used by the randomized method.
+    n_iter: int, optional (default: 4)
+        Number of power iterations used by the randomized method.
+    random_state: int or numpy.random.RandomState, optional
+        Seed for the randomized method.
+
+    Returns
+    -------
+    EOFResult
+        EOFs, PCs, eigenvalues and variance fractions of the leading modes
+        (sorted by decreasing eigenvalue).
+
+    Raises
+    ------
+    ValueError
+        Invalid ``method`` or ``n_modes`` given.
+
+    """
+    if method not in EOF_METHODS:
+        raise ValueError(
+            f"Expected one of {EOF_METHODS} for method, got '{method}'")
+    data = np.ma.filled(np.ma.asarray(data, dtype=np.float64), np.nan)
+    n_samples = data.shape[0]
+    space_shape = data.shape[1:]
+
+    # Weighted anomalies of valid grid points
+    anomalies = data - np.mean(data, axis=0)
+    if weights is not None:
+        anomalies = anomalies * np.broadcast_to(weights, space_shape)
+    anomalies = anomalies.reshape(n_samples, -1)
+    valid = np.all(np.isfinite(anomalies), axis=0)
+    anomalies = anomalies[:, valid]
+
+    max_modes = min(anomalies.shape)
+    if n_modes is None:
+        n_modes = max_modes
+    if not 0 < n_modes <= max_modes:
+        raise ValueError(
+            f"Expected number of modes between 1 and {max_modes:d}, got "
+            f"{n_modes}")
+
+    # Decomposition
+    if method == 'randomized' and n_modes < max_modes:
+        if not isinstance(random_state, np.random.RandomState):
+            random_state = np.random.RandomState(random_state)
+        (u_matrix, singular_values, v_transposed) = _randomized_svd(
+            anomalies, n_modes, n_oversamples, n_iter, random_state)
+    else:
+        (u_matrix, singular_values, v_transposed) = np.linalg.svd(
+            anomalies, full_matrices=False)
+        u_matrix = u_matrix[:, :n_modes]
+        singular_values = singular_values[:n_modes]
+        v_transposed = v_transposed[:n_modes]
+
+    # Eigenvalues of the covariance matrix, total variance is independent of
+    # the number of modes
+    ddof = 1 if n_samples > 1 else 0
+    eigenvalues = singular_values**2 / (n_samples - ddof)
+    total_variance = np.sum(anomalies**2) / (n_samples - ddof)
+    eofs = np.full((n_modes, valid.size), np.nan)
+    eofs[:, valid] = v_transposed
+    return EOFResult(
+        eofs=eofs.reshape((n_modes, ) + space_shape),
+        pcs=u_matrix * singular_values,
+        eigenvalues=eigenvalues,
+        variance_fraction=eigenvalues / total_variance,
+    )
@@ -0,0 +1,210 @@
+"""Timing and memory instrumentation for python diagnostics.
+
+Example
+-------
+Time individual phases of a diagnostic by e.g.::
+
+    from esmvaltool.diag_scripts.shared import profile_phase
+
+    with profile_phase('regridding'):
+        cube = cube.regrid(target_grid, iris.analysis.Linear())
+
+    @profile_phase('plotting')
+    def plot_maps(cfg, cubes):
+        ...
+
+Wall time, CPU time and peak resident set size (RSS) of all phases are
+written to ``diagnostic_timings.json`` in the ``run_dir`` of the diagnostic
+at the end of :func:`esmvaltool.diag_scripts.shared.run_diagnostic`.
+
+"""
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+
+import iris
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+IRIS_LOAD_FUNCTIONS = ('load', 'load_cube', 'load_cubes', 'load_raw')
+
+_LOCK = threading.Lock()
+_RECORDS = []
+_START_TIME = time.perf_counter()
+
+
+def _get_peak_rss():
+    """Get peak resident set size of the current process in MiB."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return max_rss / 1024.0**2
+    return max_rss / 1024.0
+
+
+def _get_summary(records):
+    """Summarize records of phases with identical names."""
+    summary = {}
+    for record in records:
+        phase = summary.setdefault(record['phase'], {
+            'count': 0,
+            'wall_time': 0.0,
+            'cpu_time': 0.0,
+            'peak_rss': None,
+        })
+        phase['count'] += 1
+        phase['wall_time'] += record['wall_time']
+        phase['cpu_time'] += record['cpu_time']
+        if record['peak_rss'] is not None:
+            phase['peak_rss'] = max(phase['peak_rss'] or 0.0,
+                                    record['peak_rss'])
+    return summary
+
+
+def _instrument(function, phase):
+    """Record phase for every call of ``function``."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with profile_phase(phase):
+            return function(*args, **kwargs)
+
+    wrapper.__wrapped_by_profile_phase__ = True
+    return wrapper
+
+
+def _record_phase(phase, wall_time, cpu_time):
+    """Record phase which has been run in another process."""
+    record = {
+        'phase': phase,
+        'start': time.perf_counter() - wall_time - _START_TIME,
+        'wall_time': wall_time,
+        'cpu_time': cpu_time,
+        'peak_rss': None,
+    }
+    with _LOCK:
+        _RECORDS.append(record)
+
+
+@contextlib.contextmanager
+def profile_phase(phase):
+    """Record wall time, CPU time and peak RSS of a phase of a diagnostic.
+
+    Can be used as context manager or as decorator. Nested phases are
+    recorded separately. Note that the CPU time is measured for the whole
+    process (i.e. includes all threads) and that the peak RSS is the maximum
+    RSS of the process reached until the end of the phase.
+
+    Parameters
+    ----------
+    phase: str
+        Name of the phase.
+    """
+    start_wall_time = time.perf_counter()
+    start_cpu_time = time.process_time()
+    try:
+        yield
+    finally:
+        record = {
+            'phase': phase,
+            'start': start_wall_time - _START_TIME,
+            'wall_time': time.perf_counter() - start_wall_time,
+            'cpu_time': time.process_time() - start_cpu_time,
+            'peak_rss': _get_peak_rss(),
+        }
+        with _LOCK:
+            _RECORDS.append(record)
+        logger.debug("Phase '%s' took %.2f s (CPU time %.2f s)", phase,
+                     record['wall_time'], record['cpu_time'])
+
+
+@contextlib.contextmanager
+def profile_diagnostic(run_dir, cprofile=False):
+    """Instrument a complete diagnostic run.
+
+    All calls of :func:`iris.load`, :func:`iris.load_cube`,
+    :func:`iris.load_cubes` and :func:`iris.load_raw` are recorded as phase
+    ``iris.load``. At the end, all records are written to
+    ``diagnostic_timings.json`` in ``run_dir``.
+
+    Parameters
+    ----------
+    run_dir: str
+        Run directory of the diagnostic.
+    cprofile: bool
+        Additionally run :mod:`cProfile` and write its statistics to
+        ``diagnostic_profile.prof`` in ``run_dir``.
+    """
+    global _START_TIME
+    with _LOCK:
+        _RECORDS.clear()
+    _START_TIME = time.perf_counter()
+
+    # Instrument iris load functions
+    original_functions = {}
+    for name in IRIS_LOAD_FUNCTIONS:
+        function = getattr(iris, name)
+        if getattr(function, '__wrapped_by_profile_phase__', False):
+            continue
+        original_functions[name] = function
+        setattr(iris, name, _instrument(function, 'iris.load'))
+
+    profiler = cProfile.Profile() if cprofile else None
+    try:
+        with profile_phase('diagnostic'):
+            if profiler is None:
+                yield
+            else:
+                profiler.enable()
+                try:
+                    yield
+                finally:
+                    profiler.disable()
+    finally:
+        for (name, function) in original_functions.items():
+            setattr(iris, name, function)
+        _write_timings(os.path.join(run_dir, 'diagnostic_timings.json'))
+        if profiler is not None:
+            _write_profile(profiler,
+                           os.path.join(run_dir, 'diagnostic_profile.prof'))
+
+
+def _write_profile(profiler, path):
+    """Write :mod:`cProfile` statistics and log most expensive functions."""
+    profiler.dump_stats(path)
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats('cumulative').print_stats(20)
+    logger.info("Wrote %s, most expensive functions:\n%s", path,
+                stream.getvalue())
+
+
+def _write_timings(path):
+    """Write all recorded phases to JSON file."""
+    with _LOCK:
+        records = list(_RECORDS)
+    timings = {
+        'summary': _get_summary(records),
+        'phases': records,
+    }
+    with open(path, 'w') as file:
+        json.dump(timings, file, indent=2)
+    for (phase, summary) in timings['summary'].items():
+        logger.info(
+            "Phase '%s': %i call(s), wall time %.2f s, CPU time %.2f s",
+            phase, summary['count'], summary['wall_time'],
+            summary['cpu_time'])
+    logger.info("Wrote %s", path)
@@ -16,6 +16,8 @@ import iris.coord_categorisation
 from iris.coord_categorisation import _pt_date
 import numpy as np
 
+from .iris_helpers import load_cubelist
+
 
 class NoBoundsError(ValueError):
     """Return error and pass."""
@@ -51,7 +53,7 @@ def get_supermean(name, season, data_dir, obs_flag=None):
         cubes_path = os.path.join(data_dir, 'cubeList.nc')
     else:
         cubes_path = os.path.join(data_dir, obs_flag + '_cubeList.nc')
-    cubes = iris.load(cubes_path)
+    cubes = load_cubelist(cubes_path)
 
     # use STASH if no standard name
     for cube in cubes:
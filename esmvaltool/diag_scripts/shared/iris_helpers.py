@@ -1,7 +1,9 @@
 """Convenience functions for :mod:`iris` objects."""
 import logging
+import os
 from pprint import pformat
 
+import dask.array as da
 import iris
 import numpy as np
 
@@ -9,6 +11,9 @@ from ._base import group_metadata
 
 logger = logging.getLogger(__name__)
 
+# Lazily loaded cube lists, see load_cubelist
+_CUBELIST_CACHE = {}
+
 
 def _transform_coord_to_ref(cubes, ref_coord):
     """Transform coordinates of cubes to reference."""
@@ -123,31 +128,159 @@ def convert_to_iris(dict_):
     return dict_
 
 
-def get_mean_cube(datasets):
+def _check_cube_compatibility(cube, ref_cube, path):
+    """Check if cube can be combined with reference cube."""
+    if cube.shape != ref_cube.shape:
+        raise ValueError(
+            f"Expected cubes with identical shapes for calculation of "
+            f"multi-dataset statistics, got {cube.shape} for '{path}' and "
+            f"{ref_cube.shape} for reference cube\n{ref_cube}")
+    if cube.metadata != ref_cube.metadata:
+        raise ValueError(
+            f"Expected cubes with identical metadata for calculation of "
+            f"multi-dataset statistics, got {cube.metadata} for '{path}' and "
+            f"{ref_cube.metadata} for reference cube\n{ref_cube}")
+    for ref_coord in ref_cube.coords(dim_coords=True):
+        try:
+            coord = cube.coord(ref_coord.name(), dim_coords=True)
+        except iris.exceptions.CoordinateNotFoundError:
+            raise iris.exceptions.CoordinateNotFoundError(
+                f"'{ref_coord.name()}' is not a coordinate of cube from "
+                f"'{path}'\n{cube}")
+        if coord != ref_coord:
+            raise ValueError(
+                f"Expected cubes with identical coordinates '{coord.name()}' "
+                f"for calculation of multi-dataset statistics, got {coord} "
+                f"for '{path}' and {ref_coord} for reference cube")
+
+
+def _get_multi_dataset_statistics(datasets, lazy=False):
+    """Get reference cube, number of valid values, mean and sum of sq. dev.
+
+    All cubes are loaded lazily and checked for compatibility before any data
+    is read. Afterwards, the statistics are accumulated one dataset at a time
+    (Welford's algorithm), i.e. at most one dataset is realized at once. If
+    ``lazy`` is ``True``, all operations are performed on :mod:`dask` arrays
+    and nothing is realized at all.
+
+    """
+    if not datasets:
+        raise ValueError(
+            "Expected at least one dataset for calculation of multi-dataset "
+            "statistics, got empty list")
+    cubes = []
+    for dataset in datasets:
+        path = dataset['filename']
+        cube = iris.load_cube(path)
+        prepare_cube_for_merging(cube, path)
+        if cubes:
+            _check_cube_compatibility(cube, cubes[0], path)
+        cubes.append(cube)
+    logger.debug("Successfully checked compatibility of %i cubes", len(cubes))
+
+    # Accumulate statistics
+    ref_cube = cubes[0].copy()
+    lib = da if lazy else np
+    counts = lib.zeros(cubes[0].shape, dtype=np.int64)
+    mean = lib.zeros(cubes[0].shape, dtype=np.float64)
+    sq_dev = lib.zeros(cubes[0].shape, dtype=np.float64)
+    for (idx, cube) in enumerate(cubes):
+        if lazy:
+            data = cube.lazy_data()
+        elif cube.has_lazy_data():
+            data = np.ma.asarray(cube.lazy_data().compute())
+        else:
+            data = np.ma.asarray(cube.data)
+        valid = ~lib.ma.getmaskarray(data)
+        data = lib.ma.filled(data, 0.0).astype(np.float64)
+        counts = counts + valid
+        delta = lib.where(valid, data - mean, 0.0)
+        mean = mean + delta / lib.maximum(counts, 1)
+        sq_dev = sq_dev + delta * lib.where(valid, data - mean, 0.0)
+        cubes[idx] = None
+    return (ref_cube, counts, mean, sq_dev)
+
+
+def _get_multi_dataset_statistics_cube(datasets, statistic, lazy=False,
+                                       ddof=1):
+    """Get cube with multi-dataset statistic (mean or standard deviation)."""
+    (ref_cube, counts, mean,
+     sq_dev) = _get_multi_dataset_statistics(datasets, lazy=lazy)
+    lib = da if lazy else np
+    dtype = np.result_type(ref_cube.dtype, np.float32)
+    if statistic == 'mean':
+        data = lib.ma.masked_array(mean, mask=(counts == 0))
+    else:
+        variance = sq_dev / lib.maximum(counts - ddof, 1)
+        data = lib.ma.masked_array(lib.sqrt(variance),
+                                   mask=(counts <= ddof))
+    stat_cube = ref_cube.copy(data.astype(dtype))
+    stat_cube.remove_coord('cube_label')
+    if len(datasets) > 1:
+        stat_cube.add_cell_method(
+            iris.coords.CellMethod(statistic, coords='cube_label'))
+    return stat_cube
+
+
+def get_mean_cube(datasets, lazy=False):
     """Get mean cube of a list of datasets.
 
+    The mean is computed in a streaming fashion: all coordinates are checked
+    for compatibility first, then the datasets are processed one after
+    another so that peak memory does not scale with the number of datasets.
+    Masked values are ignored.
+
     Parameters
     ----------
     datasets : list of dict
         List of datasets (given as metadata :obj:`dict`).
+    lazy : bool, optional (default: False)
+        Return cube with lazy (:mod:`dask`) data instead of realizing it.
 
     Returns
     -------
     iris.cube.Cube
         Mean cube.
 
+    Raises
+    ------
+    ValueError
+        ``datasets`` is empty or cubes are not compatible (different shapes,
+        metadata or coordinates).
+
     """
-    cubes = iris.cube.CubeList()
-    for dataset in datasets:
-        path = dataset['filename']
-        cube = iris.load_cube(path)
-        prepare_cube_for_merging(cube, path)
-        cubes.append(cube)
-    mean_cube = cubes.merge_cube()
-    if len(cubes) > 1:
-        mean_cube = mean_cube.collapsed(['cube_label'], iris.analysis.MEAN)
-    mean_cube.remove_coord('cube_label')
-    return mean_cube
+    return _get_multi_dataset_statistics_cube(datasets, 'mean', lazy=lazy)
+
+
+def get_std_cube(datasets, lazy=False, ddof=1):
+    """Get standard deviation cube of a list of datasets.
+
+    Like :func:`get_mean_cube`, this is computed in a streaming fashion
+    using Welford's algorithm. Masked values are ignored.
+
+    Parameters
+    ----------
+    datasets : list of dict
+        List of datasets (given as metadata :obj:`dict`).
+    lazy : bool, optional (default: False)
+        Return cube with lazy (:mod:`dask`) data instead of realizing it.
+    ddof : int, optional (default: 1)
+        Delta degrees of freedom.
+
+    Returns
+    -------
+    iris.cube.Cube
+        Standard deviation cube.
+
+    Raises
+    ------
+    ValueError
+        ``datasets`` is empty or cubes are not compatible (different shapes,
+        metadata or coordinates).
+
+    """
+    return _get_multi_dataset_statistics_cube(datasets, 'standard_deviation',
+                                              lazy=lazy, ddof=ddof)
 
 
 def iris_project_constraint(projects, input_data, negate=False):
@@ -245,6 +378,36 @@ def intersect_dataset_coordinates(cubes):
     return new_cubes
 
 
+def load_cubelist(path):
+    """Load :class:`iris.cube.CubeList` from a file only once.
+
+    The cubes are loaded lazily and cached as long as the file is not
+    modified. Paths which point to the same file (hard or symbolic links)
+    share a cache entry. Copies of the cached cubes are returned, so they
+    can be modified safely.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file.
+
+    Returns
+    -------
+    iris.cube.CubeList
+        Cubes in the file.
+
+    """
+    stat = os.stat(path)
+    key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if key not in _CUBELIST_CACHE:
+        logger.debug("Loading %s", path)
+        _CUBELIST_CACHE[key] = iris.load(path)
+    else:
+        logger.debug("Using cached cubes of %s", path)
+    return iris.cube.CubeList(
+        [cube.copy() for cube in _CUBELIST_CACHE[key]])
+
+
 def prepare_cube_for_merging(cube, cube_label):
     """Prepare single :class:`iris.cube.Cube` in order to merge it later.
 
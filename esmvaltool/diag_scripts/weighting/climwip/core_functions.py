@@ -23,17 +23,14 @@ def area_weighted_mean(data_array: 'xr.DataArray') -> 'xr.DataArray':
     return means
 
 
-def distance_matrix(values: 'np.ndarray',
-                    weights: 'np.ndarray' = None) -> 'np.ndarray':
-    """Calculate the pairwise distance between model members.
-
-    Takes a dataset with ensemble member/lon/lat. Flattens lon/lat
-    into a single dimension. Calculates the distance between every
-    ensemble member.
-
-    If weights are passed, they should have the same shape as values.
-
-    Returns 2D NxN array, where N == number of ensemble members.
+def _squared_distances(values: 'np.ndarray',
+                       weights: 'np.ndarray' = None) -> 'np.ndarray':
+    """Calculate the pairwise squared distance between model members.
+
+    See :func:`distance_matrix`, returns the condensed squared distances
+    (as given by :func:`scipy.spatial.distance.pdist`). Since these are
+    sums over all grid cells, they can be accumulated over blocks of grid
+    cells.
     """
     n_members = values.shape[0]
 
@@ -49,29 +46,60 @@ def distance_matrix(values: 'np.ndarray',
         weights = weights[:, not_nan]
         weights = weights[0]  # Weights are equal along first dim
 
-    d_matrix = squareform(pdist(values, metric='euclidean', w=weights))
+    if values.shape[1] == 0:
+        return np.zeros(n_members * (n_members - 1) // 2)
+    return pdist(values, metric='sqeuclidean', w=weights)
+
+
+def distance_matrix(values: 'np.ndarray',
+                    weights: 'np.ndarray' = None) -> 'np.ndarray':
+    """Calculate the pairwise distance between model members.
+
+    Takes a dataset with ensemble member/lon/lat. Flattens lon/lat
+    into a single dimension. Calculates the distance between every
+    ensemble member.
+
+    If weights are passed, they should have the same shape as values.
+
+    Returns 2D NxN array, where N == number of ensemble members.
+    """
+    d_matrix = squareform(np.sqrt(_squared_distances(values, weights)))
 
     return d_matrix
 
 
-def calculate_independence(data_array: 'xr.DataArray') -> 'xr.DataArray':
+def calculate_independence(data_array: 'xr.DataArray',
+                           block_size: Union[int, None] = None
+                           ) -> 'xr.DataArray':
     """Calculate independence.
 
     The independence is calculated as a distance matrix between the
     datasets defined in the `data_array`. Returned is a square matrix
     with where the number of elements along each edge equals the number
     of ensemble members.
+
+    The distances are accumulated over blocks of `block_size` latitudes, so
+    that only one block of all ensemble members needs to be in memory if
+    `data_array` is dask-backed. By default, blocks use approximately 64 MB.
     """
-    weights = np.cos(np.radians(data_array.lat))
-    weights, _ = xr.broadcast(weights, data_array)
-
-    diff = xr.apply_ufunc(
-        distance_matrix,
-        data_array,
-        weights,
-        input_core_dims=[['model_ensemble', 'lat', 'lon'],
-                         ['model_ensemble', 'lat', 'lon']],
-        output_core_dims=[['perfect_model_ensemble', 'model_ensemble']],
+    data_array = data_array.transpose('model_ensemble', 'lat', 'lon')
+    (n_members, n_lat, n_lon) = data_array.shape
+    weights = np.cos(np.radians(data_array.lat.values))
+    weights = np.broadcast_to(weights[:, np.newaxis], (n_lat, n_lon))
+    if block_size is None:
+        block_size = max(1, 2**23 // (n_members * n_lon))
+
+    squared_distances = np.zeros(n_members * (n_members - 1) // 2)
+    for start in range(0, n_lat, block_size):
+        block = data_array[:, start:start + block_size].values
+        block_weights = np.broadcast_to(weights[start:start + block_size],
+                                        block.shape)
+        squared_distances += _squared_distances(block, block_weights)
+
+    diff = xr.DataArray(
+        squareform(np.sqrt(squared_distances)),
+        dims=('perfect_model_ensemble', 'model_ensemble'),
+        coords={'model_ensemble': data_array['model_ensemble'].values},
     )
 
     diff.name = f'd{data_array.name}'
@@ -227,3 +255,241 @@ def weighted_quantile(values: list,
     weighted_quantiles = (weighted_quantiles - min_val) / max_val
 
     return np.interp(quantiles, weighted_quantiles, values)
+
+
+def _weighted_percentile_of_truth(values: 'np.ndarray',
+                                  weights: 'np.ndarray',
+                                  included: 'np.ndarray') -> 'np.ndarray':
+    """Get the weighted percentile of each perfect model's target.
+
+    Uses the same (interpolated) weighted percentiles as
+    :func:`weighted_quantile` applied to the included models only, i.e. the
+    target of the perfect model lies within the weighted quantiles [q1, q2]
+    if the returned percentile lies within [q1, q2]. `values` has shape (N,),
+    `weights` has shape (..., N, N) (perfect model, model) and `included`
+    has shape (N, N). Perfect models outside of the range of the included
+    models get a percentile of NaN.
+    """
+    n_members = len(values)
+    position = np.argsort(np.argsort(values, kind='stable'), kind='stable')
+
+    # Neighboring included models of each perfect model (independent of the
+    # weights)
+    (lower, upper, first, last) = (np.zeros(n_members, dtype=int)
+                                   for _ in range(4))
+    valid = np.ones(n_members, dtype=bool)
+    for idx in range(n_members):
+        candidates = np.nonzero(included[idx])[0]
+        candidates = candidates[np.argsort(position[candidates])]
+        below = candidates[values[candidates] <= values[idx]]
+        above = candidates[values[candidates] >= values[idx]]
+        (first[idx], last[idx]) = (candidates[0], candidates[-1])
+        if below.size == 0 or above.size == 0:
+            valid[idx] = False
+            continue
+        (lower[idx], upper[idx]) = (below[-1], above[0])
+    below_lower = (position[np.newaxis, :] <=
+                   position[lower][:, np.newaxis]).astype(float)
+    below_upper = (position[np.newaxis, :] <=
+                   position[upper][:, np.newaxis]).astype(float)
+
+    # Weighted quantiles of the neighbors (weights are normalized)
+    members = np.arange(n_members)
+    quantile_lower = (np.einsum('...ij,ij->...i', weights, below_lower) -
+                      0.5 * weights[..., members, lower])
+    quantile_upper = (np.einsum('...ij,ij->...i', weights, below_upper) -
+                      0.5 * weights[..., members, upper])
+    distance = values[upper] - values[lower]
+    fraction = np.divide(values - values[lower],
+                         distance,
+                         out=np.zeros(n_members),
+                         where=(distance > 0.0))
+    percentile = quantile_lower + fraction * (quantile_upper - quantile_lower)
+
+    # Cast to 0-1 (see weighted_quantile)
+    min_val = 0.5 * weights[..., members, first]
+    max_val = 1.0 - 0.5 * weights[..., members, last]
+    percentile = (percentile - min_val) / max_val
+    return np.where(valid, percentile, np.nan)
+
+
+def perfect_model_test(performance: 'xr.DataArray',
+                       independence: Union['xr.DataArray', None],
+                       target: 'xr.DataArray',
+                       performance_sigmas: list,
+                       independence_sigmas: Union[list, None],
+                       quantiles: tuple = (0.1, 0.9),
+                       chunk_size: Union[int, None] = None) -> 'xr.Dataset':
+    """Evaluate the skill of combinations of sigmas in a perfect model test.
+
+    Each model is used as pseudo-observations (perfect model) once. It is
+    weighted against all models except the perfect model itself and other
+    members of the same model, and the weighted ensemble is used to predict
+    the `target` of the perfect model. Instead of calling
+    :func:`calculate_weights` and :func:`weighted_quantile` for each
+    combination of sigmas and perfect model, all weights of a chunk of
+    performance sigmas are calculated at once.
+
+    Parameters
+    ----------
+    performance : xr.DataArray, shape (N, N)
+        Distance between all models in the performance metric
+        (perfect_model_ensemble, model_ensemble), e.g. the overall mean of
+        :func:`calculate_independence` for the performance variable groups.
+    independence : xr.DataArray, shape (N, N) or None
+        Distance between all models in the independence metric. If None,
+        the weights are based purely on model performance.
+    target : xr.DataArray, shape (N,)
+        Target quantity (e.g. future warming) of each model.
+    performance_sigmas : array_like
+        Performance sigmas to test.
+    independence_sigmas : array_like or None
+        Independence sigmas to test. Ignored if `independence` is None.
+    quantiles : tuple
+        The perfect model prediction is considered reliable if the target of
+        the perfect model lies within these weighted quantiles.
+    chunk_size : int, optional
+        Number of performance sigmas processed at once. By default, this is
+        chosen so that the weights of a chunk use approximately 256 MB.
+
+    Returns
+    -------
+    xr.Dataset
+        Continuous ranked probability skill score (`skill`, relative to the
+        unweighted ensemble), mean continuous ranked probability score of the
+        weighted ensemble (`crps`) and fraction of perfect models within the
+        weighted `quantiles` (`reliability`) for each combination of sigmas.
+    """
+    model_ensemble = performance['model_ensemble'].values
+    dims = ('perfect_model_ensemble', 'model_ensemble')
+    perf = performance.transpose(*dims).values
+    target_units = target.attrs.get('units', '1')
+    target = target.sel(model_ensemble=model_ensemble).values
+    performance_sigmas = np.atleast_1d(
+        np.asarray(performance_sigmas, dtype=float))
+    if independence is None:
+        independence_sigmas = np.array([np.nan])
+    else:
+        independence_sigmas = np.atleast_1d(
+            np.asarray(independence_sigmas, dtype=float))
+    n_members = len(model_ensemble)
+
+    # Exclude perfect model and other members of the same model
+    models = np.array([name.split('_')[0] for name in model_ensemble])
+    included = (models[:, np.newaxis] != models[np.newaxis, :]).astype(float)
+    if not np.all(included.sum(axis=1) > 0):
+        raise ValueError(
+            'Perfect model test needs at least two different models')
+
+    # Independence part of the weights (does not depend on performance
+    # sigma), excluded models do not contribute to the denominator
+    if independence is None:
+        denominator = np.ones((1, n_members, n_members))
+    else:
+        indep = independence.sel(
+            perfect_model_ensemble=model_ensemble,
+            model_ensemble=model_ensemble).transpose(*dims).values
+        scaled = indep[np.newaxis] / independence_sigmas[:, np.newaxis,
+                                                         np.newaxis]
+        similarity = np.exp(-scaled**2)
+        denominator = np.einsum('ik,qkj->qij', included, similarity)
+    log_denominator = np.log(denominator)
+
+    # Scores of the unweighted ensemble
+    abs_diff = np.abs(target[:, np.newaxis] - target[np.newaxis, :])
+    equal_weights = included / included.sum(axis=1, keepdims=True)
+    crps_unweighted = (
+        np.sum(equal_weights * abs_diff, axis=-1) -
+        0.5 * np.sum(equal_weights * (equal_weights @ abs_diff), axis=-1))
+
+    if chunk_size is None:
+        chunk_size = max(
+            1, 2**25 // (len(independence_sigmas) * n_members**2))
+    crps = []
+    reliability = []
+    for idx in range(0, len(performance_sigmas), chunk_size):
+        sigmas = performance_sigmas[idx:idx + chunk_size]
+        # Calculate weights in log space to avoid underflow for small sigmas
+        log_numerator = -(perf[np.newaxis] /
+                          sigmas[:, np.newaxis, np.newaxis])**2
+        log_weights = np.where(
+            included > 0.0,
+            log_numerator[:, np.newaxis] - log_denominator[np.newaxis],
+            -np.inf)
+        log_weights -= log_weights.max(axis=-1, keepdims=True)
+        weights = np.exp(log_weights)
+        weights /= weights.sum(axis=-1, keepdims=True)
+
+        # Continuous ranked probability score of the weighted ensembles
+        crps_chunk = (np.sum(weights * abs_diff, axis=-1) -
+                      0.5 * np.sum(weights * (weights @ abs_diff), axis=-1))
+        crps.append(crps_chunk.mean(axis=-1))
+
+        # Fraction of perfect models within the weighted quantiles
+        percentiles = _weighted_percentile_of_truth(target, weights,
+                                                    included)
+        inside = ((percentiles >= quantiles[0]) &
+                  (percentiles <= quantiles[1]))
+        reliability.append(inside.mean(axis=-1))
+    crps = np.concatenate(crps)
+    reliability = np.concatenate(reliability)
+    skill = 1.0 - crps / crps_unweighted.mean()
+
+    coords = {
+        'performance_sigma': performance_sigmas,
+        'independence_sigma': independence_sigmas,
+    }
+    sigma_dims = ('performance_sigma', 'independence_sigma')
+    result = xr.Dataset(
+        {
+            'skill': (sigma_dims, skill, {
+                'units': '1',
+                'long_name': 'Continuous ranked probability skill score',
+            }),
+            'crps': (sigma_dims, crps, {
+                'units': target_units,
+                'long_name': 'Continuous ranked probability score',
+            }),
+            'reliability': (sigma_dims, reliability, {
+                'units': '1',
+                'long_name': (f'Fraction of perfect models within the '
+                              f'weighted {quantiles} quantiles'),
+            }),
+        },
+        coords=coords,
+    )
+    return result
+
+
+def select_sigmas(calibration: 'xr.Dataset',
+                  min_reliability: float = 0.8) -> tuple:
+    """Select the sigmas with the best skill in the perfect model test.
+
+    Only combinations of sigmas where at least `min_reliability` of the
+    perfect models lie within the weighted quantiles are considered. If no
+    combination is reliable enough, the most reliable one is used.
+
+    Returns
+    -------
+    tuple
+        Selected performance and independence sigma (the latter is None if
+        the independence has not been tested).
+    """
+    skill = calibration['skill'].values
+    reliability = calibration['reliability'].values
+    reliable = reliability >= min_reliability
+    if np.any(reliable):
+        idx = np.nanargmax(np.where(reliable, skill, -np.inf))
+    else:
+        logger.warning(
+            'No combination of sigmas has a reliability >= %.2f (maximum: '
+            '%.2f), using the most reliable one', min_reliability,
+            np.nanmax(reliability))
+        idx = np.nanargmax(np.where(reliability == np.nanmax(reliability),
+                                    skill, -np.inf))
+    (idx_perf, idx_indep) = np.unravel_index(idx, skill.shape)
+    performance_sigma = float(calibration['performance_sigma'][idx_perf])
+    independence_sigma = float(calibration['independence_sigma'][idx_indep])
+    if np.isnan(independence_sigma):
+        independence_sigma = None
+    return performance_sigma, independence_sigma
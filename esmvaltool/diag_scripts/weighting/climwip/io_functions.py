@@ -101,7 +101,8 @@ def read_input_data(metadata: list,
     Read the input data from the list of given data sets. `metadata` is
     a list of metadata containing the filenames to load. Only returns
     the given `variable`. The datasets are stacked along the `dim`
-    dimension. Returns an xarray.DataArray.
+    dimension. Returns a (lazy) dask-backed xarray.DataArray with one chunk
+    per dataset, the data is only read when it is needed.
     """
     data_arrays = []
     identifiers = []
@@ -111,7 +112,7 @@ def read_input_data(metadata: list,
         short_name = info['short_name']
         variable_group = info['variable_group']
 
-        xrds = xr.open_dataset(filename)
+        xrds = xr.open_dataset(filename, chunks={})
         make_standard_calendar(xrds)
         xrda = xrds[short_name]
         xrda = xrda.rename(variable_group)
@@ -17,6 +17,8 @@ from core_functions import (
     calculate_weights,
     combine_ensemble_members,
     compute_overall_mean,
+    perfect_model_test,
+    select_sigmas,
 )
 from io_functions import (
     log_provenance,
@@ -33,6 +35,8 @@ from esmvaltool.diag_scripts.shared import (
 
 logger = logging.getLogger(os.path.basename(__file__))
 
+DEFAULT_SIGMAS = np.linspace(0.05, 2.0, 40).round(2)
+
 
 def read_observation_data(datasets: list) -> tuple:
     """Load observation data from list of metadata."""
@@ -50,7 +54,9 @@ def aggregate_obs_data(data_array: 'xr.DataArray',
     xarray.Dataset squeezed to 1D.
     """
     if operator == 'median':
-        output = data_array.median(dim='obs_ensemble')
+        output = data_array.chunk({
+            'obs_ensemble': -1
+        }).median(dim='obs_ensemble')
     else:
         raise ValueError(f'No such operator `{operator}`')
 
@@ -98,10 +104,13 @@ def calculate_performance(model_data: 'xr.DataArray',
     data, and observation data. The observation data must have the
     ensemble dimension squeezed or reduced. Returns an xarray.DataArray
     containing the same number of values as members of `model_data`.
+
+    For dask-backed input data, the data is processed member by member.
     """
     diff = model_data - obs_data
 
     performance = area_weighted_mean(diff**2)**0.5
+    performance = performance.compute()
 
     performance.name = f'd{model_data.name}'
     performance.attrs['variable_group'] = model_data.name
@@ -201,12 +210,123 @@ def parse_contributions_sigma(metric: str,
             if value > 0
         }
     sigma = cfg.get(f'{metric}_sigma')
-    if contributions and sigma is None:
-        errmsg = f'{metric}_sigma must be set if {metric}_contributions is set'
+    if contributions and sigma is None and not cfg.get('calibrate_sigmas'):
+        errmsg = ' '.join([
+            f'{metric}_sigma must be set if {metric}_contributions is set',
+            '(or calibrate_sigmas needs to be set)',
+        ])
         raise IOError(errmsg)
     return contributions, sigma
 
 
+def read_calibration_target(datasets: list) -> tuple:
+    """Read target of the perfect model test (one value per model)."""
+    target, target_files = read_model_data(datasets)
+    if 'lat' in target.dims and 'lon' in target.dims:
+        target = area_weighted_mean(target)
+    if target.dims != ('model_ensemble', ):
+        raise ValueError(
+            f'Target of the perfect model test needs to be a single value or '
+            f'a lat/lon field for each model, got dimensions {target.dims}')
+    return target, target_files
+
+
+def visualize_and_save_calibration(calibration: 'xr.Dataset', sigmas: tuple,
+                                   min_reliability: float, cfg: dict,
+                                   ancestors: list):
+    """Visualize skill curves of the perfect model test."""
+    (performance_sigma, independence_sigma) = sigmas
+    if independence_sigma is None:
+        curves = {'performance_sigma': calibration.isel(independence_sigma=0)}
+    else:
+        curves = {
+            'performance_sigma':
+            calibration.sel(independence_sigma=independence_sigma),
+            'independence_sigma':
+            calibration.sel(performance_sigma=performance_sigma),
+        }
+
+    figure, axes = plt.subplots(1,
+                                len(curves),
+                                figsize=(7 * len(curves), 5),
+                                squeeze=False)
+    for (axes_skill, (dim, curve)) in zip(axes[0], curves.items()):
+        selected = {
+            'performance_sigma': performance_sigma,
+            'independence_sigma': independence_sigma,
+        }[dim]
+        axes_skill.plot(curve[dim], curve['skill'], color='C0')
+        axes_skill.axvline(selected, color='k', linestyle=':')
+        axes_skill.set_xlabel(dim.replace('_', ' '))
+        axes_skill.set_ylabel('Skill (CRPSS)', color='C0')
+        axes_reliability = axes_skill.twinx()
+        axes_reliability.plot(curve[dim],
+                              curve['reliability'],
+                              color='C1',
+                              linestyle='--')
+        axes_reliability.axhline(min_reliability, color='C1', linestyle=':')
+        axes_reliability.set_ylim(0.0, 1.05)
+        axes_reliability.set_ylabel('Reliability', color='C1')
+        axes_skill.set_title(f'Selected {dim.replace("_", " ")}: '
+                             f'{selected:.3f}')
+
+    filename_plot = get_plot_filename('sigma_calibration', cfg)
+    figure.savefig(filename_plot, dpi=300, bbox_inches='tight')
+    plt.close(figure)
+
+    filename_data = get_diagnostic_filename('sigma_calibration',
+                                            cfg,
+                                            extension='nc')
+    calibration.to_netcdf(filename_data)
+
+    caption = 'Skill of the weights for different sigmas (perfect model test)'
+    log_provenance(caption, filename_plot, cfg, ancestors)
+    log_provenance(caption, filename_data, cfg, ancestors)
+
+
+def calibrate_sigmas(performance: 'xr.DataArray',
+                     independence: Union['xr.DataArray', None],
+                     target: 'xr.DataArray', cfg: dict,
+                     ancestors: list) -> tuple:
+    """Determine performance and independence sigma in a perfect model test.
+
+    `performance` is the distance between all models in the performance
+    metric, `independence` the overall independence. Returns the selected
+    performance and independence sigma.
+    """
+    settings = cfg['calibrate_sigmas']
+    min_reliability = settings.get('min_reliability', 0.8)
+    independence_sigmas = None
+    if independence is not None:
+        independence_sigmas = settings.get('independence_sigmas',
+                                           DEFAULT_SIGMAS)
+    calibration = perfect_model_test(
+        performance,
+        independence,
+        target,
+        settings.get('performance_sigmas', DEFAULT_SIGMAS),
+        independence_sigmas,
+        chunk_size=settings.get('chunk_size'),
+    )
+    sigmas = select_sigmas(calibration, min_reliability=min_reliability)
+    calibration.attrs['performance_sigma'] = sigmas[0]
+    if sigmas[1] is not None:
+        calibration.attrs['independence_sigma'] = sigmas[1]
+    calibration.attrs['min_reliability'] = min_reliability
+    visualize_and_save_calibration(calibration, sigmas, min_reliability, cfg,
+                                   ancestors)
+    selected = calibration.sel(performance_sigma=sigmas[0])
+    if sigmas[1] is None:
+        selected = selected.isel(independence_sigma=0)
+    else:
+        selected = selected.sel(independence_sigma=sigmas[1])
+    logger.info(
+        'Selected performance_sigma = %s and independence_sigma = %s (skill '
+        '%.3f, reliability %.2f)', sigmas[0], sigmas[1],
+        float(selected['skill']), float(selected['reliability']))
+    return sigmas
+
+
 def main(cfg):
     """Perform climwip weighting method."""
     models, observations = read_metadata(cfg)
@@ -230,6 +350,7 @@ def main(cfg):
 
     performances = {}
     independences = {}
+    performance_distances = {}
 
     for variable_group in independence_contributions:
 
@@ -256,6 +377,11 @@ def main(cfg):
         obs_data, obs_data_files = read_observation_data(datasets_obs)
         obs_data = aggregate_obs_data(obs_data, operator='median')
 
+        if cfg.get('calibrate_sigmas'):
+            logger.info('Calculating model distances for %s', variable_group)
+            performance_distances[variable_group] = calculate_independence(
+                model_data)
+
         logger.info('Calculating performance for %s', variable_group)
         performance = calculate_performance(model_data, obs_data)
         visualize_and_save_performance(performance, cfg,
@@ -296,6 +422,23 @@ def main(cfg):
         # one of them could be empty if metric is not calculated
         groups = {**groups_independence, **groups_performance}
 
+    if cfg.get('calibrate_sigmas'):
+        if not performance_contributions:
+            raise IOError('calibrate_sigmas needs performance_contributions')
+        target_group = cfg['calibrate_sigmas']['target']
+        logger.info('Reading calibration target %s', target_group)
+        target, target_files = read_calibration_target(models[target_group])
+        performance_distance = compute_overall_mean(
+            xr.Dataset(performance_distances), performance_contributions)
+        if cfg['combine_ensemble_members']:
+            performance_distance, _ = combine_ensemble_members(
+                performance_distance)
+            target, _ = combine_ensemble_members(target)
+        logger.info('Calibrating sigmas in perfect model test')
+        performance_sigma, independence_sigma = calibrate_sigmas(
+            performance_distance, overall_independence, target, cfg,
+            model_ancestors + target_files)
+
     logger.info('Calculating weights')
     weights = calculate_weights(overall_performance, overall_independence,
                                 performance_sigma, independence_sigma)
@@ -1,6 +1,7 @@
 """A collection of utility functions for dealing with weights."""
 from collections import defaultdict
 
+import numpy as np
 import xarray as xr
 
 from climwip.core_functions import weighted_quantile
@@ -39,11 +40,17 @@ def calculate_percentiles(data: 'xr.DataArray',
     least the same elements as in data.
     If `weights` is not specified, the non-weighted percentiles are calculated.
 
-    Returns a DataArray with 'percentiles' as the dimension.
+    Returns a DataArray with 'percentiles' as the dimension. Lazy
+    (dask-backed) data is supported and results in a lazy DataArray.
     """
+    percentiles = np.asarray(percentiles)
     if weights is not None:
         weights = weights.sel(model_ensemble=data.model_ensemble)
 
+    # The percentiles need all models at once
+    if data.chunks is not None:
+        data = data.chunk({'model_ensemble': -1})
+
     output = xr.apply_ufunc(weighted_quantile,
                             data,
                             input_core_dims=[['model_ensemble']],
@@ -52,7 +59,14 @@ def calculate_percentiles(data: 'xr.DataArray',
                                 'weights': weights,
                                 'quantiles': percentiles / 100
                             },
-                            vectorize=True)
+                            vectorize=True,
+                            dask='parallelized',
+                            output_dtypes=[float],
+                            dask_gufunc_kwargs={
+                                'output_sizes': {
+                                    'percentiles': len(percentiles)
+                                },
+                            })
 
     output['percentiles'] = percentiles
 
@@ -120,7 +120,7 @@ def model_aggregation(dataset, metric, weights=None):
     """Call mean or percentile calculation."""
     if isinstance(metric, int):
         return calculate_percentiles(dataset, [metric],
-                                     weights).squeeze('percentile', drop=True)
+                                     weights).squeeze('percentiles', drop=True)
     if metric.lower() == 'mean':
         if weights is not None:
             dataset = dataset.weighted(weights)
@@ -128,7 +128,7 @@ def model_aggregation(dataset, metric, weights=None):
 
     if metric.lower() == 'median':
         return calculate_percentiles(dataset, [50],
-                                     weights).squeeze('percentile', drop=True)
+                                     weights).squeeze('percentiles', drop=True)
 
     errmsg = f'model_aggregation {metric} is not implemented!'
     raise NotImplementedError(errmsg)
@@ -83,7 +83,8 @@ def main(cfg):
         print("prepro")
         (file_da_an_zm, file_mo_an) = zmnam_preproc(ifile)
         print("calc")
-        outfiles = zmnam_calc(file_da_an_zm, out_dir + '/', ifile_props)
+        outfiles = zmnam_calc(file_da_an_zm, out_dir + '/', ifile_props,
+                              cfg.get('eof_method', 'exact'))
         provenance_record = get_provenance_record(props,
                                                   ancestor_files=[ifile])
         if write_plots:
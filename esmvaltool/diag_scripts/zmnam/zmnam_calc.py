@@ -9,6 +9,8 @@ import netCDF4
 import numpy as np
 from scipy import signal
 
+from esmvaltool.diag_scripts.shared import truncated_eof
+
 
 def butter_filter(data, freq, lowcut=None, order=2):
     """Function to perform time filtering."""
@@ -29,8 +31,14 @@ def butter_filter(data, freq, lowcut=None, order=2):
     return ysig
 
 
-def zmnam_calc(da_fname, outdir, src_props):
-    """Function to do EOF/PC decomposition of zg field."""
+def zmnam_calc(da_fname, outdir, src_props, eof_method='exact'):
+    """Function to do EOF/PC decomposition of zg field.
+
+    All levels are processed at once. The leading EOF of each level is
+    computed either with a batched eigen-decomposition of the (lat x lat)
+    covariance matrices ('exact') or with a randomized truncated singular
+    value decomposition ('randomized').
+    """
     deg_to_r = np.pi / 180.
     lat_weighting = True
     outfiles = []
@@ -77,99 +85,54 @@ def zmnam_calc(da_fname, outdir, src_props):
     # Lowpass filter
     zg_da_lp = butter_filter(zg_da, 1, lowcut=1. / 90, order=2)
 
-    # Outputs: stored by level
-    # EOFs, eigenvalues, daily and monthly PCs
-    eofs = np.zeros((len(lev), len(lat)), dtype='d')
-    eigs = np.zeros(len(lev), dtype='d')
-    pcs_da = np.zeros((n_tim, len(lev)), dtype='d')
-
     # Calendar-independent monthly mean
-    sta_mon = []  # first day of the month
-    mid_mon = []  # 15th of the month
-    end_mon = []  # last day of the month (add +1 when slicing)
-
-    mon = 999
-    idate = 0
-
-    while idate < len(date):
-
-        # Save first day of the month
-        if date[idate].month != mon:
-            mon = date[idate].month
-            sta_mon.append(idate)
-
-        # Save month mid-day
-        if date[idate].day == 15:
-            mid_mon.append(idate)
-
-        # Save last day of the month
-        if idate == len(date) - 1 or (date[idate].month == mon and
-                                      date[idate + 1].month != mon):
-            end_mon.append(idate)
-
-        idate += 1
-
-    pcs_mo = np.zeros((len(date[mid_mon]), len(lev)), dtype='d')
-
-    # Perform analysis by level
-    for i_lev in np.arange(len(lev)):
-        # Latitude weighting
-        if lat_weighting is True:
-            for j_lat in np.arange(len(lat)):
-                zg_da_lp[:, i_lev,
-                         j_lat] *= np.sqrt(abs(np.cos(lat[j_lat] * deg_to_r)))
-
-        zg_da_lp_an = zg_da_lp[:, i_lev, :] - np.mean(zg_da_lp[:, i_lev, :],
-                                                      axis=0)
-        cov = np.dot(zg_da_lp_an.T, zg_da_lp_an) / (n_tim - 1)
-
-        # Compute eigenvectors and eigenvalues
-        eigenval, eigenvec = np.linalg.eig(cov)
-
-        sum_eigenval = np.sum(eigenval)
-
-        eigenval_norm = eigenval[:] / sum_eigenval
-
-        # Largest eigenvalue
-        max_eigenval = eigenval_norm.argmax()
-
-        # PC calculation
-        pc = np.dot(zg_da_lp_an[:, :], eigenvec)
-
-        # Latitude de-weighting
-        if lat_weighting is True:
-            for i_lat in np.arange(len(lat)):
-                eigenvec[i_lat, :] /= np.sqrt(
-                    abs(np.cos(lat[i_lat] * deg_to_r)))
-
-        # Retain leading standardized PC & EOF
-        lead_pc_mean = np.mean(pc[:, max_eigenval], axis=0)
-        lead_pc_std = np.std(pc[:, max_eigenval], ddof=1, axis=0)
-        lead_pc = (pc[:, max_eigenval] - lead_pc_mean) / lead_pc_std
-        lead_eof = eigenvec[:, max_eigenval]
-
-        max_lat = max(range(len(lat)), key=lambda x: lat[x])
-        min_lat = min(range(len(lat)), key=lambda x: lat[x])
-
-        if lead_eof[max_lat] > lead_eof[min_lat]:
-            lead_pc *= -1
-            lead_eof *= -1
-
-        lead_pc_mo = np.zeros(len(date[mid_mon]), dtype='d')
-        time_mo = np.zeros(len(date[mid_mon]), dtype='d')
-
-        # print(lead_pc)
-
-        for k_mo in range(len(date[mid_mon])):
-            lead_pc_mo[k_mo] = np.mean(lead_pc[sta_mon[k_mo]:end_mon[k_mo] +
-                                               1])
-            time_mo[k_mo] = time[mid_mon[k_mo]]
-
-        # Store PC/EOF for this level (no time dependent)
-        eigs[i_lev] = eigenval_norm[max_eigenval]
-        eofs[i_lev, :] = lead_eof
-        pcs_da[:, i_lev] = lead_pc
-        pcs_mo[:, i_lev] = lead_pc_mo
+    months = np.array([day.month for day in date])
+    days = np.array([day.day for day in date])
+    sta_mon = np.flatnonzero(np.diff(months, prepend=-1))  # first day
+    mid_mon = np.flatnonzero(days == 15)  # 15th of the month
+    n_days = np.diff(sta_mon, append=n_tim)  # days per month
+    n_mon = len(mid_mon)
+
+    # Latitude weighting
+    if lat_weighting is True:
+        lat_weights = np.sqrt(abs(np.cos(lat * deg_to_r)))
+    else:
+        lat_weights = np.ones(len(lat), dtype='d')
+
+    # Weighted anomalies of all levels, shape (lev, time, lat)
+    zg_da_lp_an = zg_da_lp - np.mean(zg_da_lp, axis=0)
+    zg_da_lp_an = np.moveaxis(zg_da_lp_an * lat_weights, 1, 0)
+
+    # Leading EOF and explained variance of all levels
+    if eof_method == 'exact':
+        cov = np.matmul(np.swapaxes(zg_da_lp_an, 1, 2),
+                        zg_da_lp_an) / (n_tim - 1)
+        eigenval, eigenvec = np.linalg.eigh(cov)
+        lead_eof = eigenvec[:, :, -1]
+        eigs = eigenval[:, -1] / np.sum(eigenval, axis=1)
+    else:
+        leads = [
+            truncated_eof(zg_lev, n_modes=1, method=eof_method,
+                          random_state=0) for zg_lev in zg_da_lp_an
+        ]
+        lead_eof = np.array([lead.eofs[0] for lead in leads])
+        eigs = np.array([lead.variance_fraction[0] for lead in leads])
+
+    # PC calculation, shape (time, lev)
+    pc = np.einsum('ltj,lj->tl', zg_da_lp_an, lead_eof)
+
+    # Retain leading standardized PCs & latitude de-weighted EOFs
+    pcs_da = (pc - np.mean(pc, axis=0)) / np.std(pc, ddof=1, axis=0)
+    eofs = lead_eof / lat_weights
+
+    flip = eofs[:, np.argmax(lat)] > eofs[:, np.argmin(lat)]
+    pcs_da[:, flip] *= -1
+    eofs[flip] *= -1
+
+    # Monthly mean PCs
+    pcs_mo = (np.add.reduceat(pcs_da, sta_mon, axis=0) /
+              n_days[:, np.newaxis])[:n_mon]
+    time_mo = time[mid_mon]
 
     # Save output files
 
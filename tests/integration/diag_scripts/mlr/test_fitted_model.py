@@ -0,0 +1,178 @@
+"""Tests for saving and loading fitted MLR models."""
+
+from unittest import mock
+
+import iris
+import iris.coords
+import iris.cube
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.mlr import main
+from esmvaltool.diag_scripts.mlr.models import MLRModel
+
+FEATURES = ('x1', 'x2')
+
+
+def _get_cube(data, short_name):
+    """Get (time, lat) cube."""
+    time = iris.coords.DimCoord(np.arange(data.shape[0], dtype=np.float64),
+                                standard_name='time',
+                                units='days since 2000-01-01')
+    lat = iris.coords.DimCoord(np.linspace(-60.0, 60.0, data.shape[1]),
+                               standard_name='latitude',
+                               units='degrees')
+    return iris.cube.Cube(data, var_name=short_name, long_name=short_name,
+                          units='1',
+                          dim_coords_and_dims=[(time, 0), (lat, 1)])
+
+
+def _get_input_datasets(path, seed=0):
+    """Write input data and get metadata."""
+    random_state = np.random.RandomState(seed)
+    shape = (10, 4)
+    train_x = {tag: random_state.normal(size=shape) for tag in FEATURES}
+    pred_x = {tag: random_state.normal(size=shape) for tag in FEATURES}
+    label = (2.0 * train_x['x1'] - train_x['x2'] +
+             0.1 * random_state.normal(size=shape))
+    all_data = [(tag, 'feature', train_x[tag]) for tag in FEATURES]
+    all_data.append(('y', 'label', label))
+    all_data.extend([(tag, 'prediction_input', pred_x[tag])
+                     for tag in FEATURES])
+    datasets = []
+    for (tag, var_type, data) in all_data:
+        filename = str(path / f'{var_type}_{tag}_{seed}.nc')
+        iris.save(_get_cube(data, tag), filename)
+        dataset = {
+            'dataset': 'TEST',
+            'end_year': 2000,
+            'exp': 'historical',
+            'filename': filename,
+            'long_name': tag,
+            'project': 'TEST',
+            'short_name': tag,
+            'start_year': 2000,
+            'tag': tag,
+            'units': '1',
+            'var_type': var_type,
+        }
+        if var_type == 'prediction_input':
+            dataset['prediction_name'] = 'pred'
+        datasets.append(dataset)
+    return datasets
+
+
+def _create_mlr_model(path, datasets, mlr_model_type='linear', **kwargs):
+    """Create MLR model."""
+    return MLRModel.create(
+        mlr_model_type,
+        datasets,
+        plot_dir=str(path / 'plots'),
+        weighted_samples=None,
+        work_dir=str(path / 'work'),
+        write_plots=False,
+        **kwargs,
+    )
+
+
+def _get_prediction(mlr_model):
+    """Get prediction output of MLR model."""
+    with mock.patch('esmvaltool.diag_scripts.mlr.models.ProvenanceLogger',
+                    autospec=True):
+        mlr_model.predict()
+    return mlr_model.data['pred']['pred']['y'].values
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'test_size': False}])
+def test_save_load_round_trip(tmp_path, kwargs):
+    """Test that a saved MLR model can be loaded in another run."""
+    datasets = _get_input_datasets(tmp_path)
+    mlr_model = _create_mlr_model(tmp_path / 'run_1', datasets, **kwargs)
+    mlr_model.fit()
+    path = mlr_model.save_fitted_model()
+    expected = _get_prediction(mlr_model)
+
+    # Different random split of training and test data in new run (hash does
+    # not depend on it)
+    new_model = _create_mlr_model(tmp_path / 'run_2', datasets, **kwargs)
+    assert (new_model.get_training_data_hash() ==
+            mlr_model.get_training_data_hash())
+    if kwargs.get('test_size') is not False:
+        assert not new_model.data['train'].index.equals(
+            mlr_model.data['train'].index)
+    new_model.load_fitted_model(path)
+    for data_type in ('train', 'test'):
+        assert (data_type in new_model.data) == (data_type in mlr_model.data)
+        if data_type in mlr_model.data:
+            assert new_model.data[data_type].equals(mlr_model.data[data_type])
+    np.testing.assert_allclose(
+        new_model._clf.named_steps['final'].regressor_.coef_,
+        mlr_model._clf.named_steps['final'].regressor_.coef_)
+    np.testing.assert_allclose(_get_prediction(new_model), expected)
+
+
+def test_random_state(tmp_path):
+    """Test that the random split is reproducible with random_state."""
+    datasets = _get_input_datasets(tmp_path)
+    mlr_models = [
+        _create_mlr_model(tmp_path / f'run_{idx}', datasets, random_state=42)
+        for idx in range(2)
+    ]
+    assert mlr_models[0].data['train'].equals(mlr_models[1].data['train'])
+    assert mlr_models[0].data['test'].equals(mlr_models[1].data['test'])
+    other_model = _create_mlr_model(tmp_path / 'run_3', datasets,
+                                    random_state=0)
+    assert (other_model.get_training_data_hash() !=
+            mlr_models[0].get_training_data_hash())
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'other_data': True},
+    {'parameters_final_regressor': {'fit_intercept': False}},
+    {'test_size': 0.5},
+])
+def test_hash_mismatch(tmp_path, caplog, kwargs):
+    """Test that MLR models with different hash are not loaded."""
+    datasets = _get_input_datasets(tmp_path)
+    mlr_model = _create_mlr_model(tmp_path / 'run_1', datasets)
+    mlr_model.fit()
+    mlr_model.save_fitted_model(main.FITTED_MLR_MODEL_FILE)
+
+    if kwargs.pop('other_data', False):
+        datasets = _get_input_datasets(tmp_path, seed=1)
+    new_model = _create_mlr_model(tmp_path / 'run_2', datasets, **kwargs)
+    assert (new_model.get_training_data_hash() !=
+            mlr_model.get_training_data_hash())
+    path = str(tmp_path / 'run_1' / 'work' / main.FITTED_MLR_MODEL_FILE)
+    with pytest.raises(ValueError) as exc:
+        new_model.load_fitted_model(path)
+    assert 'different training data or with different settings' in str(
+        exc.value)
+
+    # Fall back to fitting in main script
+    cfg = {'load_fitted_model': str(tmp_path / 'run_1' / 'work')}
+    assert main._load_fitted_mlr_model(cfg, new_model) is False
+    assert 'fitting MLR model' in caplog.text
+    new_model.fit()
+
+
+def test_wrong_mlr_model_type(tmp_path):
+    """Test that MLR models of different type cannot be loaded."""
+    datasets = _get_input_datasets(tmp_path)
+    mlr_model = _create_mlr_model(tmp_path / 'run_1', datasets)
+    mlr_model.fit()
+    path = mlr_model.save_fitted_model()
+    new_model = _create_mlr_model(tmp_path / 'run_2', datasets,
+                                  mlr_model_type='ridge')
+    with pytest.raises(ValueError) as exc:
+        new_model.load_fitted_model(path)
+    assert "expected MLR model type 'ridge', got 'linear'" in str(exc.value)
+
+
+def test_load_missing_file(tmp_path, caplog):
+    """Test fallback to fitting if no saved MLR model exists."""
+    datasets = _get_input_datasets(tmp_path)
+    mlr_model = _create_mlr_model(tmp_path, datasets)
+    cfg = {'load_fitted_model': str(tmp_path / 'does_not_exist')}
+    assert main._load_fitted_mlr_model(cfg, mlr_model) is False
+    assert 'does not exist' in caplog.text
@@ -15,6 +15,7 @@ with open(
     CONFIG = yaml.safe_load(file_)
 
 
+@mock.patch.object(MLRModel, '_MODELS', {})
 @mock.patch('esmvaltool.diag_scripts.mlr.models.logger', autospec=True)
 class TestMLRModel():
     """Tests for the base class."""
@@ -0,0 +1,100 @@
+"""Tests for the main MLR diagnostic script."""
+
+import logging
+import os
+from unittest import mock
+
+import joblib
+import pytest
+import yaml
+
+from esmvaltool.diag_scripts.mlr import main
+from esmvaltool.diag_scripts.shared import ProvenanceLogger
+
+GROUPED_DATASETS = {
+    'group_a': [{'dataset': 'A'}],
+    'group_b': [{'dataset': 'B'}],
+    'group_c': [{'dataset': 'C'}],
+}
+
+
+@pytest.fixture
+def root_logger_level():
+    """Restore level of root logger (changed by subprocess setup)."""
+    level = logging.getLogger().level
+    yield
+    logging.getLogger().setLevel(level)
+
+
+def _fake_run_single_mlr_model(calls, cfg, mlr_model_type, group_attribute,
+                               descr, datasets):
+    """Log provenance for all groups except 'group_c'."""
+    calls.append((descr, cfg['n_jobs'], cfg['run_dir']))
+    if descr == 'group_c':
+        return
+    with ProvenanceLogger(cfg) as provenance_logger:
+        provenance_logger.log(
+            os.path.join(cfg['work_dir'], f'{descr}.nc'), {
+                'caption': f'{mlr_model_type} {group_attribute} {descr}',
+                'ancestors': [datasets[0]['dataset']],
+            })
+
+
+@pytest.mark.parametrize('n_jobs,n_jobs_per_group', [
+    (1, 1),
+    (4, 2),
+    (5, 2),
+])
+@pytest.mark.usefixtures('root_logger_level')
+def test_run_mlr_model_parallel_groups(tmp_path, n_jobs, n_jobs_per_group):
+    """Test processing of groups in parallel processes."""
+    run_dir = tmp_path / 'run'
+    cfg = {
+        'log_level': 'warning',
+        'n_jobs': n_jobs,
+        'n_parallel_groups': 2,
+        'run_dir': str(run_dir),
+        'work_dir': str(tmp_path / 'work'),
+    }
+    calls = []
+    with mock.patch.object(
+            main, 'run_single_mlr_model',
+            side_effect=lambda *args: _fake_run_single_mlr_model(
+                calls, *args)), joblib.parallel_backend('threading'):
+        main.run_mlr_model(cfg, 'linear', 'dataset', GROUPED_DATASETS)
+
+    # Jobs are split between groups
+    assert sorted(calls) == [
+        (descr, n_jobs_per_group,
+         str(run_dir / f'mlr_model_group_{idx:d}'))
+        for (idx, descr) in enumerate(GROUPED_DATASETS)
+    ]
+    assert cfg['n_jobs'] == n_jobs
+
+    # Provenance is merged and run directories of groups are removed
+    with open(run_dir / 'diagnostic_provenance.yml', 'r') as file_:
+        provenance = yaml.safe_load(file_)
+    assert provenance == {
+        str(tmp_path / 'work' / 'group_a.nc'): {
+            'caption': 'linear dataset group_a',
+            'ancestors': ['A'],
+        },
+        str(tmp_path / 'work' / 'group_b.nc'): {
+            'caption': 'linear dataset group_b',
+            'ancestors': ['B'],
+        },
+    }
+    assert os.listdir(run_dir) == ['diagnostic_provenance.yml']
+
+
+def test_run_mlr_model_serial(tmp_path):
+    """Test processing of groups in the main process."""
+    cfg = {'n_jobs': 4, 'run_dir': str(tmp_path / 'run')}
+    with mock.patch.object(main, 'run_single_mlr_model',
+                           autospec=True) as mock_run:
+        main.run_mlr_model(cfg, 'linear', 'dataset', GROUPED_DATASETS)
+    assert mock_run.call_args_list == [
+        mock.call(cfg, 'linear', 'dataset', descr, datasets)
+        for (descr, datasets) in GROUPED_DATASETS.items()
+    ]
+    assert not (tmp_path / 'run').exists()
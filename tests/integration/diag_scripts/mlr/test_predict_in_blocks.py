@@ -0,0 +1,134 @@
+"""Tests for block-wise prediction of MLR models."""
+
+from unittest import mock
+
+import iris
+import iris.coords
+import iris.cube
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.mlr.models import MLRModel
+
+FEATURES = ('x1', 'x2')
+PRED_TYPES = (None, 'squared_mlr_model_error_estim')
+
+
+def _get_cube(data, short_name):
+    """Get (time, lat, lon) cube."""
+    time = iris.coords.DimCoord(np.arange(data.shape[0], dtype=np.float64),
+                                bounds=[[idx - 0.5, idx + 0.5]
+                                        for idx in range(data.shape[0])],
+                                standard_name='time',
+                                units='days since 2000-01-01')
+    lats = np.linspace(-60.0, 60.0, data.shape[1])
+    lat = iris.coords.DimCoord(lats, standard_name='latitude',
+                               units='degrees')
+    lat.guess_bounds()
+    lons = np.linspace(0.0, 300.0, data.shape[2])
+    lon = iris.coords.DimCoord(lons, standard_name='longitude',
+                               units='degrees')
+    lon.guess_bounds()
+    return iris.cube.Cube(data, var_name=short_name, long_name=short_name,
+                          units='1',
+                          dim_coords_and_dims=[(time, 0), (lat, 1),
+                                               (lon, 2)])
+
+
+def _get_input_datasets(path):
+    """Write input data and get metadata."""
+    random_state = np.random.RandomState(0)
+    shape = (4, 5, 6)
+    coefs = {'x1': 2.0, 'x2': -1.0}
+    datasets = []
+    train_x = {tag: random_state.normal(size=shape) for tag in FEATURES}
+    pred_x = {
+        tag: np.ma.masked_array(random_state.normal(size=shape))
+        for tag in FEATURES
+    }
+
+    # Masked values (the first time step is completely masked)
+    pred_x['x1'][0] = np.ma.masked
+    pred_x['x1'][2, 1:3, 2] = np.ma.masked
+    pred_x['x2'][3, 4, :] = np.ma.masked
+
+    label = (sum(coefs[tag] * train_x[tag] for tag in FEATURES) +
+             0.1 * random_state.normal(size=shape))
+    all_data = [(tag, 'feature', train_x[tag]) for tag in FEATURES]
+    all_data.append(('y', 'label', label))
+    all_data.extend([(tag, 'prediction_input', pred_x[tag])
+                     for tag in FEATURES])
+    for (tag, var_type, data) in all_data:
+        filename = str(path / f'{var_type}_{tag}.nc')
+        iris.save(_get_cube(data, tag), filename)
+        dataset = {
+            'dataset': 'TEST',
+            'end_year': 2000,
+            'exp': 'historical',
+            'filename': filename,
+            'long_name': tag,
+            'project': 'TEST',
+            'short_name': tag,
+            'start_year': 2000,
+            'tag': tag,
+            'units': '1',
+            'var_type': var_type,
+        }
+        if var_type == 'prediction_input':
+            dataset['prediction_name'] = 'pred'
+        datasets.append(dataset)
+    return datasets
+
+
+def _get_prediction_output(work_dir):
+    """Get data of all prediction output files."""
+    output = {}
+    for pred_type in PRED_TYPES:
+        suffix = '' if pred_type is None else f'_{pred_type}'
+        path = work_dir / f'linear_y_prediction{suffix}_for_prediction_pred.nc'
+        output[pred_type] = iris.load_cube(str(path)).data
+    return output
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 30, 1000])
+@mock.patch('esmvaltool.diag_scripts.mlr.models.ProvenanceLogger',
+            autospec=True)
+def test_predict_in_blocks(mock_provenance_logger, tmp_path, block_size):
+    """Test that block-wise prediction equals prediction in memory."""
+    datasets = _get_input_datasets(tmp_path)
+    mlr_model = MLRModel.create(
+        'linear',
+        datasets,
+        plot_dir=str(tmp_path / 'plots'),
+        weighted_samples=None,
+        work_dir=str(tmp_path / 'work'),
+        write_plots=False,
+    )
+    mlr_model.fit()
+
+    # Prediction in memory
+    mlr_model.predict(save_mlr_model_error='test')
+    expected = _get_prediction_output(tmp_path / 'work')
+    assert 'pred' in mlr_model.data['pred']
+    mock_provenance_logger.reset_mock()
+    for path in (tmp_path / 'work').glob('*_prediction*.nc'):
+        path.unlink()
+
+    # Block-wise prediction
+    mlr_model._data['pred'] = {}
+    mlr_model._cfg['prediction_block_size'] = block_size
+    mlr_model.predict(save_mlr_model_error='test')
+    output = _get_prediction_output(tmp_path / 'work')
+    for pred_type in PRED_TYPES:
+        np.testing.assert_array_equal(np.ma.getmaskarray(output[pred_type]),
+                                      np.ma.getmaskarray(expected[pred_type]))
+        np.testing.assert_allclose(output[pred_type], expected[pred_type])
+    assert np.ma.getmaskarray(output[None])[0].all()
+    assert np.ma.getmaskarray(output[None]).sum() < output[None].size
+    assert mock_provenance_logger.call_count == len(PRED_TYPES)
+
+    # Prediction data is not kept in memory and thus not exported
+    assert mlr_model.data['pred'] == {}
+    with mock.patch.object(mlr_model, '_save_csv_file') as mock_save_csv:
+        mlr_model.export_prediction_data()
+    mock_save_csv.assert_not_called()
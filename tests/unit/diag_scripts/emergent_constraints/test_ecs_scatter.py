@@ -0,0 +1,153 @@
+"""Tests for the calculation of level widths in ``ecs_scatter.py``."""
+import dask
+import dask.array as da
+import iris.coords
+import iris.cube
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.emergent_constraints import ecs_scatter
+
+REF_LEV = np.array([100000.0, 85000.0, 70000.0, 50000.0, 25000.0, 10000.0])
+
+
+def _reference_altitude(air_pressure, ref_lev, ref_zg):
+    """Interpolate every column separately with :func:`numpy.interp`."""
+    altitude = np.full(air_pressure.shape, np.nan)
+    for (idx, (target, zg_column)) in enumerate(zip(air_pressure, ref_zg)):
+        valid = ~np.isnan(zg_column)
+        if valid.sum() < 2:
+            continue
+        sort_idx = np.argsort(ref_lev[valid])
+        lev = ref_lev[valid][sort_idx]
+        zg_column = zg_column[valid][sort_idx]
+        altitude[idx] = np.interp(target, lev, zg_column)
+
+        # Linear extrapolation with the two outermost levels
+        below = target < lev[0]
+        above = target > lev[-1]
+        altitude[idx, below] = zg_column[0] + (
+            (target[below] - lev[0]) * (zg_column[1] - zg_column[0]) /
+            (lev[1] - lev[0]))
+        altitude[idx, above] = zg_column[-1] + (
+            (target[above] - lev[-1]) * (zg_column[-1] - zg_column[-2]) /
+            (lev[-1] - lev[-2]))
+    return altitude
+
+
+def _get_ref_zg(n_columns, random_state):
+    """Get geopotential height with missing values."""
+    ref_zg = np.sort(random_state.uniform(0.0, 20000.0,
+                                          size=(n_columns, len(REF_LEV))),
+                     axis=1)
+    ref_zg[0, 0] = np.nan
+    ref_zg[1, -2:] = np.nan
+    ref_zg[2, 1:4] = np.nan
+    ref_zg[3, :-1] = np.nan
+    ref_zg[4, :] = np.nan
+    ref_zg[5, [0, 2, 5]] = np.nan
+    return ref_zg
+
+
+def test_interpolate_altitude():
+    """Test vectorized interpolation against column-wise reference."""
+    random_state = np.random.RandomState(0)
+    ref_zg = _get_ref_zg(8, random_state)
+
+    # Targets inside and outside of the range of (valid) reference levels and
+    # on reference levels
+    air_pressure = random_state.uniform(1000.0, 110000.0, size=(8, 10))
+    air_pressure[:, 0] = REF_LEV[0]
+    air_pressure[:, 1] = REF_LEV[3]
+    air_pressure[:, 2] = 105000.0
+    air_pressure[:, 3] = 5000.0
+
+    altitude = ecs_scatter._interpolate_altitude(air_pressure, REF_LEV,
+                                                 ref_zg)
+    expected = _reference_altitude(air_pressure, REF_LEV, ref_zg)
+    assert altitude.shape == (8, 10)
+    np.testing.assert_allclose(altitude, expected)
+    np.testing.assert_array_equal(np.isnan(altitude[:, 0]),
+                                  [False] * 3 + [True] * 2 + [False] * 3)
+
+
+def test_interpolate_altitude_ascending_levels():
+    """Test that order of reference levels is irrelevant."""
+    random_state = np.random.RandomState(1)
+    ref_zg = _get_ref_zg(6, random_state)
+    air_pressure = random_state.uniform(1000.0, 110000.0, size=(6, 4))
+    altitude = ecs_scatter._interpolate_altitude(air_pressure, REF_LEV,
+                                                 ref_zg)
+    np.testing.assert_allclose(
+        ecs_scatter._interpolate_altitude(air_pressure, REF_LEV[::-1],
+                                          ref_zg[:, ::-1]),
+        altitude)
+
+
+def _get_cubes(random_state):
+    """Get cube with derived air pressure and geopotential height cube."""
+    shape = (2, 3, 4, 5)
+    time = iris.coords.DimCoord([0.0, 1.0],
+                                standard_name='time',
+                                units='days since 2000-01-01')
+    lev = iris.coords.DimCoord([0.9, 0.5, 0.2],
+                               var_name='lev',
+                               units='1',
+                               attributes={'positive': 'down'})
+    lat = iris.coords.DimCoord(np.linspace(-30.0, 30.0, 4),
+                               standard_name='latitude',
+                               units='degrees')
+    lon = iris.coords.DimCoord(np.linspace(0.0, 320.0, 5),
+                               standard_name='longitude',
+                               units='degrees')
+    surface_pressure = random_state.uniform(95000.0, 102000.0,
+                                            size=(2, 1, 4, 5))
+    bounds = np.array([[1.0, 0.7], [0.7, 0.3], [0.3, 0.05]])
+    air_pressure = iris.coords.AuxCoord(
+        surface_pressure * lev.points[:, np.newaxis, np.newaxis],
+        bounds=(surface_pressure[..., np.newaxis] *
+                bounds[:, np.newaxis, np.newaxis, :]),
+        standard_name='air_pressure',
+        units='Pa')
+    cube = iris.cube.Cube(np.zeros(shape),
+                          var_name='cl',
+                          dim_coords_and_dims=[(time, 0), (lev, 1), (lat, 2),
+                                               (lon, 3)],
+                          aux_coords_and_dims=[(air_pressure, (0, 1, 2, 3))])
+
+    plev = iris.coords.DimCoord(REF_LEV,
+                                standard_name='air_pressure',
+                                units='Pa')
+    ref_zg = _get_ref_zg(2 * 4 * 5, random_state)
+    ref_zg = np.moveaxis(ref_zg.reshape(2, 4, 5, len(REF_LEV)), -1, 1)
+    zg_data = da.from_array(np.ma.masked_invalid(ref_zg), chunks=(1, 3, 4, 5))
+    zg_cube = iris.cube.Cube(zg_data,
+                             var_name='zg',
+                             units='m',
+                             dim_coords_and_dims=[(time, 0), (plev, 1),
+                                                  (lat, 2), (lon, 3)])
+    return (cube, zg_cube)
+
+
+@pytest.mark.parametrize('n_jobs', [1, 3, -1])
+def test_get_level_widths(n_jobs):
+    """Test level widths of masked columns processed in parallel."""
+    (cube, zg_cube) = _get_cubes(np.random.RandomState(2))
+    with dask.config.set({'array.chunk-size': '1KiB'}):
+        level_widths = ecs_scatter._get_level_widths(cube, zg_cube,
+                                                     n_jobs=n_jobs)
+    assert level_widths.shape == cube.shape
+
+    # Column-wise reference
+    bounds = np.moveaxis(cube.coord('air_pressure').bounds, 1, -2)
+    bounds = bounds.reshape(-1, 2 * cube.shape[1])
+    ref_zg = np.moveaxis(zg_cube.data.filled(np.nan), 1, -1)
+    altitude = _reference_altitude(bounds, REF_LEV,
+                                   ref_zg.reshape(-1, len(REF_LEV)))
+    altitude = altitude.reshape(-1, cube.shape[1], 2)
+    expected = np.abs(altitude[..., 1] - altitude[..., 0])
+    expected = np.moveaxis(expected.reshape(2, 4, 5, 3), -1, 1)
+    np.testing.assert_allclose(level_widths.filled(np.nan), expected)
+    assert np.ma.is_masked(level_widths)
+    np.testing.assert_array_equal(np.ma.getmaskarray(level_widths),
+                                  np.isnan(expected))
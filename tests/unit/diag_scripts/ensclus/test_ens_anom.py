@@ -0,0 +1,91 @@
+"""Tests for the linear trend of ensclus ``ens_anom.py``."""
+import os
+import sys
+
+import dask.array as da
+import numpy as np
+import pytest
+from scipy.stats import linregress
+
+import esmvaltool.diag_scripts
+
+ENSCLUS_DIR = os.path.join(os.path.dirname(esmvaltool.diag_scripts.__file__),
+                           'ensclus')
+
+
+@pytest.fixture
+def ens_anom():
+    """Import ens_anom (uses imports relative to its path)."""
+    sys.path.insert(0, ENSCLUS_DIR)
+    try:
+        import ens_anom
+        yield ens_anom
+    finally:
+        sys.path.remove(ENSCLUS_DIR)
+        for module in ('ens_anom', 'read_netcdf', 'sel_season_area'):
+            sys.modules.pop(module, None)
+
+
+def _reference_trend(var):
+    """Slope of :func:`scipy.stats.linregress` for every grid point."""
+    trend = np.full(var.shape[1:], np.nan)
+    for idx in np.ndindex(*var.shape[1:]):
+        column = np.ma.filled(var[(slice(None), ) + idx].astype(float),
+                              np.nan)
+        valid = ~np.isnan(column)
+        if valid.sum() < 2:
+            continue
+        trend[idx] = linregress(np.arange(len(column))[valid],
+                                column[valid]).slope
+    return trend
+
+
+@pytest.fixture
+def var():
+    """Masked (time, lat, lon) array with NaN and masked values."""
+    random_state = np.random.RandomState(0)
+    data = (0.3 * np.arange(12.0)[:, np.newaxis, np.newaxis] +
+            random_state.normal(size=(12, 3, 4)))
+    data[5, 0, 0] = np.nan
+    data[:, 0, 1] = np.nan
+    data[1:, 0, 2] = np.nan
+    data[[0, 11], 0, 3] = np.nan
+    mask = np.zeros(data.shape, dtype=bool)
+    mask[:6, 1, 0] = True
+    mask[:-1, 1, 1] = True
+    mask[::2, 2, 2] = True
+    return np.ma.masked_array(data, mask=mask)
+
+
+def test_linear_trend(ens_anom, var):
+    """Test linear trend against scipy's linregress."""
+    trend = ens_anom.linear_trend(var)
+    expected = _reference_trend(var)
+    assert trend.shape == (3, 4)
+    np.testing.assert_allclose(trend, expected)
+    np.testing.assert_array_equal(np.isnan(trend[:2, :3]),
+                                  [[False, True, True], [False, True, False]])
+
+
+def test_linear_trend_axis(ens_anom, var):
+    """Test linear trend along other axes."""
+    np.testing.assert_allclose(
+        ens_anom.linear_trend(np.moveaxis(var, 0, -1), axis=-1),
+        _reference_trend(var))
+    np.testing.assert_allclose(
+        ens_anom.linear_trend(np.moveaxis(var, 0, 1), axis=1),
+        _reference_trend(var))
+
+
+def test_linear_trend_dask(ens_anom, var):
+    """Test lazy linear trend of dask array chunked along time."""
+    lazy_var = da.from_array(var, chunks=(5, 2, 3))
+    trend = ens_anom.linear_trend(lazy_var)
+    assert isinstance(trend, da.Array)
+    assert trend.shape == (3, 4)
+    np.testing.assert_allclose(trend.compute(), _reference_trend(var))
+
+    lazy_var = da.moveaxis(lazy_var, 0, -1)
+    np.testing.assert_allclose(
+        ens_anom.linear_trend(lazy_var, axis=-1).compute(),
+        _reference_trend(var))
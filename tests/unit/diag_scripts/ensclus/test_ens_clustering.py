@@ -0,0 +1,97 @@
+"""Tests for the k-means clustering of ensclus ``ens_clustering.py``."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+import esmvaltool.diag_scripts
+
+ENSCLUS_DIR = os.path.join(os.path.dirname(esmvaltool.diag_scripts.__file__),
+                           'ensclus')
+
+
+@pytest.fixture
+def ens_clustering():
+    """Import ens_clustering (uses imports relative to its path)."""
+    sys.path.insert(0, ENSCLUS_DIR)
+    try:
+        import ens_clustering
+        yield ens_clustering
+    finally:
+        sys.path.remove(ENSCLUS_DIR)
+        sys.modules.pop('ens_clustering', None)
+
+
+@pytest.fixture
+def pcs():
+    """PCs of 30 ensemble members in three well separated clusters."""
+    random_state = np.random.RandomState(0)
+    centers = np.array([[0.0, 0.0, 0.0], [10.0, 0.0, 5.0], [0.0, 10.0, -5.0]])
+    return (centers.repeat(10, axis=0) +
+            random_state.normal(scale=0.5, size=(30, 3)))
+
+
+def _assert_true_clusters(labels):
+    """Assert that labels correspond to the clusters of :func:`pcs`."""
+    labels = labels.reshape(3, 10)
+    assert len(set(labels[:, 0])) == 3
+    np.testing.assert_array_equal(labels, labels[:, :1].repeat(10, axis=1))
+
+
+@pytest.mark.parametrize('method', ['kmeans', 'minibatch'])
+def test_kmeans_clustering(ens_clustering, pcs, method):
+    """Test clustering with both methods."""
+    (centroids, labels, report) = ens_clustering.kmeans_clustering(
+        pcs, 3, method=method, n_init=30, patience=0, batch_size=8)
+    assert centroids.shape == (3, 3)
+    assert labels.shape == (30, )
+    _assert_true_clusters(labels)
+    np.testing.assert_allclose(report['inertia'],
+                               np.sum((pcs - centroids[labels])**2))
+    assert report['n_restarts'] == 30
+    assert 'reference_inertia' not in report
+
+
+def test_n_jobs(ens_clustering, pcs):
+    """Test that results do not depend on the number of processes."""
+    results = [
+        ens_clustering.kmeans_clustering(pcs, 4, n_init=60, patience=0,
+                                         n_jobs=n_jobs)
+        for n_jobs in (1, 2)
+    ]
+    np.testing.assert_array_equal(results[0][0], results[1][0])
+    np.testing.assert_array_equal(results[0][1], results[1][1])
+    assert results[0][2] == results[1][2]
+
+
+def test_early_stop(ens_clustering, pcs, capsys):
+    """Test that restarts stop early if the inertia does not improve."""
+    batch = ens_clustering.RESTART_BATCH
+    (_, labels, report) = ens_clustering.kmeans_clustering(
+        pcs, 3, n_init=20 * batch, patience=batch)
+    _assert_true_clusters(labels)
+    assert report['n_restarts'] < 20 * batch
+    assert report['n_restarts'] % batch == 0
+    assert 'No improvement of inertia' in capsys.readouterr().out
+
+    # No early stop without patience
+    (_, _, report) = ens_clustering.kmeans_clustering(
+        pcs, 3, n_init=3 * batch, patience=0)
+    assert report['n_restarts'] == 3 * batch
+    assert 'No improvement of inertia' not in capsys.readouterr().out
+
+
+def test_reference(ens_clustering, pcs):
+    """Test inertia of exhaustive baseline."""
+    (_, _, report) = ens_clustering.kmeans_clustering(pcs, 3, n_init=10,
+                                                      reference=True)
+    np.testing.assert_allclose(report['inertia'],
+                               report['reference_inertia'])
+
+
+def test_invalid_method(ens_clustering, pcs):
+    """Test that invalid clustering methods raise an error."""
+    with pytest.raises(ValueError) as exc:
+        ens_clustering.kmeans_clustering(pcs, 3, method='invalid')
+    assert "got 'invalid'" in str(exc.value)
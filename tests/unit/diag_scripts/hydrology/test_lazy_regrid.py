@@ -0,0 +1,182 @@
+"""Tests for the sparse regridding schemes of hydrology lazy_regrid."""
+from unittest import mock
+
+import dask.array as da
+import iris.analysis
+import iris.coord_systems
+import iris.coords
+import iris.cube
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.hydrology import lazy_regrid
+
+COORD_SYSTEM = iris.coord_systems.GeogCS(6371229.0)
+SRC_LATS = np.array([-40., -20., 0., 20., 40.])
+SRC_LONS = np.array([10., 30., 50., 70., 90., 110.])
+
+
+@pytest.fixture(autouse=True)
+def weights_cache(monkeypatch):
+    """Use empty in-memory cache of the weights for every test."""
+    monkeypatch.setattr(lazy_regrid, '_WEIGHTS_CACHE', {})
+
+
+def _get_cube(lats, lons, data, circular=False):
+    """Get (time, lat, lon) cube."""
+    time = iris.coords.DimCoord(np.arange(data.shape[0], dtype=np.float64),
+                                standard_name='time',
+                                units='days since 2000-01-01')
+    lat = iris.coords.DimCoord(lats,
+                               standard_name='latitude',
+                               units='degrees',
+                               coord_system=COORD_SYSTEM)
+    lon = iris.coords.DimCoord(lons,
+                               standard_name='longitude',
+                               units='degrees',
+                               coord_system=COORD_SYSTEM,
+                               circular=circular)
+    lat.guess_bounds()
+    lon.guess_bounds()
+    return iris.cube.Cube(data,
+                          var_name='tas',
+                          units='K',
+                          dim_coords_and_dims=[(time, 0), (lat, 1),
+                                               (lon, 2)])
+
+
+def _get_src_cube(constant_mask, circular=False):
+    """Get lazy masked source cube."""
+    random_state = np.random.RandomState(0)
+    shape = (4, len(SRC_LATS), len(SRC_LONS))
+    mask = random_state.uniform(size=shape) < 0.2
+    if constant_mask:
+        mask[:] = mask[0]
+    data = np.ma.masked_array(random_state.normal(size=shape), mask=mask)
+    return _get_cube(SRC_LATS, SRC_LONS, da.from_array(data, chunks=2),
+                     circular=circular)
+
+
+def _assert_regridded_equal(result, expected):
+    """Assert that regridded data and masks are equal."""
+    assert result.has_lazy_data()
+    assert result.shape == expected.shape
+    data = result.data
+    np.testing.assert_array_equal(np.ma.getmaskarray(data),
+                                  np.ma.getmaskarray(expected.data))
+    np.testing.assert_allclose(data, expected.data)
+
+
+@pytest.mark.parametrize('constant_mask', [True, False])
+@pytest.mark.parametrize('circular', [True, False])
+def test_conservative(constant_mask, circular):
+    """Test conservative scheme against iris area weighted regridding."""
+    src = _get_src_cube(constant_mask, circular=circular)
+
+    # Target cells partly outside of the source grid are masked
+    tgt = _get_cube(np.linspace(-45., 45., 7), np.linspace(0., 120., 9),
+                    np.zeros((1, 7, 9)))
+    result = lazy_regrid.lazy_regrid(src, tgt, 'conservative')
+    expected = src.copy(src.data).regrid(tgt, iris.analysis.AreaWeighted())
+    _assert_regridded_equal(result, expected)
+    assert np.ma.getmaskarray(result.data)[:, 0].all()
+    assert not np.ma.getmaskarray(result.data)[:, 1:-1, 1:-1].all()
+    assert result.coord('latitude') == tgt.coord('latitude')
+    assert result.coord('longitude') == tgt.coord('longitude')
+    assert result.coord('time') == src.coord('time')
+
+
+@pytest.mark.parametrize('constant_mask', [True, False])
+@pytest.mark.parametrize('circular', [True, False])
+def test_bilinear(constant_mask, circular):
+    """Test bilinear scheme against iris linear regridding."""
+    src = _get_src_cube(constant_mask, circular=circular)
+
+    # Many target points lie on latitude or longitude lines of the source
+    tgt_lats = np.arange(-50., 51., 5.)
+    tgt_lons = np.arange(0., 121., 5.)
+    tgt = _get_cube(tgt_lats, tgt_lons,
+                    np.zeros((1, len(tgt_lats), len(tgt_lons))))
+    result = lazy_regrid.lazy_regrid(src, tgt, 'bilinear')
+    expected = src.copy(src.data).regrid(
+        tgt, iris.analysis.Linear(extrapolation_mode='mask'))
+    _assert_regridded_equal(result, expected)
+
+
+def test_bilinear_zero_weight_neighbours():
+    """Test that masked neighbours with zero weight are ignored."""
+    data = np.ma.masked_array(np.arange(2. * 5. * 6.).reshape(2, 5, 6))
+    data[:, 2, 3] = np.ma.masked
+    src = _get_cube(SRC_LATS, SRC_LONS, da.from_array(data))
+
+    # Target point (-10, 50) lies on longitude 50 of the source grid, the
+    # masked neighbour (0, 70) gets zero weight
+    tgt = _get_cube(np.array([-10., 20.]), np.array([50., 60.]),
+                    np.zeros((1, 2, 2)))
+    result = lazy_regrid.lazy_regrid(src, tgt, 'bilinear').data
+    np.testing.assert_array_equal(np.ma.getmaskarray(result[0]),
+                                  [[False, True], [False, False]])
+    np.testing.assert_allclose(result[:, 0, 0], data[:, 1:3, 2].mean(axis=1))
+    np.testing.assert_allclose(result[:, 1, 0], data[:, 3, 2])
+    np.testing.assert_allclose(result[:, 1, 1], data[:, 3, 2:4].mean(axis=1))
+
+
+def test_get_weights_cache(tmp_path):
+    """Test caching of weights in memory and on disk."""
+    src = _get_src_cube(True)
+    tgt = _get_cube(np.linspace(-30., 30., 4), np.linspace(20., 100., 5),
+                    np.zeros((1, 4, 5)))
+    weights = lazy_regrid.get_weights(src, tgt, 'conservative',
+                                      weights_dir=tmp_path)
+    assert weights.shape == (4 * 5, len(SRC_LATS) * len(SRC_LONS))
+    files = list(tmp_path.glob('conservative_*.npz'))
+    assert len(files) == 1
+
+    # In-memory cache
+    assert lazy_regrid.get_weights(src, tgt, 'conservative') is weights
+
+    # Disk cache (weights are not computed again)
+    lazy_regrid._WEIGHTS_CACHE.clear()
+    with mock.patch.dict(lazy_regrid.SPARSE_SCHEMES,
+                         {'conservative': (mock.Mock(), 1.)}):
+        loaded = lazy_regrid.get_weights(src, tgt, 'conservative',
+                                         weights_dir=tmp_path)
+        lazy_regrid.SPARSE_SCHEMES['conservative'][0].assert_not_called()
+    assert (loaded != weights).nnz == 0
+
+    # Different grid or scheme
+    other_tgt = tgt.copy()
+    other_tgt.coord('latitude').points = other_tgt.coord(
+        'latitude').points + 1.
+    lazy_regrid.get_weights(src, other_tgt, 'conservative',
+                            weights_dir=tmp_path)
+    lazy_regrid.get_weights(src, tgt, 'bilinear', weights_dir=tmp_path)
+    assert len(list(tmp_path.glob('*.npz'))) == 3
+
+
+def test_invalid_scheme():
+    """Test that invalid regridding schemes raise an error."""
+    src = _get_src_cube(True)
+    with pytest.raises(ValueError):
+        lazy_regrid.lazy_regrid(src, src, 'invalid_scheme')
+
+
+@pytest.mark.parametrize('ntime', [1, 7, 100])
+@pytest.mark.parametrize('block_bytes', [1000, 5000, 10**9])
+def test_compute_chunks(ntime, block_bytes):
+    """Test that time blocks cover the time series."""
+    src = _get_cube(SRC_LATS, SRC_LONS,
+                    np.zeros((ntime, len(SRC_LATS), len(SRC_LONS))))
+    tgt = _get_cube(np.linspace(-30., 30., 4), np.linspace(20., 100., 5),
+                    np.zeros((1, 4, 5)))
+    with mock.patch.object(lazy_regrid, '_get_block_bytes',
+                           return_value=block_bytes):
+        (src_chunks, tgt_chunks) = lazy_regrid._compute_chunks(src, tgt)
+    assert src_chunks[0] == tgt_chunks[0]
+    assert sum(src_chunks[0]) == ntime
+    assert src_chunks[1:] == ((len(SRC_LATS), ), (len(SRC_LONS), ))
+    assert tgt_chunks[1:] == ((4, ), (5, ))
+
+    # Blocks do not exceed the block size (unless a single time step does)
+    step_bytes = (len(SRC_LATS) * len(SRC_LONS) + 4 * 5) * 8
+    assert max(src_chunks[0]) * step_bytes <= max(block_bytes, step_bytes)
@@ -0,0 +1,96 @@
+"""Unit tests for :mod:`esmvaltool.diag_scripts.mlr.custom_lime`."""
+
+import numpy as np
+import pytest
+from lime.lime_tabular import LimeTabularExplainer
+
+from esmvaltool.diag_scripts.mlr.custom_lime import BatchedLimeExplainer
+
+COEFS = np.array([2.0, -1.0, 0.5])
+X_TRAIN = np.random.RandomState(42).normal(size=(200, 3)) * [1.0, 2.0, 3.0]
+X_PRED = X_TRAIN[:7]
+
+
+def _linear_predict(x_data):
+    """Linear prediction function."""
+    return x_data @ COEFS + 1.0
+
+
+def _get_explainer(categorical_features=None):
+    """Get fitted LIME explainer."""
+    x_train = X_TRAIN.copy()
+    if categorical_features:
+        x_train[:, categorical_features] = np.round(
+            x_train[:, categorical_features])
+    return LimeTabularExplainer(
+        x_train,
+        mode='regression',
+        training_labels=_linear_predict(x_train),
+        categorical_features=categorical_features,
+        discretize_continuous=False,
+        sample_around_instance=True,
+        random_state=0,
+    )
+
+
+@pytest.mark.parametrize('analytic', [True, False])
+def test_local_coefficients_linear(analytic):
+    """Test local coefficients for linear model."""
+    lime_explainer = _get_explainer()
+    explainer = BatchedLimeExplainer(lime_explainer,
+                                     _linear_predict,
+                                     analytic=analytic,
+                                     batch_size=3,
+                                     random_state=1)
+    coefs = explainer.local_coefficients(X_PRED)
+    expected = np.broadcast_to(COEFS * lime_explainer.scaler.scale_,
+                               X_PRED.shape)
+    np.testing.assert_allclose(coefs, expected, rtol=1e-3)
+
+
+def test_local_coefficients_match_lime():
+    """Test if batched coefficients match coefficients given by LIME."""
+    lime_explainer = _get_explainer()
+    explainer = BatchedLimeExplainer(lime_explainer,
+                                     _linear_predict,
+                                     random_state=1)
+    coefs = explainer.local_coefficients(X_PRED[:2])
+    for (x_single, coefs_single) in zip(X_PRED[:2], coefs):
+        exp = lime_explainer.explain_instance(x_single, _linear_predict)
+        expected = np.array([coef for (_, coef) in sorted(exp.local_exp[1])])
+        np.testing.assert_allclose(coefs_single, expected, rtol=1e-3)
+
+
+def test_max_points():
+    """Test interpolation of coefficients."""
+    explainer = BatchedLimeExplainer(_get_explainer(),
+                                     _linear_predict,
+                                     max_points=3,
+                                     analytic=True)
+    coefs = explainer.local_coefficients(X_TRAIN[:50])
+    assert coefs.shape == (50, 3)
+    np.testing.assert_allclose(coefs, coefs[:1].repeat(50, axis=0))
+
+
+def test_feature_importance_and_errors():
+    """Test feature importance and propagated errors."""
+    lime_explainer = _get_explainer(categorical_features=[2])
+    explainer = BatchedLimeExplainer(lime_explainer,
+                                     _linear_predict,
+                                     random_state=1)
+    importance = explainer.feature_importance(X_PRED)
+    assert importance.shape == X_PRED.shape
+    np.testing.assert_allclose(importance.sum(axis=1), 1.0)
+    x_err = np.full(X_PRED.shape, np.nan)
+    x_err[:, 0] = 0.1
+    x_err[:, 2] = 100.0
+    errors = explainer.propagated_squared_errors(X_PRED, x_err)
+    np.testing.assert_allclose(errors, (0.1 * COEFS[0])**2, rtol=0.05)
+
+
+def test_analytic_categorical_fail():
+    """Test analytic coefficients with categorical features."""
+    with pytest.raises(ValueError):
+        BatchedLimeExplainer(_get_explainer(categorical_features=[1]),
+                             _linear_predict,
+                             analytic=True)
@@ -0,0 +1,144 @@
+"""Tests for the moving window functions of ocean diagnostic_tools."""
+import datetime
+
+import cf_units
+import cftime
+import iris.coords
+import iris.cube
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.ocean import diagnostic_tools as diagtools
+
+
+def _get_cube(dtimes, calendar='standard'):
+    """Get a time series cube with random data at the given datetimes."""
+    units = cf_units.Unit('days since 1850-01-01', calendar=calendar)
+    time = iris.coords.DimCoord(units.date2num(dtimes),
+                                standard_name='time',
+                                units=units)
+    data = np.ma.masked_array(np.random.RandomState(0).normal(
+        size=len(dtimes)))
+    data[3] = np.ma.masked
+    return iris.cube.Cube(data, dim_coords_and_dims=[(time, 0)])
+
+
+def _get_monthly_cube(calendar='standard'):
+    """Get a cube with monthly time points in the middle of the month."""
+    dtimes = [
+        cftime.datetime(year,
+                        month,
+                        15 + (month % 2),
+                        12 * (month % 2),
+                        calendar=calendar) for year in range(1990, 1996)
+        for month in range(1, 13)
+    ]
+    return _get_cube(dtimes, calendar)
+
+
+def _get_annual_cube():
+    """Get a cube with annual time points in the middle of the year."""
+    return _get_cube([
+        cftime.datetime(year, 7, 2, calendar='standard')
+        for year in range(1950, 2000)
+    ])
+
+
+def _get_daily_cube():
+    """Get a cube with daily time points crossing a year boundary."""
+    dtimes = [
+        datetime.datetime(2000, 12, 15, 12) + datetime.timedelta(days=day)
+        for day in range(40)
+    ]
+    return _get_cube(dtimes, 'gregorian')
+
+
+def _shift(dtime, unit, shift):
+    """Shift a datetime by a calendar-aware amount of time."""
+    if unit == 'days':
+        return dtime + datetime.timedelta(days=shift)
+    if unit == 'years':
+        shift *= 12
+    month = 12 * dtime.year + dtime.month - 1 + int(shift)
+    return dtime.replace(year=month // 12, month=month % 12 + 1)
+
+
+def _reference_moving_average(cube, window):
+    """Calculate the moving average point by point (old implementation)."""
+    (width, unit) = diagtools.parse_window(window)
+    times = cube.coord('time').units.num2date(cube.coord('time').points)
+    output = []
+    for time_itr in times:
+        tmin = _shift(time_itr, unit, -width / 2.)
+        tmax = _shift(time_itr, unit, width / 2.)
+        arr = np.ma.masked_where((times < tmin) + (times > tmax), cube.data)
+        output.append(arr.mean())
+    return np.ma.array(output)
+
+
+@pytest.mark.parametrize('window,unit', [
+    ('10 days', 'days'),
+    ('2 dy', 'days'),
+    ('3 months', 'months'),
+    ('10 years', 'years'),
+    ('1 yr', 'years'),
+])
+def test_parse_window(window, unit):
+    """Test parsing of window strings."""
+    assert diagtools.parse_window(window) == (float(window.split()[0]), unit)
+
+
+def test_parse_window_invalid_unit():
+    """Test invalid window units."""
+    with pytest.raises(ValueError):
+        diagtools.parse_window('10 weeks')
+
+
+def test_get_window_bounds():
+    """Test window bounds, including points exactly at the edges."""
+    positions = np.array([0.0, 1.0, 2.0, 3.0, 3.5, 10.0])
+    (lower, upper) = diagtools.get_window_bounds(positions, 2.0)
+    np.testing.assert_array_equal(lower, [0, 0, 1, 2, 3, 5])
+    np.testing.assert_array_equal(upper, [2, 3, 4, 5, 5, 6])
+    with pytest.raises(ValueError):
+        diagtools.get_window_bounds(positions[::-1], 2.0)
+
+
+def test_windowed_mean():
+    """Test windowed mean along non-leading axis with masked values."""
+    data = np.ma.masked_array(np.arange(12.0).reshape(3, 4))
+    data[1, 1:3] = np.ma.masked
+    lower = np.array([0, 0, 1, 3])
+    upper = np.array([1, 3, 3, 4])
+    mean = diagtools.windowed_mean(data, lower, upper, axis=1)
+    expected = np.ma.masked_array(
+        [[0.0, 1.0, 1.5, 3.0], [4.0, 4.0, 0.0, 7.0], [8.0, 9.0, 9.5, 11.0]],
+        mask=[[False] * 4, [False, False, True, False], [False] * 4])
+    np.testing.assert_array_equal(mean.mask, expected.mask)
+    np.testing.assert_allclose(mean.compressed(), expected.compressed())
+
+
+@pytest.mark.parametrize('get_cube,window', [
+    (_get_monthly_cube, '12 months'),
+    (_get_monthly_cube, '5 months'),
+    (_get_monthly_cube, '2 years'),
+    (_get_annual_cube, '10 years'),
+    (_get_annual_cube, '5 yrs'),
+    (_get_daily_cube, '5 days'),
+    (_get_daily_cube, '30 days'),
+])
+def test_moving_average(get_cube, window):
+    """Test moving average against point by point calculation."""
+    cube = get_cube()
+    expected = _reference_moving_average(cube, window)
+    result = diagtools.moving_average(cube, window)
+    np.testing.assert_allclose(result.data, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize('calendar', ['360_day', 'noleap', 'gregorian'])
+def test_moving_average_calendars(calendar):
+    """Test moving average of monthly data with different calendars."""
+    cube = _get_monthly_cube(calendar)
+    expected = _reference_moving_average(cube, '12 months')
+    result = diagtools.moving_average(cube, '12 months')
+    np.testing.assert_allclose(result.data, expected, rtol=1e-12)
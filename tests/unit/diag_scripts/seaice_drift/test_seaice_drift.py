@@ -0,0 +1,90 @@
+"""Tests for the polygon mask of the sea ice drift diagnostic."""
+import iris.coords
+import iris.cube
+import numpy as np
+import pytest
+from shapely.geometry import Point
+
+from esmvaltool.diag_scripts.seaice_drift.seaice_drift import (
+    InsidePolygonFactory,
+)
+
+# SCICEX polygon of recipe_seaice_drift.yml
+POLYGON = [
+    [-15., 87.],
+    [-60., 86.58],
+    [-130., 80],
+    [-141., 80],
+    [-141., 70],
+    [-155., 72],
+    [175., 75.5],
+    [172., 78.5],
+    [163, 80.5],
+    [126, 78.5],
+    [110, 84.33],
+    [80, 84.42],
+    [57, 85.17],
+    [33, 83.8],
+    [8, 84.08],
+]
+
+
+def _reference_inside(factory, lat, lon):
+    """Check every point separately (1.0 inside, NaN outside)."""
+    inside = np.full(lat.shape, np.nan)
+    for idx in np.ndindex(*lat.shape):
+        lon_val = lon[idx] - 360. if lon[idx] > 180 else lon[idx]
+        point = factory.transformer.transform(lon_val, lat[idx])
+        if factory.polygon.contains(Point(point[0], point[1])):
+            inside[idx] = 1.
+    return inside
+
+
+@pytest.fixture
+def grid():
+    """Curvilinear grid around the North Pole."""
+    (lon, lat) = np.meshgrid(np.arange(0., 360., 7.5),
+                             np.arange(66., 90., 1.5))
+    lon = (lon + 0.2 * lat) % 360.
+    return (lat, lon)
+
+
+def test_derive(grid):
+    """Test vectorized mask against point-by-point reference."""
+    (lat, lon) = grid
+    polygon = [list(point) for point in POLYGON]
+    factory = InsidePolygonFactory(polygon)
+    assert polygon == POLYGON
+
+    inside = factory._derive(lat, lon)
+    expected = _reference_inside(factory, lat, lon)
+    np.testing.assert_array_equal(inside, expected)
+    assert np.isnan(inside).any()
+    assert not np.isnan(inside).all()
+
+    # Result is cached per grid, returned arrays are independent
+    inside[:] = 0.
+    np.testing.assert_array_equal(factory._derive(lat, lon), expected)
+    np.testing.assert_array_equal(factory._derive(lat[:-1], lon[:-1]),
+                                  expected[:-1])
+    assert len(factory._cache) == 2
+    assert InsidePolygonFactory(POLYGON)._cache == {}
+
+
+def test_derived_coord(grid):
+    """Test derived coordinate of a cube."""
+    (lat, lon) = grid
+    lat_coord = iris.coords.AuxCoord(lat, standard_name='latitude',
+                                     units='degrees')
+    lon_coord = iris.coords.AuxCoord(lon, standard_name='longitude',
+                                     units='degrees')
+    cube = iris.cube.Cube(np.zeros((2, ) + lat.shape),
+                          aux_coords_and_dims=[(lat_coord, (1, 2)),
+                                               (lon_coord, (1, 2))])
+    factory = InsidePolygonFactory(POLYGON, lat_coord, lon_coord)
+    cube.add_aux_factory(factory)
+    coord = cube.coord('Inside polygon')
+    assert cube.coord_dims(coord) == (1, 2)
+    assert coord.var_name == 'inpoly'
+    np.testing.assert_array_equal(coord.points,
+                                  _reference_inside(factory, lat, lon))
@@ -0,0 +1,81 @@
+"""Tests for the negative sea ice feedback diagnostic."""
+import dask.array as da
+import iris.coords
+import iris.cube
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.seaice_feedback.negative_seaice_feedback import (
+    NegativeSeaIceFeedback,
+    _polyfit_columns,
+)
+
+
+@pytest.mark.parametrize('order', [1, 2])
+def test_polyfit_columns(order):
+    """Test vectorized fit against :func:`numpy.polyfit` per column."""
+    random_state = np.random.RandomState(0)
+    data = random_state.normal(size=(24, 7))
+    data[3, 1] = np.nan
+    data[::2, 2] = np.nan
+    data[:-order, 3] = np.nan
+    data[:-order - 1, 4] = np.nan
+    data[:, 5] = np.nan
+
+    polynom = _polyfit_columns(data, order)
+    assert polynom.shape == (order + 1, 7)
+    for (idx, column) in enumerate(data.T):
+        valid = column[~np.isnan(column)]
+        if len(valid) < order + 1:
+            assert np.isnan(polynom[:, idx]).all()
+            continue
+        np.testing.assert_allclose(
+            polynom[:, idx],
+            np.polyfit(np.arange(len(valid)), valid, order),
+            atol=1e-10)
+    np.testing.assert_array_equal(np.isnan(polynom).any(axis=0),
+                                  [False, False, False, True, False, True,
+                                   False])
+
+
+def _get_cube(data, with_time=True):
+    """Get (time, y, x) or (y, x) cube."""
+    if not with_time:
+        return iris.cube.Cube(data, var_name='sit', units='m')
+    time = iris.coords.DimCoord(np.arange(data.shape[0], dtype=float),
+                                standard_name='time',
+                                units='days since 2000-01-01')
+    return iris.cube.Cube(data,
+                          var_name='sit',
+                          units='m',
+                          dim_coords_and_dims=[(time, 0)])
+
+
+def test_compute_volume_masked():
+    """Test that masked cells do not contribute to the volume."""
+    thick = np.ma.masked_array(np.full((3, 2, 3), 2.0),
+                               fill_value=1e20)
+    thick[:, 0, 0] = np.ma.masked
+    thick[1, 1, 2] = np.ma.masked
+    cellarea = np.ma.masked_array(np.full((2, 3), 1e12), fill_value=1e20)
+    cellarea[1, 1] = np.ma.masked
+    mask = np.array([[1.0, 1.0, 1.0], [1.0, 1.0, 0.0]])
+
+    volume = NegativeSeaIceFeedback.compute_volume(
+        _get_cube(da.from_array(thick, chunks=(1, 2, 3))), cellarea,
+        mask=mask)
+    np.testing.assert_allclose(volume, [6.0, 6.0, 6.0])
+
+    # Without mask and without time coordinate
+    volume = NegativeSeaIceFeedback.compute_volume(
+        _get_cube(thick[1], with_time=False), cellarea)
+    assert np.ndim(volume) == 0
+    np.testing.assert_allclose(volume, 6.0)
+
+
+def test_compute_volume_invalid_mask():
+    """Test that masks must be between 0 and 1."""
+    cube = _get_cube(np.ones((2, 2, 2)))
+    with pytest.raises(ValueError):
+        NegativeSeaIceFeedback.compute_volume(cube, np.ones((2, 2)),
+                                              mask=np.full((2, 2), 2.0))
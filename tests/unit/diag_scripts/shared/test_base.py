@@ -1,11 +1,14 @@
+import json
 import logging
 import sys
 from pathlib import Path
 
+import matplotlib.pyplot as plt
 import pytest
 import yaml
 
 from esmvaltool.diag_scripts import shared
+from esmvaltool.diag_scripts.shared._profiling import profile_diagnostic
 
 
 def test_get_plot_filename():
@@ -73,6 +76,106 @@ def test_provenance_logger_duplicate_raises(tmp_path):
             prov.log('output.nc', record)
 
 
+def test_save_figure(tmp_path):
+
+    cfg = {
+        'output_file_type': ['png', 'pdf'],
+        'plot_dir': str(tmp_path / 'plots'),
+        'run_dir': str(tmp_path / 'run'),
+    }
+    (tmp_path / 'plots').mkdir()
+    record = {'caption': 'Figure', 'ancestors': ['input.nc']}
+    figure = plt.figure()
+    shared.save_figure('test', record, cfg, figure=figure)
+
+    assert not plt.fignum_exists(figure.number)
+    provenance = yaml.safe_load(
+        (tmp_path / 'run' / 'diagnostic_provenance.yml').read_bytes())
+    for ext in ('png', 'pdf'):
+        path = tmp_path / 'plots' / ext / f'test.{ext}'
+        assert path.exists()
+        assert provenance[str(path)] == record
+
+
+def test_save_figure_async(tmp_path, caplog):
+
+    cfg = {
+        'output_file_type': 'png',
+        'plot_dir': str(tmp_path / 'plots'),
+        'run_dir': str(tmp_path / 'run'),
+        'save_figure_processes': 2,
+        'save_figure_max_pending': 1,
+    }
+    (tmp_path / 'plots').mkdir()
+    caplog.set_level(logging.DEBUG)
+    with profile_diagnostic(str(tmp_path)):
+        for idx in range(3):
+            plt.figure()
+            plt.plot([0, 1], [idx, 1])
+            shared.save_figure(f'test_{idx}', {'caption': f'Figure {idx}'},
+                               cfg)
+        assert not (tmp_path / 'run' / 'diagnostic_provenance.yml').exists()
+        shared.flush_figures()
+
+    assert not plt.get_fignums()
+    provenance = yaml.safe_load(
+        (tmp_path / 'run' / 'diagnostic_provenance.yml').read_bytes())
+    for idx in range(3):
+        path = tmp_path / 'plots' / 'png' / f'test_{idx}.png'
+        assert path.exists()
+        assert provenance[str(path)] == {'caption': f'Figure {idx}'}
+        assert f'Rendered test_{idx} in ' in caplog.text
+
+    # Render times are recorded by the main process
+    timings = json.loads((tmp_path / 'diagnostic_timings.json').read_text())
+    assert timings['summary']['render_figure']['count'] == 3
+
+
+def test_save_figure_async_failed(tmp_path):
+
+    cfg = {
+        'output_file_type': 'png',
+        'plot_dir': str(tmp_path / 'plots'),
+        'run_dir': str(tmp_path / 'run'),
+        'save_figure_processes': 1,
+    }
+    (tmp_path / 'plots').mkdir()
+    shared.save_figure('test_ok', {'caption': 'Figure'}, cfg,
+                       figure=plt.figure())
+    shared.save_figure('test_failed', {'caption': 'Figure'}, cfg,
+                       figure=plt.figure(), format='invalid_format')
+    with pytest.raises(ValueError):
+        shared.flush_figures()
+
+    # No provenance is recorded for files that have not been written
+    provenance = yaml.safe_load(
+        (tmp_path / 'run' / 'diagnostic_provenance.yml').read_bytes())
+    assert list(provenance) == [str(tmp_path / 'plots' / 'png' /
+                                    'test_ok.png')]
+    assert not (tmp_path / 'plots' / 'png' / 'test_failed.png').exists()
+    shared.flush_figures()
+
+
+def test_save_figure_async_not_picklable(tmp_path):
+
+    cfg = {
+        'output_file_type': 'png',
+        'plot_dir': str(tmp_path / 'plots'),
+        'run_dir': str(tmp_path / 'run'),
+        'save_figure_processes': 1,
+    }
+    (tmp_path / 'plots').mkdir()
+    figure = plt.figure()
+    figure.gca().xaxis.set_major_formatter(
+        plt.FuncFormatter(lambda x, _: f'{x:.1f}'))
+    shared.save_figure('test', {'caption': 'Figure'}, cfg, figure=figure)
+
+    # Figure is rendered immediately
+    assert not plt.fignum_exists(figure.number)
+    assert (tmp_path / 'plots' / 'png' / 'test.png').exists()
+    shared.flush_figures()
+
+
 def test_select_metadata():
 
     metadata = [
@@ -368,6 +471,35 @@ def test_run_diagnostic(tmp_path, monkeypatch):
     with shared.run_diagnostic() as cfg:
         assert 'example_setting' in cfg
 
+    timings = json.loads(
+        (Path(settings['run_dir']) / 'diagnostic_timings.json').read_text())
+    assert timings['summary']['diagnostic']['count'] == 1
+
+
+@pytest.mark.parametrize('flag', ['-p', '--profile'])
+def test_run_diagnostic_profile(tmp_path, monkeypatch, flag):
+    """Test if profiling the diagnostic works."""
+    settings = create_settings(tmp_path)
+    settings_file = write_settings(settings)
+
+    monkeypatch.setattr(sys, 'argv', ['', flag, settings_file])
+
+    with shared.run_diagnostic():
+        with shared.profile_phase('phase'):
+            sum(range(100))
+
+    run_dir = Path(settings['run_dir'])
+    assert (run_dir / 'diagnostic_profile.prof').exists()
+    timings = json.loads((run_dir / 'diagnostic_timings.json').read_text())
+    assert [r['phase'] for r in timings['phases']] == [
+        'phase',
+        'flush_figures',
+        'diagnostic',
+    ]
+    for record in timings['phases']:
+        assert record['wall_time'] >= 0.0
+        assert record['cpu_time'] >= 0.0
+
 
 @pytest.mark.parametrize('flag', ['-l', '--log-level'])
 def test_run_diagnostic_log_level(tmp_path, monkeypatch, flag):
@@ -0,0 +1,79 @@
+"""Tests for :func:`esmvaltool.diag_scripts.shared.truncated_eof`."""
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.shared import truncated_eof
+
+N_SAMPLES = 40
+LAT = np.linspace(-80.0, 80.0, 9)
+WEIGHTS = np.sqrt(np.cos(np.deg2rad(LAT)))[:, np.newaxis]
+
+
+def _get_data():
+    """Get data with three dominant modes and noise."""
+    random_state = np.random.RandomState(0)
+    patterns = random_state.normal(size=(3, 9, 12))
+    amplitudes = random_state.normal(size=(N_SAMPLES, 3)) * [10.0, 5.0, 2.0]
+    noise = 0.1 * random_state.normal(size=(N_SAMPLES, 9, 12))
+    return np.einsum('tm,mij->tij', amplitudes, patterns) + noise + 3.0
+
+
+def _align_signs(result, reference):
+    """Align signs of EOFs and PCs to reference."""
+    signs = np.sign(np.sum(result.pcs * reference.pcs, axis=0))
+    return (result.eofs * signs[:, np.newaxis, np.newaxis],
+            result.pcs * signs)
+
+
+def test_exact_covariance():
+    """Test exact EOFs against eigen-decomposition of covariance matrix."""
+    data = _get_data()
+    result = truncated_eof(data, weights=WEIGHTS, method='exact')
+    anomalies = ((data - data.mean(axis=0)) * WEIGHTS).reshape(N_SAMPLES, -1)
+    covariance = anomalies.T @ anomalies / (N_SAMPLES - 1)
+    eigenvalues = np.linalg.eigvalsh(covariance)[::-1][:N_SAMPLES]
+    assert result.eofs.shape == (N_SAMPLES, 9, 12)
+    assert result.pcs.shape == (N_SAMPLES, N_SAMPLES)
+    np.testing.assert_allclose(result.eigenvalues, eigenvalues, atol=1e-8)
+    np.testing.assert_allclose(result.variance_fraction.sum(), 1.0)
+    np.testing.assert_allclose(
+        result.pcs, anomalies @ result.eofs.reshape(N_SAMPLES, -1).T,
+        atol=1e-8)
+
+
+def test_randomized_matches_exact():
+    """Test randomized EOFs against exact EOFs."""
+    data = _get_data()
+    exact = truncated_eof(data, n_modes=3, weights=WEIGHTS, method='exact')
+    result = truncated_eof(data, n_modes=3, weights=WEIGHTS, random_state=1)
+    assert result.eofs.shape == (3, 9, 12)
+    assert result.pcs.shape == (N_SAMPLES, 3)
+    (eofs, pcs) = _align_signs(result, exact)
+    np.testing.assert_allclose(eofs, exact.eofs, atol=1e-6)
+    np.testing.assert_allclose(pcs, exact.pcs, rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(result.eigenvalues, exact.eigenvalues)
+    np.testing.assert_allclose(result.variance_fraction,
+                               exact.variance_fraction)
+
+
+def test_missing_values():
+    """Test ignoring of grid points with missing values."""
+    data = np.ma.masked_invalid(_get_data())
+    data[5, 2, 3] = np.ma.masked
+    data.data[:, 4, 0] = np.nan
+    result = truncated_eof(data, n_modes=2, random_state=0)
+    assert np.isnan(result.eofs[:, 2, 3]).all()
+    assert np.isnan(result.eofs[:, 4, 0]).all()
+    assert np.isfinite(result.pcs).all()
+    assert np.isfinite(result.eofs).sum() == 2 * (9 * 12 - 2)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'method': 'eig'},
+    {'n_modes': 0},
+    {'n_modes': N_SAMPLES + 1},
+])
+def test_invalid_input(kwargs):
+    """Test invalid input."""
+    with pytest.raises(ValueError):
+        truncated_eof(_get_data(), **kwargs)
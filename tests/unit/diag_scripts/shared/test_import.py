@@ -0,0 +1,62 @@
+"""Tests for the (lazy) import of :mod:`esmvaltool.diag_scripts.shared`."""
+import json
+import logging
+import subprocess
+import sys
+
+import pytest
+
+import esmvaltool.diag_scripts.shared as shared
+
+logger = logging.getLogger(__name__)
+
+HEAVY_MODULES = [
+    'cartopy',
+    'esmvalcore.preprocessor',
+    'matplotlib.pyplot',
+]
+
+IMPORT_BENCHMARK = """
+import json
+import sys
+import time
+start = time.perf_counter()
+from esmvaltool.diag_scripts.shared import run_diagnostic
+duration = time.perf_counter() - start
+print(json.dumps({
+    'import_time': duration,
+    'modules': [mod for mod in %r if mod in sys.modules],
+}))
+""" % HEAVY_MODULES
+
+
+def test_run_diagnostic_startup():
+    """Test import of ``run_diagnostic`` without plotting modules."""
+    output = subprocess.run([sys.executable, '-c', IMPORT_BENCHMARK],
+                            check=True,
+                            stdout=subprocess.PIPE,
+                            universal_newlines=True).stdout
+    result = json.loads(output.splitlines()[-1])
+    logger.info("Import of run_diagnostic took %.2f s", result['import_time'])
+    assert result['import_time'] > 0.0
+    assert result['modules'] == []
+
+
+@pytest.mark.parametrize('name', ['io', 'iris_helpers', 'names', 'plot'])
+def test_lazy_submodules(name):
+    """Test lazy import of submodules."""
+    module = getattr(shared, name)
+    assert module.__name__ == f'esmvaltool.diag_scripts.shared.{name}'
+    assert name in dir(shared)
+
+
+@pytest.mark.parametrize('name', shared.__all__)
+def test_all_attributes_available(name):
+    """Test if all public attributes can be accessed."""
+    assert getattr(shared, name) is not None
+
+
+def test_invalid_attribute():
+    """Test access of invalid attribute."""
+    with pytest.raises(AttributeError):
+        shared.this_does_not_exist
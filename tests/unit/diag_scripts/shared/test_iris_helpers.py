@@ -1,4 +1,5 @@
 """Tests for the module :mod:`esmvaltool.diag_scripts.shared.iris_helpers`."""
+import os
 from unittest import mock
 
 import iris
@@ -218,6 +219,48 @@ def test_get_mean_cube(mock_load_cube):
     result = ih.get_mean_cube(datasets)
     assert result == cube_out
 
+    # Lazy calculation
+    mock_load_cube.side_effect = [CUBE_1.copy(), CUBE_2.copy(), cube.copy()]
+    result = ih.get_mean_cube(datasets, lazy=True)
+    assert result.has_lazy_data()
+    assert result == cube_out
+
+    # Incompatible cubes
+    wrong_cube = CUBE_1.copy()
+    wrong_cube.var_name = 'b'
+    mock_load_cube.side_effect = [CUBE_1.copy(), wrong_cube]
+    with pytest.raises(ValueError):
+        ih.get_mean_cube(datasets)
+    mock_load_cube.side_effect = [CUBE_1.copy(), CUBE_LONG.copy()]
+    with pytest.raises(ValueError):
+        ih.get_mean_cube(datasets)
+    with pytest.raises(ValueError):
+        ih.get_mean_cube([])
+
+
+@mock.patch('esmvaltool.diag_scripts.shared.iris_helpers.iris.load_cube',
+            autospec=True)
+def test_get_std_cube(mock_load_cube):
+    """Test calculation of standard deviation cubes."""
+    datasets = [
+        {'test': 'x', 'filename': 'a/b.nc'},
+        {'test': 'y', 'filename': 'a/b/c.nc'},
+        {'test': 'z', 'filename': 'c/d.nc'},
+    ]
+    cube = CUBE_1.copy([-4.0, 2.0, -4.0])
+    mock_load_cube.side_effect = [CUBE_1.copy(), CUBE_2.copy(), cube]
+    cube_out = iris.cube.Cube(
+        np.ma.masked_invalid([np.sqrt(3.0), np.nan, 2.0 * np.sqrt(3.0)]),
+        var_name='a',
+        dim_coords_and_dims=[(DIM_COORD_1, 0)],
+        cell_methods=[
+            iris.coords.CellMethod('standard_deviation', coords='cube_label'),
+        ],
+    )
+    result = ih.get_std_cube(datasets)
+    assert result == cube_out
+    np.testing.assert_array_equal(result.data.mask, [False, True, False])
+
 
 TEST_IRIS_PROJECT_CONSTRAINT = [
     (['ONE'], False, [2.0, 6.0], ['a', 'e']),
@@ -432,3 +475,26 @@ def test_var_name_constraint():
     result = cubes_in.extract(constraint)
     assert cubes_in is not result
     assert result == cubes_out
+
+
+def test_load_cubelist(tmp_path):
+    """Test cached loading of cube lists."""
+    path = str(tmp_path / 'cubes.nc')
+    link = str(tmp_path / 'link.nc')
+    iris.save(iris.cube.CubeList([CUBE_1.copy()]), path)
+    os.link(path, link)
+    with mock.patch('iris.load', wraps=iris.load) as mock_load:
+        cubes = ih.load_cubelist(path)
+        cubes[0].var_name = 'modified'
+        cubes_link = ih.load_cubelist(link)
+        assert mock_load.call_count == 1
+    assert len(cubes_link) == 1
+    assert cubes_link[0].var_name == 'a'
+    np.testing.assert_allclose(cubes_link[0].data, CUBE_1.data)
+
+    # Modified files are reloaded
+    iris.save(iris.cube.CubeList([CUBE_1.copy()[:2]]), path)
+    with mock.patch('iris.load', wraps=iris.load) as mock_load:
+        cubes = ih.load_cubelist(path)
+        assert mock_load.call_count == 1
+    assert cubes[0].shape == (2, )
@@ -0,0 +1,278 @@
+"""Tests for the perfect model calibration of sigmas in climwip."""
+import os
+import sys
+from unittest import mock
+
+import numpy as np
+import pytest
+import xarray as xr
+
+import esmvaltool.diag_scripts
+from esmvaltool.diag_scripts.weighting.climwip.core_functions import (
+    _weighted_percentile_of_truth,
+    calculate_weights,
+    perfect_model_test,
+    select_sigmas,
+    weighted_quantile,
+)
+
+CLIMWIP_DIR = os.path.join(os.path.dirname(esmvaltool.diag_scripts.__file__),
+                           'weighting', 'climwip')
+MODELS = [
+    'ModelA_r1i1p1',
+    'ModelA_r2i1p1',
+    'ModelB_r1i1p1',
+    'ModelC_r1i1p1',
+    'ModelC_r2i1p1',
+    'ModelC_r3i1p1',
+    'ModelD_r1i1p1',
+    'ModelE_r1i1p1',
+]
+PERFORMANCE_SIGMAS = [0.1, 0.3, 0.5, 1.0, 2.0]
+INDEPENDENCE_SIGMAS = [0.2, 0.5, 1.5]
+
+
+def _get_distances(random_state):
+    """Get symmetric distance matrix with zeros on the diagonal."""
+    points = random_state.normal(size=(len(MODELS), 3))
+    distances = np.linalg.norm(points[:, np.newaxis] - points[np.newaxis],
+                               axis=-1)
+    return xr.DataArray(
+        distances,
+        dims=('perfect_model_ensemble', 'model_ensemble'),
+        coords={
+            'perfect_model_ensemble': MODELS,
+            'model_ensemble': MODELS,
+        },
+    )
+
+
+@pytest.fixture
+def ensemble():
+    """Small synthetic ensemble."""
+    random_state = np.random.RandomState(42)
+    performance = _get_distances(random_state)
+    independence = _get_distances(random_state)
+    target = xr.DataArray(random_state.normal(loc=3.0, size=len(MODELS)),
+                          dims='model_ensemble',
+                          coords={'model_ensemble': MODELS},
+                          attrs={'units': 'K'})
+    return (performance, independence, target)
+
+
+def _crps(values, weights, truth):
+    """Continuous ranked probability score of a weighted ensemble."""
+    return (np.sum(weights * np.abs(values - truth)) - 0.5 * np.sum(
+        weights[:, np.newaxis] * weights[np.newaxis, :] *
+        np.abs(values[:, np.newaxis] - values[np.newaxis, :])))
+
+
+def _reference_perfect_model_test(performance, independence, target,
+                                  performance_sigma, independence_sigma,
+                                  quantiles=(0.1, 0.9)):
+    """Perfect model test with one call of the weighting per perfect model."""
+    crps = []
+    crps_unweighted = []
+    inside = []
+    for perfect_model in MODELS:
+        included = [
+            model for model in MODELS
+            if model.split('_')[0] != perfect_model.split('_')[0]
+        ]
+        perf = performance.sel(perfect_model_ensemble=perfect_model,
+                               model_ensemble=included)
+        if independence is None:
+            indep = None
+        else:
+            indep = independence.sel(perfect_model_ensemble=included,
+                                     model_ensemble=included)
+        weights = calculate_weights(perf, indep, performance_sigma,
+                                    independence_sigma).values
+        values = target.sel(model_ensemble=included).values
+        truth = float(target.sel(model_ensemble=perfect_model))
+        crps.append(_crps(values, weights, truth))
+        crps_unweighted.append(
+            _crps(values, np.full(len(values), 1.0 / len(values)), truth))
+        (lower, upper) = weighted_quantile(values, quantiles, weights)
+        inside.append(lower <= truth <= upper)
+    skill = 1.0 - np.mean(crps) / np.mean(crps_unweighted)
+    return (skill, np.mean(crps), np.mean(inside))
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1, 2])
+def test_perfect_model_test(ensemble, chunk_size):
+    """Test vectorized perfect model test against the looped reference."""
+    (performance, independence, target) = ensemble
+    result = perfect_model_test(performance,
+                                independence,
+                                target,
+                                PERFORMANCE_SIGMAS,
+                                INDEPENDENCE_SIGMAS,
+                                chunk_size=chunk_size)
+    assert result['skill'].dims == ('performance_sigma', 'independence_sigma')
+    assert result['crps'].attrs['units'] == 'K'
+    np.testing.assert_allclose(result['performance_sigma'],
+                               PERFORMANCE_SIGMAS)
+    np.testing.assert_allclose(result['independence_sigma'],
+                               INDEPENDENCE_SIGMAS)
+    for performance_sigma in PERFORMANCE_SIGMAS:
+        for independence_sigma in INDEPENDENCE_SIGMAS:
+            expected = _reference_perfect_model_test(
+                performance, independence, target, performance_sigma,
+                independence_sigma)
+            selected = result.sel(performance_sigma=performance_sigma,
+                                  independence_sigma=independence_sigma)
+            np.testing.assert_allclose(
+                [selected['skill'], selected['crps'],
+                 selected['reliability']], expected)
+
+
+def test_perfect_model_test_performance_only(ensemble):
+    """Test perfect model test without independence weighting."""
+    (performance, _, target) = ensemble
+    result = perfect_model_test(performance, None, target,
+                                PERFORMANCE_SIGMAS, INDEPENDENCE_SIGMAS)
+    assert result['skill'].shape == (len(PERFORMANCE_SIGMAS), 1)
+    assert np.isnan(result['independence_sigma']).all()
+    for performance_sigma in PERFORMANCE_SIGMAS:
+        expected = _reference_perfect_model_test(performance, None, target,
+                                                 performance_sigma, None)
+        selected = result.sel(performance_sigma=performance_sigma).isel(
+            independence_sigma=0)
+        np.testing.assert_allclose(
+            [selected['skill'], selected['crps'], selected['reliability']],
+            expected)
+
+
+def test_perfect_model_test_single_model(ensemble):
+    """Test that at least two different models are needed."""
+    (performance, independence, target) = ensemble
+    models = ['ModelA_r1i1p1', 'ModelA_r2i1p1']
+    performance = performance.sel(perfect_model_ensemble=models,
+                                  model_ensemble=models)
+    independence = independence.sel(perfect_model_ensemble=models,
+                                    model_ensemble=models)
+    with pytest.raises(ValueError):
+        perfect_model_test(performance, independence,
+                           target.sel(model_ensemble=models),
+                           PERFORMANCE_SIGMAS, INDEPENDENCE_SIGMAS)
+
+
+def test_weighted_percentile_of_truth():
+    """Test weighted percentiles against :func:`weighted_quantile`."""
+    random_state = np.random.RandomState(0)
+    values = random_state.normal(size=6)
+    values[4] = values[1]
+    included = 1.0 - np.identity(6)
+    included[0, 3] = 0.0
+    weights = random_state.uniform(size=(2, 6, 6)) * included
+    weights /= weights.sum(axis=-1, keepdims=True)
+    percentiles = _weighted_percentile_of_truth(values, weights, included)
+    assert percentiles.shape == (2, 6)
+    for (idx_weights, idx) in np.ndindex(*percentiles.shape):
+        mask = included[idx] > 0.0
+        if (values[idx] < values[mask].min()
+                or values[idx] > values[mask].max()):
+            assert np.isnan(percentiles[idx_weights, idx])
+            continue
+        quantile = weighted_quantile(values[mask],
+                                     [percentiles[idx_weights, idx]],
+                                     weights[idx_weights, idx, mask])
+        np.testing.assert_allclose(quantile, values[idx])
+    assert np.isnan(percentiles).any()
+    assert not np.isnan(percentiles).all()
+
+
+def _get_calibration(skill, reliability, independence_sigmas=(0.5, 1.0)):
+    """Get dataset with skill and reliability."""
+    dims = ('performance_sigma', 'independence_sigma')
+    return xr.Dataset(
+        {
+            'skill': (dims, np.array(skill, dtype=float)),
+            'reliability': (dims, np.array(reliability, dtype=float)),
+        },
+        coords={
+            'performance_sigma': [0.1, 0.2, 0.3],
+            'independence_sigma': list(independence_sigmas),
+        },
+    )
+
+
+def test_select_sigmas_best_reliable_skill():
+    """Test that the best skill among reliable sigmas is selected."""
+    calibration = _get_calibration(
+        skill=[[0.9, 0.5], [0.4, 0.6], [np.nan, 0.2]],
+        reliability=[[0.7, 0.8], [0.9, 1.0], [1.0, 0.85]],
+    )
+    assert select_sigmas(calibration) == (0.2, 1.0)
+    assert select_sigmas(calibration, min_reliability=0.5) == (0.1, 0.5)
+    assert select_sigmas(calibration, min_reliability=0.95) == (0.2, 1.0)
+
+
+def test_select_sigmas_most_reliable(caplog):
+    """Test that the most reliable sigmas are selected as fallback."""
+    calibration = _get_calibration(
+        skill=[[0.9, 0.5], [0.4, 0.3], [0.1, 0.2]],
+        reliability=[[0.5, 0.6], [0.6, 0.3], [0.2, 0.1]],
+    )
+    assert select_sigmas(calibration) == (0.1, 1.0)
+    assert 'No combination of sigmas' in caplog.text
+
+
+def test_select_sigmas_performance_only():
+    """Test that no independence sigma is selected if it is not tested."""
+    calibration = _get_calibration(
+        skill=[[0.1], [0.3], [0.2]],
+        reliability=[[0.9], [0.9], [0.9]],
+        independence_sigmas=[np.nan],
+    )
+    assert select_sigmas(calibration) == (0.2, None)
+
+
+@pytest.fixture
+def climwip_main():
+    """Import climwip main script (uses imports relative to its path)."""
+    pytest.importorskip('seaborn')
+    pytest.importorskip('natsort')
+    sys.path.insert(0, CLIMWIP_DIR)
+    try:
+        import main
+        yield main
+    finally:
+        sys.path.remove(CLIMWIP_DIR)
+        sys.modules.pop('main', None)
+
+
+@pytest.mark.parametrize('with_independence', [True, False])
+def test_calibrate_sigmas(climwip_main, ensemble, with_independence):
+    """Test calibration of sigmas with a perfect model test."""
+    (performance, independence, target) = ensemble
+    if not with_independence:
+        independence = None
+    cfg = {
+        'calibrate_sigmas': {
+            'min_reliability': 0.6,
+            'performance_sigmas': PERFORMANCE_SIGMAS,
+            'independence_sigmas': INDEPENDENCE_SIGMAS,
+            'target': 'calibration_target',
+        },
+    }
+    with mock.patch.object(climwip_main, 'visualize_and_save_calibration',
+                           autospec=True) as mock_visualize:
+        sigmas = climwip_main.calibrate_sigmas(performance, independence,
+                                               target, cfg, ['ancestor.nc'])
+
+    calibration = perfect_model_test(performance, independence, target,
+                                     PERFORMANCE_SIGMAS, INDEPENDENCE_SIGMAS)
+    assert sigmas == select_sigmas(calibration, min_reliability=0.6)
+    assert sigmas[0] in PERFORMANCE_SIGMAS
+    if with_independence:
+        assert sigmas[1] in INDEPENDENCE_SIGMAS
+    else:
+        assert sigmas[1] is None
+    mock_visualize.assert_called_once()
+    (args, _) = mock_visualize.call_args
+    assert args[1:] == (sigmas, 0.6, cfg, ['ancestor.nc'])
+    assert args[0].attrs['performance_sigma'] == sigmas[0]
+    assert args[0].attrs['min_reliability'] == 0.6
+    xr.testing.assert_allclose(args[0], calibration)
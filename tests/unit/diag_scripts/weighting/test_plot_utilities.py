@@ -0,0 +1,98 @@
+"""Tests for the plot utilities of the weighting diagnostics."""
+import os
+import sys
+
+import numpy as np
+import pytest
+import xarray as xr
+
+import esmvaltool.diag_scripts
+from esmvaltool.diag_scripts.weighting.climwip.core_functions import (
+    weighted_quantile, )
+
+WEIGHTING_DIR = os.path.join(os.path.dirname(esmvaltool.diag_scripts.__file__),
+                             'weighting')
+MODELS = ['ModelA', 'ModelB', 'ModelC', 'ModelD', 'ModelE']
+
+
+@pytest.fixture
+def plot_utilities():
+    """Import plot utilities (uses imports relative to its path)."""
+    sys.path.insert(0, WEIGHTING_DIR)
+    try:
+        import plot_utilities
+        yield plot_utilities
+    finally:
+        sys.path.remove(WEIGHTING_DIR)
+        sys.modules.pop('plot_utilities', None)
+
+
+@pytest.fixture
+def model_data(tmp_path):
+    """Lazy model data with one chunk per model (as read_model_data)."""
+    random_state = np.random.RandomState(0)
+    data_arrays = []
+    for model in MODELS:
+        data_array = xr.DataArray(random_state.normal(size=(6, 3)),
+                                  dims=('time', 'lat'),
+                                  coords={
+                                      'time': np.arange(6),
+                                      'lat': [-30.0, 0.0, 30.0],
+                                  },
+                                  name='tas')
+        filename = tmp_path / f'{model}.nc'
+        data_array.to_netcdf(filename)
+        data_arrays.append(xr.open_dataset(filename, chunks={})['tas'])
+    data = xr.concat(data_arrays, dim='model_ensemble')
+    data['model_ensemble'] = MODELS
+    return data
+
+
+@pytest.fixture
+def weights():
+    """Weights for the models (in different order than the data)."""
+    return xr.DataArray([0.1, 0.4, 0.2, 0.2, 0.1],
+                        dims='model_ensemble',
+                        coords={'model_ensemble': MODELS[::-1]},
+                        name='weight')
+
+
+@pytest.mark.parametrize('use_weights', [True, False])
+def test_calculate_percentiles_lazy(plot_utilities, model_data, weights,
+                                    use_weights):
+    """Test percentiles of lazy data against in-memory data."""
+    assert model_data.chunks is not None
+    if not use_weights:
+        weights = None
+    percentiles = np.array([25, 75])
+    result = plot_utilities.calculate_percentiles(model_data, percentiles,
+                                                  weights)
+    assert result.chunks is not None
+    assert result.dims == ('time', 'lat', 'percentiles')
+    np.testing.assert_array_equal(result['percentiles'], percentiles)
+
+    loaded = model_data.load()
+    expected = plot_utilities.calculate_percentiles(loaded, percentiles,
+                                                    weights)
+    assert expected.chunks is None
+    xr.testing.assert_allclose(result.compute(), expected)
+
+    if weights is not None:
+        weights = weights.sel(model_ensemble=MODELS).values
+    for (idx_time, idx_lat) in np.ndindex(6, 3):
+        np.testing.assert_allclose(
+            result.isel(time=idx_time, lat=idx_lat),
+            weighted_quantile(loaded.values[:, idx_time, idx_lat],
+                              percentiles / 100, weights))
+
+
+def test_calculate_percentiles_list(plot_utilities, model_data, weights):
+    """Test percentiles given as list."""
+    result = plot_utilities.calculate_percentiles(model_data, [50], weights)
+    median = result.squeeze('percentiles', drop=True)
+    assert median.dims == ('time', 'lat')
+    xr.testing.assert_allclose(
+        median,
+        plot_utilities.calculate_percentiles(model_data, np.array([50]),
+                                             weights).isel(percentiles=0,
+                                                           drop=True))